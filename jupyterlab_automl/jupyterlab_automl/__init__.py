@@ -1,13 +1,46 @@
+import atexit
+import os
+
+from jupyter_core.paths import jupyter_runtime_dir
 from notebook.utils import url_path_join
 
+from jupyterlab_automl.cache import TTLCache
+from jupyterlab_automl.clients import ClientRegistry
+from jupyterlab_automl.config import AutoMLConfig
+from jupyterlab_automl.credentials import CredentialRefresher
+from jupyterlab_automl.executor import BoundedExecutor
+from jupyterlab_automl.index import ListingIndexes
+from jupyterlab_automl.metrics import (
+    REGISTRY,
+    cache_collector,
+    coalescer_collector,
+    upstream_collector,
+    warmup_collector,
+    watcher_collector,
+)
+from jupyterlab_automl.operations import OperationTracker
+from jupyterlab_automl.store import TableSpecStore
+from jupyterlab_automl.tracing import TraceExporter
+from jupyterlab_automl.upstream import GUARD
 from jupyterlab_automl.handlers import (
+    create_automl_client,
+    create_automl_parent,
+    parse_location,
+    Coalescer,
     DeleteDataset,
     DeleteModel,
+    GetColumnDetail,
+    GetMetrics,
+    GetOperation,
     ListDatasets,
     ListModels,
+    ListResources,
     ListTableInfo,
+    WatchResources,
 )
 from jupyterlab_automl.version import VERSION
+from jupyterlab_automl.warmup import WarmUp
+from jupyterlab_automl.watcher import ResourceWatcher
 
 __version__ = VERSION
 
@@ -24,6 +57,94 @@ def load_jupyter_server_extension(nb_server_app):
     """
     host_pattern = ".*$"
     app = nb_server_app.web_app
+    config = AutoMLConfig(parent=nb_server_app)
+    executor = BoundedExecutor(config.executor_max_workers, config.executor_max_queue)
+    GUARD.configure(
+        max_concurrency=config.upstream_max_concurrency,
+        retries=config.upstream_retries,
+        base_delay=config.upstream_retry_delay,
+        failure_threshold=config.circuit_breaker_threshold,
+        reset_timeout=config.circuit_breaker_reset,
+    )
+    clients = ClientRegistry(
+        create_automl_client, create_automl_parent, config.client_pool_size
+    )
+    listings = TTLCache(config.listing_cache_ttl, config.listing_cache_size)
+
+    watcher = ResourceWatcher(
+        app.settings, config.change_feed_min_interval, config.change_feed_max_interval
+    )
+
+    def invalidate_listing(kind, resource_id):
+        listings.invalidate((kind, parse_location(resource_id)))
+        watcher.wake()
+
+    app.settings["automl_config"] = config
+    app.settings["automl_executor"] = executor
+    app.settings["automl_clients"] = clients
+    app.settings["automl_listings"] = listings
+    listing_indexes = ListingIndexes()
+    app.settings["automl_listing_indexes"] = listing_indexes
+    app.settings["automl_watcher"] = watcher
+    column_details = TTLCache(
+        config.column_detail_cache_ttl, config.column_detail_cache_size
+    )
+    app.settings["automl_column_details"] = column_details
+    app.settings["automl_operations"] = OperationTracker(executor, invalidate_listing)
+    coalescer = Coalescer()
+    app.settings["automl_coalescer"] = coalescer
+    caches = {
+        "listings": listings,
+        "listing_indexes": listing_indexes,
+        "column_details": column_details,
+    }
+
+    table_specs = None
+    if config.table_spec_cache_size > 0:
+        table_specs = TableSpecStore(
+            config.table_spec_cache_path
+            or os.path.join(jupyter_runtime_dir(), "automl_table_specs.sqlite"),
+            config.table_spec_cache_size,
+        )
+        app.settings["automl_table_specs"] = table_specs
+        caches["table_specs"] = table_specs
+
+    trace_exporter = None
+    if config.trace_export_path:
+        trace_exporter = TraceExporter(config.trace_export_path)
+        app.settings["automl_trace_exporter"] = trace_exporter
+
+    REGISTRY.set_collector("caches", cache_collector(caches))
+    REGISTRY.set_collector("coalescer", coalescer_collector(coalescer))
+    REGISTRY.set_collector("watcher", watcher_collector(watcher))
+    REGISTRY.set_collector("upstream", upstream_collector(GUARD))
+    app.settings["automl_metrics"] = REGISTRY
+
+    if config.warm_up:
+        warm_up = WarmUp(app.settings)
+        app.settings["automl_warmup"] = warm_up
+        REGISTRY.set_collector("warmup", warmup_collector(warm_up))
+        warm_up.start()
+
+    refresher = None
+    if config.credential_refresh_margin > 0:
+        refresher = CredentialRefresher(executor, config.credential_refresh_margin)
+        app.settings["automl_credentials"] = refresher
+        refresher.start()
+
+    def shutdown():
+        watcher.stop()
+        if refresher is not None:
+            refresher.stop()
+        clients.close()
+        if table_specs is not None:
+            table_specs.close()
+        if trace_exporter is not None:
+            trace_exporter.close()
+        executor.shutdown(wait=False)
+
+    atexit.register(shutdown)
+
     gcp_v1_endpoint = url_path_join(app.settings["base_url"], "automl", "v1")
     app.add_handlers(
         host_pattern,
@@ -32,8 +153,16 @@ def load_jupyter_server_extension(nb_server_app):
             # (url_path_join(gcp_v1_endpoint, auth'), AuthHandler)
             (url_path_join(gcp_v1_endpoint, "datasets") + "(.*)", ListDatasets),
             (url_path_join(gcp_v1_endpoint, "models") + "(.*)", ListModels),
+            (url_path_join(gcp_v1_endpoint, "resources") + "(.*)", ListResources),
             (url_path_join(gcp_v1_endpoint, "tableInfo") + "(.*)", ListTableInfo),
+            (
+                url_path_join(gcp_v1_endpoint, "columnDetail") + "(.*)",
+                GetColumnDetail,
+            ),
             (url_path_join(gcp_v1_endpoint, "deleteDataset") + "(.*)", DeleteDataset),
             (url_path_join(gcp_v1_endpoint, "deleteModel") + "(.*)", DeleteModel),
+            (url_path_join(gcp_v1_endpoint, "operation") + "(.*)", GetOperation),
+            (url_path_join(gcp_v1_endpoint, "changes") + "(.*)", WatchResources),
+            (url_path_join(gcp_v1_endpoint, "metrics") + "(.*)", GetMetrics),
         ],
     )
@@ -0,0 +1,89 @@
+# Lint as: python3
+"""In-memory cache for AutoML listing responses."""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class TTLCache:
+    """LRU cache whose entries expire ttl seconds after they are stored.
+
+    Expired entries are kept aside, up to max_size of them, for get_stale()
+    to fall back on when the value cannot be fetched again. Invalidation
+    drops them too, and bumps an epoch. A caller that started fetching before an
+    invalidation passes the epoch it saw to set(), and the stale value is
+    dropped instead of overwriting the invalidation.
+    """
+
+    def __init__(self, ttl, max_size, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._stale = OrderedDict()
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    def get(self, key):
+        """Returns the cached value for key, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+                self._stale[key] = entry[1]
+                while len(self._stale) > self.max_size:
+                    self._stale.popitem(last=False)
+            self.misses += 1
+            return None
+
+    def get_stale(self, key):
+        """Returns the value for key even if it expired, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+            return self._stale.get(key)
+
+    def set(self, key, value, epoch=None):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._stale.pop(key, None)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(key, None)
+            self._stale.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._stale.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,87 @@
+# Lint as: python3
+"""Process-wide pool of AutoML clients shared by all request handlers."""
+
+import threading
+
+from notebook.base.handlers import app_log
+
+# Names of grpc.ChannelConnectivity states, compared by name so that grpc
+# is only imported along with the first client.
+UNHEALTHY_STATES = ("TRANSIENT_FAILURE", "SHUTDOWN")
+
+
+class _PooledClient:
+    """An AutoML client plus the last known state of its gRPC channel."""
+
+    def __init__(self, client):
+        self.client = client
+        self.state = None
+        self.channel = getattr(getattr(client, "transport", None), "channel", None)
+        if self.channel is not None:
+            self.channel.subscribe(self._on_state_change)
+
+    def _on_state_change(self, state):
+        self.state = state
+
+    @property
+    def healthy(self):
+        return self.state is None or self.state.name not in UNHEALTHY_STATES
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.unsubscribe(self._on_state_change)
+            self.channel.close()
+
+
+class ClientRegistry:
+    """Hands out AutoML clients from a small pool of reusable channels.
+
+    Clients are created on first use and handed out round robin. A client
+    whose channel reports TRANSIENT_FAILURE or SHUTDOWN is replaced the next
+    time its slot comes up. The location paths used as the parent of list
+    calls are computed once per location and reused.
+    """
+
+    def __init__(self, create_client, create_parent, pool_size=2):
+        self._create_client = create_client
+        self._create_parent = create_parent
+        self._pool_size = max(1, pool_size)
+        self._pool = []
+        self._next = 0
+        self._parents = {}
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        """Returns a healthy client, creating or replacing it if needed."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("AutoML client registry is closed")
+            index = self._next % self._pool_size
+            self._next += 1
+            if index == len(self._pool):
+                self._pool.append(_PooledClient(self._create_client()))
+            elif not self._pool[index].healthy:
+                app_log.info("Replacing unhealthy AutoML client channel")
+                self._pool[index].close()
+                self._pool[index] = _PooledClient(self._create_client())
+            return self._pool[index].client
+
+    def get_parent(self, location):
+        """Returns the location path used as the parent of list calls."""
+        if location not in self._parents:
+            parent = self._create_parent(self.get_client(), location)
+            with self._lock:
+                self._parents[location] = parent
+        return self._parents[location]
+
+    def close(self):
+        """Closes every pooled channel. Further get_client calls fail."""
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, []
+        for pooled in pool:
+            try:
+                pooled.close()
+            except Exception:
+                app_log.exception("Unable to close AutoML client channel")
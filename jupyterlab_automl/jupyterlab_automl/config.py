@@ -0,0 +1,212 @@
+# Lint as: python3
+"""Configuration for the AutoML server extension."""
+
+from traitlets import Bool, Enum, Float, Int, List, Unicode
+from traitlets.config import Configurable
+
+
+class AutoMLConfig(Configurable):
+    """Settings read from the ``AutoMLConfig`` section of the notebook config.
+
+    For example, in ``jupyter_notebook_config.py``::
+
+        c.AutoMLConfig.executor_max_workers = 16
+    """
+
+    executor_max_workers = Int(
+        8,
+        config=True,
+        help="Number of threads used to run blocking AutoML API calls.",
+    )
+
+    executor_max_queue = Int(
+        32,
+        config=True,
+        help=(
+            "Number of AutoML API calls allowed to wait for a free thread "
+            "before new requests are rejected with a 503."
+        ),
+    )
+
+    client_pool_size = Int(
+        2,
+        config=True,
+        help="Number of AutoML clients, each with its own gRPC channel, shared "
+        "by all requests.",
+    )
+
+    listing_cache_ttl = Float(
+        30.0,
+        config=True,
+        help="Seconds a dataset or model listing is served from cache. "
+        "0 disables the cache.",
+    )
+
+    listing_cache_size = Int(
+        64,
+        config=True,
+        help="Maximum number of dataset and model listings kept in cache.",
+    )
+
+    column_spec_concurrency = Int(
+        4,
+        config=True,
+        help="Number of tables of one dataset whose column specs are fetched "
+        "at the same time, on threads of the shared executor.",
+    )
+
+    column_detail_cache_ttl = Float(
+        3600.0,
+        config=True,
+        help="Seconds the detail charts of a column are served from cache.",
+    )
+
+    column_detail_cache_size = Int(
+        1024,
+        config=True,
+        help="Maximum number of column detail charts kept in cache.",
+    )
+
+    locations = List(
+        Unicode(),
+        default_value=["us-central1"],
+        config=True,
+        help="AutoML locations whose datasets and models are listed. The "
+        "locations are queried concurrently.",
+    )
+
+    location_timeout = Float(
+        30.0,
+        config=True,
+        help="Seconds to wait for the listing of one location before "
+        "returning the results of the others.",
+    )
+
+    warm_up = Bool(
+        False,
+        config=True,
+        help="Resolve credentials, create a client and fill the listing cache "
+        "in the background when the server starts.",
+    )
+
+    credential_refresh_margin = Float(
+        300.0,
+        config=True,
+        help="Seconds before the Google Cloud token expires at which it is "
+        "refreshed in the background. 0 or less refreshes only on demand.",
+    )
+
+    compress_responses = Bool(
+        True,
+        config=True,
+        help="Compress JSON responses with brotli, when installed, or gzip "
+        "for clients that accept it.",
+    )
+
+    compression_min_size = Int(
+        1024,
+        config=True,
+        help="Responses smaller than this many bytes are sent uncompressed.",
+    )
+
+    offload_min_size = Int(
+        64 * 1024,
+        config=True,
+        help="Responses of at least this many bytes are compressed on the "
+        "executor rather than the IOLoop. Responses that are not paged are "
+        "always encoded there.",
+    )
+
+    json_encoder = Enum(
+        ["auto", "orjson", "json"],
+        default_value="auto",
+        config=True,
+        help="Library used to encode JSON responses. auto uses orjson when "
+        "it is installed and the standard library otherwise.",
+    )
+
+    table_spec_cache_path = Unicode(
+        "",
+        config=True,
+        help="SQLite file in which processed table specs are kept across "
+        "restarts. Empty uses automl_table_specs.sqlite in the Jupyter "
+        "runtime directory.",
+    )
+
+    table_spec_cache_size = Int(
+        256 * 1024 * 1024,
+        config=True,
+        help="Maximum compressed bytes of table specs kept on disk. 0 or less "
+        "disables the on-disk cache.",
+    )
+
+    change_feed_min_interval = Float(
+        10.0,
+        config=True,
+        help="Seconds between polls of the change feed after datasets or "
+        "models changed.",
+    )
+
+    change_feed_max_interval = Float(
+        300.0,
+        config=True,
+        help="Longest seconds between polls of the change feed. The interval "
+        "doubles up to this after each poll that finds no change.",
+    )
+
+    upstream_max_concurrency = Int(
+        16,
+        config=True,
+        help="Most AutoML calls made at the same time. The limit halves "
+        "whenever AutoML reports it is overloaded and grows back as calls "
+        "succeed.",
+    )
+
+    upstream_retries = Int(
+        3,
+        config=True,
+        help="Times an AutoML call failing with RESOURCE_EXHAUSTED or "
+        "UNAVAILABLE is retried, with jittered exponential backoff.",
+    )
+
+    upstream_retry_delay = Float(
+        0.25,
+        config=True,
+        help="Seconds the backoff before the first retry is drawn up to. It "
+        "doubles with every retry.",
+    )
+
+    circuit_breaker_threshold = Int(
+        5,
+        config=True,
+        help="Consecutive AutoML calls that fail even after their retries "
+        "before calls are paused. Cached data is served while they are.",
+    )
+
+    circuit_breaker_reset = Float(
+        30.0,
+        config=True,
+        help="Seconds AutoML calls are paused for before a trial call.",
+    )
+
+    server_timing = Bool(
+        False,
+        config=True,
+        help="Report the time spent in each phase of a request, such as "
+        "AutoML calls and JSON encoding, in a Server-Timing response header.",
+    )
+
+    slow_request_threshold = Float(
+        1.0,
+        config=True,
+        help="Seconds after which a request is logged as slow, with the time "
+        "spent in each of its phases. 0 or less disables the log.",
+    )
+
+    trace_export_path = Unicode(
+        "",
+        config=True,
+        help="File to which the phases of every request are appended in the "
+        "Chrome trace event format, for chrome://tracing or Perfetto. Empty "
+        "disables the export.",
+    )
@@ -0,0 +1,71 @@
+# Lint as: python3
+"""Background refresh of the Google Cloud credential before it expires."""
+
+from notebook.base.handlers import app_log
+from tornado.ioloop import IOLoop
+
+from jupyterlab_automl.handlers import AuthProvider
+
+# Never reschedule sooner than this, even for a token about to expire
+MIN_DELAY = 1.0
+
+
+class CredentialRefresher:
+    """Refreshes the credential on the executor margin seconds before expiry.
+
+    Requests then find a valid token instead of refreshing it themselves.
+    Until the first request or the warm-up resolves the credential, and
+    after a failed refresh, it checks again every retry_delay seconds.
+    next_delay holds the seconds until the next check.
+    """
+
+    def __init__(self, executor, margin=300.0, retry_delay=30.0):
+        self._executor = executor
+        self._margin = margin
+        self._retry_delay = retry_delay
+        self.next_delay = None
+        self._io_loop = None
+        self._timeout = None
+        self._stopped = False
+
+    def start(self):
+        """Schedules the first refresh once the IOLoop starts."""
+        self._io_loop = IOLoop.current()
+        self._io_loop.add_callback(self.run)
+
+    def stop(self):
+        self._stopped = True
+        if self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+            self._timeout = None
+
+    def _run_blocking(self, fn, *args):
+        return IOLoop.current().run_in_executor(self._executor, fn, *args)
+
+    async def run(self):
+        """Refreshes the credential if it is close to expiry and reschedules."""
+        self._timeout = None
+        if self._stopped:
+            return
+        auth = AuthProvider.current()
+        delay = self._retry_delay
+        if auth is not None:
+            try:
+                delay = await self._refresh(auth)
+            except Exception as e:
+                app_log.warning("Unable to refresh Google Cloud credential: %s", e)
+        if not self._stopped:
+            self.next_delay = max(delay, MIN_DELAY)
+            self._io_loop = IOLoop.current()
+            self._timeout = self._io_loop.call_later(self.next_delay, self.run)
+
+    async def _refresh(self, auth):
+        """Refreshes auth if needed and returns the delay until the next check."""
+        remaining = auth.seconds_until_expiry()
+        if remaining is not None and remaining <= self._margin:
+            await self._run_blocking(auth.refresh, True)
+            remaining = auth.seconds_until_expiry()
+        if remaining is None:
+            # Tokens without an expiry are checked again like missing ones.
+            return self._retry_delay
+        return remaining - self._margin
@@ -0,0 +1,94 @@
+# Lint as: python3
+"""JSON encoding and content-encoding negotiation for handler responses."""
+
+import gzip
+import json
+
+from io import BytesIO
+
+from jupyterlab_automl.records import json_default
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def encode_stdlib(payload):
+    return json.dumps(payload, separators=(",", ":"), default=json_default).encode(
+        "utf-8"
+    )
+
+
+def encode_orjson(payload):
+    try:
+        return orjson.dumps(payload, default=json_default)
+    except TypeError:
+        # orjson rejects integers wider than 64 bits and non-string keys.
+        return encode_stdlib(payload)
+
+
+def get_json_encoder(name="auto"):
+    """Returns a function that encodes a payload as UTF-8 JSON bytes.
+
+    Records from records.py in the payload are encoded by their to_json.
+    "auto" uses orjson when it is installed and the stdlib json otherwise.
+    """
+    if name == "json" or (name == "auto" and orjson is None):
+        return encode_stdlib
+    if orjson is None:
+        raise ValueError("orjson is not installed")
+    return encode_orjson
+
+
+def available_encodings():
+    """Returns the content encodings this server can produce, best first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """Returns the best of the available encodings the client accepts.
+
+    accept_encoding is the Accept-Encoding header. Returns None when the
+    client accepts none of them.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in available or available_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # gzip.compress only takes mtime from Python 3.8
+        buffer = BytesIO()
+        with gzip.GzipFile(
+            fileobj=buffer, mode="wb", compresslevel=GZIP_LEVEL, mtime=0
+        ) as gzip_file:
+            gzip_file.write(body)
+        return buffer.getvalue()
+    raise ValueError("Unsupported encoding " + encoding)
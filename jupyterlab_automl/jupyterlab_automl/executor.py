@@ -0,0 +1,89 @@
+# Lint as: python3
+"""Thread pool used to keep blocking AutoML calls off the IOLoop."""
+
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the executor already holds its maximum amount of work."""
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that rejects work instead of queueing without limit.
+
+    At most max_workers calls run at once and at most max_queue more wait for
+    a thread. Further submissions raise ExecutorBusyError.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        super().__init__(max_workers=max_workers, thread_name_prefix="automl")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError("Too many AutoML requests in progress")
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+def iter_concurrently(fn, items, max_concurrency, executor=None):
+    """Yields fn(item) for each of items, in order, running up to
+    max_concurrency calls at once.
+
+    Helpers run on executor, usually the shared BoundedExecutor, and the
+    calling thread takes items too. So no call waits on a helper that never
+    gets a thread: when the executor is full, the caller does all of them.
+    Without an executor, the calls run one after the other. An exception
+    from fn is raised when its result is reached, and stops the helpers.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    done = [threading.Event() for _ in items]
+    pending = iter(range(len(items)))
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def take():
+        with lock:
+            return None if stopped.is_set() else next(pending, None)
+
+    def run(index):
+        try:
+            results[index] = (True, fn(items[index]))
+        except Exception as e:
+            results[index] = (False, e)
+        done[index].set()
+
+    def work():
+        index = take()
+        while index is not None:
+            run(index)
+            index = take()
+
+    if executor is not None:
+        for _ in range(min(max_concurrency, len(items)) - 1):
+            try:
+                executor.submit(work)
+            except ExecutorBusyError:
+                break
+    try:
+        for index in range(len(items)):
+            while not done[index].is_set():
+                own = take()
+                if own is None:
+                    done[index].wait()
+                else:
+                    run(own)
+            succeeded, result = results[index]
+            if not succeeded:
+                raise result
+            yield result
+    finally:
+        stopped.set()
@@ -1,19 +1,29 @@
 # Lint as: python3
 """Request handler classes for the extensions."""
 
+import asyncio
+import datetime
+import hashlib
 import json
-import tornado.gen as gen
 import math
+import threading
+import time
 
 from collections import namedtuple, defaultdict
+from concurrent.futures import Future
 from enum import Enum
 from notebook.base.handlers import APIHandler, app_log
-from google.cloud import automl_v1beta1
-
-import google.auth
-from google.auth.exceptions import GoogleAuthError
-from google.auth.transport.requests import Request
-
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.locks import Condition
+from tornado.web import HTTPError, authenticated
+
+from jupyterlab_automl.config import AutoMLConfig
+from jupyterlab_automl.encoding import compress, get_json_encoder, negotiate_encoding
+from jupyterlab_automl.executor import ExecutorBusyError, iter_concurrently
+from jupyterlab_automl.index import parse_query
+from jupyterlab_automl import metrics, tracing, upstream
+from jupyterlab_automl.records import ChartData, ColumnSpecs, TableSpecRecord
 from jupyterlab_automl.version import VERSION
 
 SCOPE = ("https://www.googleapis.com/auth/cloud-platform",)
@@ -62,51 +72,100 @@ class Days(Enum):
     Sun = 7
 
 
-class ChartInfo(Enum):
-    name = "name"
-    amount = "Number of Instances"
-
-
 class AuthProvider:
-    """Provides default GCP authentication credential."""
+    """Provides default GCP authentication credential.
+
+    Concurrent refreshes collapse into one: the first caller refreshes and
+    the others wait for its result, or its exception.
+    """
 
     _instance = None
+    _instance_lock = threading.Lock()
 
     def __init__(self):
+        # google.auth and the AutoML client are imported on first use, so
+        # loading the extension does not pay for gRPC and protobuf.
+        import google.auth
+
         self._auth, self._project = google.auth.default(scopes=SCOPE)
+        self._lock = threading.Lock()
+        self._refreshing = None
 
     @property
     def project(self):
         return self._project
 
-    def refresh(self):
-        if not self._auth.valid:
-            app_log.info("Refreshing Google Cloud Credential")
-            try:
-                self._auth.refresh(Request())
-            except GoogleAuthError:
-                msg = "Unable to refresh Google Cloud Credential"
-                app_log.exception(msg)
-                raise
+    @property
+    def credentials(self):
+        """The credential refreshed here, shared by every AutoML client."""
+        return self._auth
+
+    def seconds_until_expiry(self):
+        """Returns the lifetime left of the token, or None if it has no expiry."""
+        expiry = getattr(self._auth, "expiry", None)
+        if expiry is None:
+            return None
+        return (expiry - datetime.datetime.utcnow()).total_seconds()
+
+    def refresh(self, force=False):
+        """Refreshes the credential if it is invalid, or always with force."""
+        with self._lock:
+            if not force and self._auth.valid:
+                return
+            refreshing = self._refreshing
+            owner = refreshing is None
+            if owner:
+                refreshing = self._refreshing = Future()
+        if not owner:
+            metrics.CREDENTIAL_REFRESHES_JOINED.inc()
+            return refreshing.result()
+
+        from google.auth.transport.requests import Request
+
+        app_log.info("Refreshing Google Cloud Credential")
+        start = time.perf_counter()
+        try:
+            self._auth.refresh(Request())
+            refreshing.set_result(None)
+        except Exception as e:
+            metrics.CREDENTIAL_REFRESH_ERRORS.inc(type(e).__name__)
+            app_log.exception("Unable to refresh Google Cloud Credential")
+            refreshing.set_exception(e)
+            raise
+        finally:
+            metrics.CREDENTIAL_REFRESH_SECONDS.observe(time.perf_counter() - start)
+            with self._lock:
+                self._refreshing = None
 
     def get_header(self):
         return {"Authorization": "Bearer {}".format(self._auth.token)}
 
     @classmethod
+    def current(cls):
+        """Returns the provider if a credential was resolved yet, or None."""
+        return cls._instance
+
+    @classmethod
+    @metrics.timed("AuthProvider.get")
     def get(cls):
         if not cls._instance:
-            auth = AuthProvider()
-            cls._instance = auth
+            with cls._instance_lock:
+                if not cls._instance:
+                    cls._instance = AuthProvider()
         cls._instance.refresh()
         return cls._instance
 
 
 def create_automl_client():
-    return automl_v1beta1.AutoMlClient()
+    from google.cloud import automl_v1beta1
+
+    # Clients use the provider's credential, so its single-flight and
+    # background refreshes keep their token valid.
+    return automl_v1beta1.AutoMlClient(credentials=AuthProvider.get().credentials)
 
 
-def create_automl_parent(client):
-    return client.location_path(AuthProvider.get().project, "us-central1")
+def create_automl_parent(client, location="us-central1"):
+    return client.location_path(AuthProvider.get().project, location)
 
 
 def get_bucket_label(bucket):
@@ -119,130 +178,254 @@ def get_bucket_label(bucket):
 
 
 def get_detail_panel(column_spec, count):
-    chart_data = []
+    """Returns the charts and figures of a column's detail panel.
+
+    Charts are ChartData, encoded as lists of name and amount records.
+    """
     if column_spec.data_type.type_code == 3:
-        mean = round(column_spec.data_stats.float64_stats.mean, 2)
-        standard_deviation = round(
-            column_spec.data_stats.float64_stats.standard_deviation, 2
-        )
-        for bucket in column_spec.data_stats.float64_stats.histogram_buckets:
-            chart_data.append(
-                {
-                    ChartInfo.name.value: get_bucket_label(bucket),
-                    ChartInfo.amount.value: bucket.count,
-                }
-            )
+        float64_stats = column_spec.data_stats.float64_stats
+        mean = round(float64_stats.mean, 2)
+        standard_deviation = round(float64_stats.standard_deviation, 2)
+        chart_data = ChartData()
+        for bucket in float64_stats.histogram_buckets:
+            chart_data.append(get_bucket_label(bucket), bucket.count)
         return [chart_data, mean, standard_deviation]
     elif column_spec.data_type.type_code == 10:
+        top_category_stats = column_spec.data_stats.category_stats.top_category_stats
         try:
-            div = (
-                column_spec.data_stats.category_stats.top_category_stats[0].count
-                / count
-            )
+            div = top_category_stats[0].count / count
             rounded = round(div * 100, 3)
-            most_common = (
-                column_spec.data_stats.category_stats.top_category_stats[0].value
-                + " ("
-                + str(rounded)
-                + "%)"
-            )
+            most_common = top_category_stats[0].value + " (" + str(rounded) + "%)"
         except:
             most_common = ""
-        for stat in column_spec.data_stats.category_stats.top_category_stats:
-            chart_data.append(
-                {ChartInfo.name.value: stat.value, ChartInfo.amount.value: stat.count}
-            )
+        chart_data = ChartData()
+        for stat in top_category_stats:
+            chart_data.append(stat.value, stat.count)
         return [chart_data, most_common]
     elif column_spec.data_type.type_code == 4:
-        month_chart = []
-        day_chart = []
-        time_chart = []
-        for month, amount in dict(
-            column_spec.data_stats.timestamp_stats.granular_stats[
-                "month_of_year"
-            ].buckets
-        ).items():
-            month_chart.append(
-                {
-                    ChartInfo.name.value: Months(month).name,
-                    ChartInfo.amount.value: amount,
-                }
-            )
-        for day, amount in dict(
-            column_spec.data_stats.timestamp_stats.granular_stats["day_of_week"].buckets
-        ).items():
-            day_chart.append(
-                {ChartInfo.name.value: Days(day).name, ChartInfo.amount.value: amount}
-            )
-        for hour, amount in dict(
-            column_spec.data_stats.timestamp_stats.granular_stats["hour_of_day"].buckets
-        ).items():
-            time_chart.append(
-                {
-                    ChartInfo.name.value: str(hour) + ":00",
-                    ChartInfo.amount.value: amount,
-                }
-            )
+        granular_stats = column_spec.data_stats.timestamp_stats.granular_stats
+        month_chart = ChartData()
+        day_chart = ChartData()
+        time_chart = ChartData()
+        for month, amount in dict(granular_stats["month_of_year"].buckets).items():
+            month_chart.append(Months(month).name, amount)
+        for day, amount in dict(granular_stats["day_of_week"].buckets).items():
+            day_chart.append(Days(day).name, amount)
+        for hour, amount in dict(granular_stats["hour_of_day"].buckets).items():
+            time_chart.append(str(hour) + ":00", amount)
         return [month_chart, day_chart, time_chart]
     else:
         return []
 
 
-def get_column_specs(client, table_spec):
-    column_specs = []
+@metrics.timed("get_column_specs")
+def get_column_specs(client, table_spec, columnar=False):
+    pages = tracing.traced_pages(
+        "list_column_specs",
+        iter_pages(client.list_column_specs(table_spec.name)),
+        table=table_spec.name,
+    )
+    gcp_column_specs = [column_spec for page in pages for column_spec in page]
+    with tracing.span("summarize_column_specs"):
+        return summarize_column_specs(table_spec, gcp_column_specs, columnar)
+
+
+@upstream.guarded("get_column_specs")
+def get_column_specs_guarded(client, table_spec, columnar=False):
+    """get_column_specs as a guarded call, for callers not guarded already."""
+    return get_column_specs(client, table_spec, columnar)
+
+
+@metrics.timed("list_table_specs")
+@upstream.guarded("list_table_specs")
+def list_table_specs(client, datasetId):
+    return list(client.list_table_specs(datasetId))
+
+
+def get_column_type(column_spec):
+    try:
+        return ColumnType(column_spec.data_type.type_code).name
+    except:
+        return ColumnType.Unrecognized.name
+
+
+def summarize_column_specs(table_spec, gcp_column_specs, columnar=False):
+    """Returns the ColumnSpecs of a table and the ChartData of its columns
+    per type.
+
+    With columnar, the column specs encode as one array per field instead,
+    and nullValueCount is the bare count; the client derives the percentage
+    from the rowCount of the table.
+    """
+    row_count = table_spec.row_count
+    column_specs = ColumnSpecs(row_count, columnar)
     type_summary = defaultdict(int)
-    for column_spec in client.list_column_specs(table_spec.name):
-        try:
-            type_code = ColumnType(column_spec.data_type.type_code).name
-        except:
-            type_code = ColumnType.unrecognized.name
-        detail_panel = get_detail_panel(
-            column_spec, table_spec.row_count - column_spec.data_stats.null_value_count
-        )
+    for column_spec in gcp_column_specs:
+        type_code = get_column_type(column_spec)
         type_summary[type_code] += 1
+        stats = column_spec.data_stats
         column_specs.append(
-            {
-                "id": column_spec.name,
-                "dataType": type_code,
-                "displayName": column_spec.display_name,
-                "distinctValueCount": column_spec.data_stats.distinct_value_count,
-                "invalidValueCount": table_spec.row_count
-                - column_spec.data_stats.valid_value_count,
-                "nullValueCount": str(column_spec.data_stats.null_value_count)
-                + " ("
-                + str(
-                    math.floor(
-                        column_spec.data_stats.null_value_count
-                        / table_spec.row_count
-                        * 100
-                    )
-                )
-                + "%)",
-                "nullable": column_spec.data_type.nullable,
-                "detailPanel": detail_panel,
-            }
+            column_spec.name,
+            type_code,
+            column_spec.display_name,
+            stats.distinct_value_count,
+            row_count - stats.valid_value_count,
+            stats.null_value_count,
+            column_spec.data_type.nullable,
         )
-    columns_summary = []
-    for key, val in type_summary.items():
-        columns_summary.append({ChartInfo.name.value: key, ChartInfo.amount.value: val})
-    return column_specs, columns_summary
-
-
-def get_table_specs(client, datasetId):
-    table_specs = []
-    for table_spec in client.list_table_specs(datasetId):
-        column_spec, chart_summary = get_column_specs(client, table_spec)
-        table_specs.append(
-            {
-                "id": table_spec.name,
-                "rowCount": table_spec.row_count,
-                "validRowCount": table_spec.valid_row_count,
-                "columnCount": table_spec.column_count,
-                "columnSpecs": column_spec,
-                "chartSummary": chart_summary,
-            }
+    return column_specs, ChartData(type_summary.keys(), type_summary.values())
+
+
+def iter_pages(results):
+    """Yields the items of an AutoML list call one upstream page at a time."""
+    pages = getattr(results, "pages", None)
+    if pages is None:
+        yield list(results)
+        return
+    for page in pages:
+        yield list(page)
+
+
+@metrics.timed("get_column_detail")
+@upstream.guarded("get_column_detail")
+def get_column_detail(client, columnSpecId):
+    """Returns the detail panel charts of one column spec."""
+    column_spec = client.get_column_spec(columnSpecId)
+    table_spec = client.get_table_spec(columnSpecId.split("/columnSpecs/")[0])
+    count = table_spec.row_count - column_spec.data_stats.null_value_count
+    with tracing.span("get_detail_panel"):
+        return {"detailPanel": get_detail_panel(column_spec, count)}
+
+
+@metrics.timed("get_stats_update_time")
+@upstream.guarded("get_stats_update_time")
+def get_stats_update_time(client, datasetId):
+    dataset = client.get_dataset(datasetId)
+    return dataset.tables_dataset_metadata.stats_update_time.ToMilliseconds()
+
+
+def get_page(results, page_token):
+    """Returns one upstream page of an AutoML list call and the next token.
+
+    results must be a pager that has not been iterated yet. The returned
+    token is empty when there are no more pages.
+    """
+    results.next_page_token = page_token or None
+    page = next(results.pages, [])
+    return list(page), results.next_page_token or ""
+
+
+def parse_page_token(page_token):
+    """Splits a "<index>:<upstream token>" page token.
+
+    These tokens walk through several upstream listings, such as the tables
+    of a dataset or the configured locations, one after the other.
+    """
+    index, _, upstream_token = (page_token or "0:").partition(":")
+    index = int(index)
+    if index < 0:
+        raise ValueError("Negative page token index")
+    return index, upstream_token
+
+
+def make_page_token(index, upstream_token, count):
+    """Returns the token of the page after one from listing index of count."""
+    if upstream_token:
+        return "{}:{}".format(index, upstream_token)
+    if index + 1 < count:
+        return "{}:".format(index + 1)
+    return ""
+
+
+def get_table_spec(table_spec, column_specs, chart_summary):
+    return TableSpecRecord(
+        table_spec.name,
+        table_spec.row_count,
+        table_spec.valid_row_count,
+        table_spec.column_count,
+        column_specs,
+        chart_summary,
+    )
+
+
+def iter_table_specs(
+    client, datasetId, max_concurrency=4, columnar=False, executor=None, guarded=False
+):
+    """Yields each table spec of a dataset, with its column specs, as a page.
+
+    Column specs of up to max_concurrency tables are fetched at once, on
+    executor and the calling thread. The output keeps the order of
+    list_table_specs. With guarded, listing the tables and the column specs
+    of each table are guarded calls of their own, for streams that are not
+    run within one.
+    """
+    with tracing.span("list_table_specs"):
+        if guarded:
+            table_specs = list_table_specs(client, datasetId)
+        else:
+            table_specs = list(client.list_table_specs(datasetId))
+    fetch = get_column_specs_guarded if guarded else get_column_specs
+    columns = iter_concurrently(
+        tracing.bind(lambda spec: fetch(client, spec, columnar)),
+        table_specs,
+        max_concurrency,
+        executor,
+    )
+    for table_spec, column_specs in zip(table_specs, columns):
+        yield [get_table_spec(table_spec, *column_specs)]
+
+
+@metrics.timed("get_table_specs")
+@upstream.guarded("get_table_specs")
+def get_table_specs(
+    client, datasetId, max_concurrency=4, columnar=False, executor=None
+):
+    pages = iter_table_specs(client, datasetId, max_concurrency, columnar, executor)
+    return {"tableSpecs": [spec for page in pages for spec in page]}
+
+
+@metrics.timed("get_table_specs_page")
+@upstream.guarded("get_table_specs_page")
+def get_table_specs_page(
+    client, datasetId, page_size, table_index=0, column_token="", columnar=False
+):
+    """Returns one page of column specs of one table of a dataset.
+
+    Pages walk through the tables in list_table_specs order. The page token
+    is "<table index>:<column spec page token>", split by parse_page_token.
+    The chartSummary of each page only counts the columns of that page.
+    """
+    with tracing.span("list_table_specs"):
+        table_specs = list(client.list_table_specs(datasetId))
+    if table_index >= len(table_specs):
+        return {"tableSpecs": [], "nextPageToken": ""}
+
+    table_spec = table_specs[table_index]
+    with tracing.span("list_column_specs", table=table_spec.name):
+        results = client.list_column_specs(table_spec.name, page_size=page_size)
+        gcp_column_specs, column_token = get_page(results, column_token)
+    with tracing.span("summarize_column_specs"):
+        column_specs, chart_summary = summarize_column_specs(
+            table_spec, gcp_column_specs, columnar
         )
-    return {"tableSpecs": table_specs}
+    return {
+        "tableSpecs": [get_table_spec(table_spec, column_specs, chart_summary)],
+        "nextPageToken": make_page_token(table_index, column_token, len(table_specs)),
+    }
+
+
+def parse_location(resource_name):
+    """Returns the location of a dataset or model resource name.
+
+    Listings are cached by location rather than by location path, as
+    resource names hold the project number where paths hold its id.
+    """
+    parts = resource_name.split("/")
+    return parts[3] if len(parts) > 3 else ""
+
+
+def tag_location(records, location):
+    return [dict(record, location=location) for record in records]
 
 
 def parse_dataset_type(dataset):
@@ -271,143 +454,1094 @@ def get_dataset_metadata(dataset):
     return dataset_type, metadata
 
 
+def get_dataset(dataset):
+    """Returns the record for a dataset, or None if its type is unsupported."""
+    dataset_type, metadata = get_dataset_metadata(dataset)
+    if dataset_type == DatasetType.other.value:
+        return None
+    return {
+        "id": dataset.name,
+        "displayName": dataset.display_name,
+        "description": dataset.description,
+        "createTime": dataset.create_time.ToMilliseconds(),
+        "exampleCount": dataset.example_count,
+        "datasetType": dataset_type,
+        "metadata": metadata,
+    }
+
+
+def iter_datasets(client, parent):
+    for page in iter_pages(client.list_datasets(parent)):
+        datasets = [get_dataset(dataset) for dataset in page]
+        yield [dataset for dataset in datasets if dataset is not None]
+
+
+@metrics.timed("get_datasets")
+@upstream.guarded("get_datasets")
 def get_datasets(client, parent):
-    datasets = []
-    for dataset in client.list_datasets(parent):
-        dataset_type, metadata = get_dataset_metadata(dataset)
-        if dataset_type != DatasetType.other.value:
-            datasets.append(
-                {
-                    "id": dataset.name,
-                    "displayName": dataset.display_name,
-                    "description": dataset.description,
-                    "createTime": dataset.create_time.ToMilliseconds(),
-                    "exampleCount": dataset.example_count,
-                    "datasetType": dataset_type,
-                    "metadata": metadata,
-                }
-            )
-    return {"datasets": datasets}
+    pages = iter_datasets(client, parent)
+    return {"datasets": [dataset for page in pages for dataset in page]}
 
 
+@metrics.timed("get_datasets_page")
+@upstream.guarded("get_datasets_page")
+def get_datasets_page(client, parent, page_size, page_token=""):
+    results = client.list_datasets(parent, page_size=page_size)
+    page, next_page_token = get_page(results, page_token)
+    datasets = [get_dataset(dataset) for dataset in page]
+    return {
+        "datasets": [dataset for dataset in datasets if dataset is not None],
+        "nextPageToken": next_page_token,
+    }
+
+
+def get_model(model):
+    return {
+        "id": model.name,
+        "displayName": model.display_name,
+        "datasetId": model.dataset_id,
+        "updateTime": model.update_time.ToMilliseconds(),
+        "deploymentState": model.deployment_state,
+        "metadata": "",
+    }
+
+
+def iter_models(client, parent):
+    for page in iter_pages(client.list_models(parent)):
+        yield [get_model(model) for model in page]
+
+
+@metrics.timed("get_models")
+@upstream.guarded("get_models")
 def get_models(client, parent):
-    models = client.list_models(parent)
+    pages = iter_models(client, parent)
+    return {"models": [model for page in pages for model in page]}
+
+
+@metrics.timed("get_models_page")
+@upstream.guarded("get_models_page")
+def get_models_page(client, parent, page_size, page_token=""):
+    results = client.list_models(parent, page_size=page_size)
+    page, next_page_token = get_page(results, page_token)
     return {
-        "models": [
-            {
-                "id": model.name,
-                "displayName": model.display_name,
-                "datasetId": model.dataset_id,
-                "updateTime": model.update_time.ToMilliseconds(),
-                "deploymentState": model.deployment_state,
-                "metadata": "",
-            }
-            for model in models
-        ]
+        "models": [get_model(model) for model in page],
+        "nextPageToken": next_page_token,
     }
 
 
-class ListDatasets(APIHandler):
-    """Handles getting the datasets from GCP for the project."""
+@metrics.timed("delete_dataset")
+@upstream.guarded("delete_dataset")
+def delete_dataset(client, datasetId):
+    return client.delete_dataset(datasetId)
 
-    automl_client = None
-    parent = None
 
-    @gen.coroutine
-    def get(self, input=""):
+@metrics.timed("delete_model")
+@upstream.guarded("delete_model")
+def delete_model(client, modelId):
+    return client.delete_model(modelId)
+
+
+class SharedPages:
+    """Pages of one stream, produced once and read by any number of readers.
+
+    Used from the IOLoop thread only. Every reader gets every page, also
+    those produced before it started reading, and then the exception the
+    producer failed with, if any.
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.done = False
+        self.error = None
+        self._changed = Condition()
+
+    async def produce(self, pages, on_complete=None):
+        """Appends the pages of an async iterator, then awaits on_complete."""
         try:
-            if not self.automl_client:
-                self.automl_client = create_automl_client()
+            async for page in pages:
+                self.pages.append(page)
+                self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        self.done = True
+        self._changed.notify_all()
+        if on_complete is not None and self.error is None:
+            await on_complete(self.pages)
+
+    async def read(self):
+        """Yields every page as it is produced."""
+        index = 0
+        while True:
+            if index < len(self.pages):
+                yield self.pages[index]
+                index += 1
+            elif self.error is not None:
+                raise self.error
+            elif self.done:
+                return
+            else:
+                await self._changed.wait()
+
+
+class Coalescer:
+    """Shares one in-flight upstream call between callers with the same key.
+
+    Used from the IOLoop thread only. Every caller gets the same result, or
+    the same exception. A caller that is cancelled, for example by a timeout,
+    does not cancel the call for the others. Keys are tuples whose first
+    item names the kind of call, which stats() counts by.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._streams = {}
+        self._calls = defaultdict(int)
+        self._deduplicated = defaultdict(int)
+
+    async def run(self, key, call):
+        """Returns await call(), or the result of the same call in flight."""
+        future = self._in_flight.get(key)
+        if future is None:
+            self._calls[key[0]] += 1
+            future = asyncio.ensure_future(call())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self._deduplicated[key[0]] += 1
+        return await asyncio.shield(future)
+
+    def share_pages(self, key, pages, on_complete=None):
+        """Returns an async iterator over the pages of the stream for key.
+
+        The first caller's pages, an async iterator, are produced in the
+        background until they run out, and on_complete(pages) is awaited
+        once they all have been. Callers arriving meanwhile read the same
+        pages, and their own are never iterated.
+        """
+        shared = self._streams.get(key)
+        if shared is None:
+            self._calls[key[0]] += 1
+            shared = SharedPages()
+            self._streams[key] = shared
+            task = asyncio.ensure_future(shared.produce(pages, on_complete))
+            task.add_done_callback(lambda _: self._streams.pop(key, None))
+        else:
+            self._deduplicated[key[0]] += 1
+        return shared.read()
+
+    def stats(self):
+        return {
+            "calls": dict(self._calls),
+            "deduplicated": dict(self._deduplicated),
+            "in_flight": len(self._in_flight) + len(self._streams),
+        }
+
+
+class AutoMLHandler(APIHandler):
+    """Base handler that runs blocking AutoML calls on the extension executor.
+
+    Each request is traced when server_timing, slow_request_threshold or
+    trace_export_path asks for it. Spans recorded while serving it, also on
+    executor threads, are reported in a Server-Timing header, logged when
+    the request is slow, and exported.
+    """
+
+    # Whether requests are traced at all, off for long-lived streams
+    traced = True
+    _trace = None
+    # Set by prepare, which requests rejected before it never reach
+    _started = None
+
+    def prepare(self):
+        self._started = time.perf_counter()
+        metrics.REQUESTS_IN_FLIGHT.inc(type(self).__name__)
+        config = self.automl_config
+        if self.traced and (
+            config.server_timing
+            or config.slow_request_threshold > 0
+            or self.trace_exporter is not None
+        ):
+            self._trace = tracing.Trace(
+                "{} {}".format(self.request.method, self.request.path)
+            )
+            tracing.activate(self._trace)
+        return super().prepare()
+
+    def finish(self, *args, **kwargs):
+        trace = self._trace
+        if (
+            trace is not None
+            and self.automl_config.server_timing
+            and not self._headers_written
+        ):
+            # Streamed responses sent their headers before any span ended.
+            self.set_header("Server-Timing", trace.server_timing())
+        return super().finish(*args, **kwargs)
+
+    def on_finish(self):
+        handler = type(self).__name__
+        if self._started is not None:
+            metrics.REQUESTS_IN_FLIGHT.dec(handler)
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - self._started, handler, self.request.method
+            )
+        if self.get_status() >= 400:
+            metrics.REQUEST_ERRORS.inc(handler, str(self.get_status()))
+        if self._trace is not None:
+            self.report_trace(self._trace)
+        super().on_finish()
+
+    def report_trace(self, trace):
+        """Logs trace if the request was slow, and exports it."""
+        seconds = trace.finish()
+        threshold = self.automl_config.slow_request_threshold
+        if 0 < threshold <= seconds:
+            app_log.warning(
+                "Slow request %s took %.3fs: %s", trace.name, seconds, trace.summary()
+            )
+        if self.trace_exporter is not None:
+            self.trace_exporter.export(trace)
+
+    @property
+    def clients(self):
+        return self.settings["automl_clients"]
+
+    @property
+    def listings(self):
+        return self.settings["automl_listings"]
+
+    @property
+    def column_details(self):
+        return self.settings["automl_column_details"]
+
+    @property
+    def operations(self):
+        return self.settings["automl_operations"]
+
+    @property
+    def coalescer(self):
+        return self.settings["automl_coalescer"]
+
+    @property
+    def listing_indexes(self):
+        return self.settings["automl_listing_indexes"]
+
+    @property
+    def table_spec_store(self):
+        """The on-disk table spec cache, or None if it is disabled."""
+        return self.settings.get("automl_table_specs")
+
+    @property
+    def trace_exporter(self):
+        """The exporter of request traces, or None if they are not exported."""
+        return self.settings.get("automl_trace_exporter")
 
-            if not self.parent:
-                self.parent = create_automl_parent(self.automl_client)
+    @property
+    def automl_config(self):
+        return self.settings.get("automl_config") or AutoMLConfig()
+
+    def run_blocking(self, fn, *args):
+        """Runs fn(*args) on the executor and returns an awaitable result."""
+        return IOLoop.current().run_in_executor(
+            self.settings["automl_executor"], tracing.bind(fn), *args
+        )
 
-            self.finish(json.dumps(get_datasets(self.automl_client, self.parent)))
+    def run_coalesced(self, key, fn, *args):
+        """Like run_blocking, but shares the call with concurrent requests
+        for the same key."""
+        return self.coalescer.run(key, lambda: self.run_blocking(fn, *args))
 
+    @property
+    def wants_ndjson(self):
+        return self.get_argument("format", "json") == "ndjson"
+
+    @property
+    def wants_columnar(self):
+        """Whether ?columnar=1 asked for column specs as one array per field."""
+        return self.get_argument("columnar", "0") == "1"
+
+    @property
+    def page_size(self):
+        """The pageSize argument, or None when the request is not paged."""
+        page_size = self.get_argument("pageSize", None)
+        if page_size is None:
+            return None
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if page_size <= 0:
+            raise HTTPError(400, "pageSize must be a positive integer")
+        return page_size
+
+    def get_listing_query(self, resources):
+        """Returns the filter, sort and q arguments as a ListingQuery, or None.
+
+        Every field must apply to one of resources.
+        """
+        try:
+            query = parse_query(
+                self.get_argument("filter", ""),
+                self.get_argument("sort", ""),
+                self.get_argument("q", ""),
+            )
+            if query is not None:
+                query.validate(resources)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return query
+
+    def page_records(self, listing, resource, token_argument="pageToken"):
+        """Returns one pageSize page of a queried listing.
+
+        The page token is the offset of the page in the matching records.
+        """
+        token = self.get_argument(token_argument, "") or "0"
+        if not token.isdigit():
+            raise HTTPError(400, "Invalid " + token_argument)
+        start = int(token)
+        end = start + self.page_size
+        records = listing[resource]
+        page = dict(listing)
+        page[resource] = records[start:end]
+        page["nextPageToken"] = str(end) if end < len(records) else ""
+        return page
+
+    def get_page_token(self, argument="pageToken"):
+        """Returns the page token argument split by parse_page_token."""
+        try:
+            return parse_page_token(self.get_argument(argument, ""))
+        except ValueError:
+            raise HTTPError(400, "Invalid " + argument)
+
+    async def get_page(self, resource, fetch_page, token_argument="pageToken"):
+        """Returns fetch_page(client, parent, pageSize, pageToken).
+
+        Pages walk through the configured locations in order. Records are
+        tagged with the location they come from. A location that fails or
+        takes longer than location_timeout is skipped for the next one and
+        reported under "errors". The first page only fails when every
+        location does.
+        """
+        locations = self.automl_config.locations
+        index, page_token = self.get_page_token(token_argument)
+        first_page = index == 0 and not page_token
+        errors = []
+        while index < len(locations):
+            location = locations[index]
+            try:
+                page = await self.get_location_page(
+                    resource, fetch_page, location, page_token
+                )
+            except Exception as e:
+                app_log.warning("Unable to list %s in %s: %s", resource, location, e)
+                errors.append({"location": location, "message": str(e)})
+                if first_page and len(errors) == len(locations):
+                    raise
+                index, page_token = index + 1, ""
+                continue
+            result = {
+                resource: tag_location(page[resource], location),
+                "nextPageToken": make_page_token(
+                    index, page["nextPageToken"], len(locations)
+                ),
+            }
+            break
+        else:
+            result = {resource: [], "nextPageToken": ""}
+        if errors:
+            result["errors"] = errors
+        return result
+
+    async def get_location_page(self, resource, fetch_page, location, page_token):
+        timeout = self.automl_config.location_timeout
+        parent = await self.run_blocking(self.clients.get_parent, location)
+        client = await self.run_blocking(self.clients.get_client)
+        try:
+            return await asyncio.wait_for(
+                self.run_coalesced(
+                    (resource + "Page", parent, self.page_size, page_token),
+                    fetch_page,
+                    client,
+                    parent,
+                    self.page_size,
+                    page_token,
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                "Listing {} in {} timed out after {}s".format(
+                    resource, location, timeout
+                )
+            )
+
+    def get_cached_listing(self, key):
+        """Returns the cached listing for key unless the request has ?fresh=1."""
+        if self.get_argument("fresh", "0") == "1":
+            return None
+        listing = self.listings.get(key)
+        if listing is not None:
+            self.set_header("X-AutoML-Cache", "hit")
+        return listing
+
+    async def get_listing(self, resource, fetch, location):
+        """Returns fetch(client, parent), cached per resource and location.
+
+        While AutoML is overloaded, an expired listing is returned instead.
+        """
+        parent = await self.run_blocking(self.clients.get_parent, location)
+        key = (resource, location)
+        listing = self.get_cached_listing(key)
+        if listing is not None:
+            return listing
+        epoch = self.listings.epoch
+        client = await self.run_blocking(self.clients.get_client)
+        try:
+            listing = await self.run_coalesced(key, fetch, client, parent)
         except Exception as e:
+            listing = self.listings.get_stale(key)
+            if listing is None or not upstream.is_unavailable(e):
+                raise
+            app_log.warning("Serving a stale %s listing: %s", resource, e)
+            self.set_header("X-AutoML-Cache", "stale")
+            return listing
+        self.listings.set(key, listing, epoch)
+        self.set_header("X-AutoML-Cache", "miss")
+        return listing
+
+    async def get_location_listing(self, resource, fetch, location):
+        timeout = self.automl_config.location_timeout
+        try:
+            return await asyncio.wait_for(
+                self.get_listing(resource, fetch, location), timeout
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                "Listing {} in {} timed out after {}s".format(
+                    resource, location, timeout
+                )
+            )
+
+    async def get_listings(self, resource, fetch, query=None):
+        """Lists resource in every configured location concurrently.
+
+        Locations that fail or time out are left out and reported under
+        "errors". The request only fails when every location fails. With a
+        ListingQuery, only the matching records are returned, looked up in
+        the index of the listings.
+        """
+        locations = self.automl_config.locations
+        results = await asyncio.gather(
+            *[
+                self.get_location_listing(resource, fetch, location)
+                for location in locations
+            ],
+            return_exceptions=True,
+        )
+        listed = []
+        errors = []
+        for location, result in zip(locations, results):
+            if isinstance(result, Exception):
+                app_log.warning("Unable to list %s in %s", resource, location)
+                errors.append({"location": location, "message": str(result)})
+            else:
+                listed.append((location, result))
+        if errors and len(errors) == len(results):
+            raise results[0]
+
+        def tag_records():
+            return [
+                record
+                for location, result in listed
+                for record in tag_location(result[resource], location)
+            ]
+
+        if query is None:
+            records = tag_records()
+        else:
+            sources = [result for _, result in listed]
+            index = self.listing_indexes.get(resource, sources, tag_records)
+            records = index.query(query)
+        listing = {resource: records}
+        if errors:
+            listing["errors"] = errors
+        return listing
+
+    async def stream_listing(self, resource, iterate):
+        """Streams iterate(client, parent) for each location as NDJSON.
+
+        Locations are streamed one after the other, from the listing cache
+        when possible. Records are tagged with their location. The upstream
+        pages are not guarded: a pager cannot be retried part way through,
+        and holding a limiter slot while the client reads would starve
+        other calls.
+        """
+        for location in self.automl_config.locations:
+            parent = await self.run_blocking(self.clients.get_parent, location)
+            listing = self.get_cached_listing((resource, location))
+            if listing is not None:
+                pages = iter([listing[resource]])
+            else:
+                client = await self.run_blocking(self.clients.get_client)
+                pages = iterate(client, parent)
+            await self.write_ndjson(tag_location(page, location) for page in pages)
+
+    async def iter_blocking(self, pages):
+        """Yields the pages of an iterator, each fetched on the executor."""
+        while True:
+            page = await self.run_blocking(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def write_ndjson(self, pages):
+        """Writes one JSON record per line, flushing after every page.
+
+        pages is an iterator, whose pages are fetched on the executor, or an
+        async iterator.
+        """
+        self.set_header("Content-Type", "application/x-ndjson")
+        encode_json = get_json_encoder(self.automl_config.json_encoder)
+        if not hasattr(pages, "__anext__"):
+            pages = self.iter_blocking(pages)
+        async for page in pages:
+            self.write(b"".join(encode_json(record) + b"\n" for record in page))
+            await self.flush()
+        if not self._headers_written:
+            # Without a page, finish would send a JSON content type
+            await self.flush()
+
+    async def delete_resources(self, kind, id_key, delete):
+        """Starts delete(client, id) for the ids named in the request body.
+
+        The body holds either one id under id_key, or a list under id_key
+        plus "s". A list is answered with the operation handle right away.
+        """
+        body = self.get_json_body()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        batched = id_key + "s" in body
+        resource_ids = body[id_key + "s"] if batched else [body.get(id_key)]
+        if not (
+            isinstance(resource_ids, list)
+            and resource_ids
+            and all(isinstance(id, str) and id for id in resource_ids)
+        ):
+            raise HTTPError(400, "Expected {} or a list of {}s".format(id_key, id_key))
+        clients = self.clients
+        batch = self.operations.start(
+            kind, resource_ids, lambda id: delete(clients.get_client(), id)
+        )
+        if batched:
+            self.finish(json.dumps(batch.to_json()))
+            return
+
+        await asyncio.gather(*batch.tasks)
+        error = batch.errors.get(resource_ids[0])
+        if error is not None:
+            raise error
+        message = "{} deleted".format(kind[:-1])
+        self.finish({"success": {"message": message}, "operationId": batch.id})
+
+    def make_etag(self, *parts):
+        """Returns an ETag for parts combined with the request's query."""
+        sha1 = hashlib.sha1()
+        for part in parts + (self.request.query,):
+            if not isinstance(part, bytes):
+                part = str(part).encode("utf-8")
+            sha1.update(part + b"\n")
+        return '"{}"'.format(sha1.hexdigest())
+
+    def not_modified(self, etag):
+        """Sets the ETag header and returns whether the client already has it."""
+        self.set_header("Etag", etag)
+        return self.check_etag_header()
+
+    async def finish_json(self, payload, etag=None):
+        """Finishes with payload as JSON, or a 304 if the client's copy matches.
+
+        Without an etag, a hash of the JSON body is used. Bodies of at least
+        compression_min_size bytes are compressed if the client accepts it.
+        """
+        body = None
+        if etag is None:
+            body = await self.encode_json(payload)
+            etag = self.make_etag(body)
+        if self.not_modified(etag):
+            self.set_status(304)
+            self.finish()
+            return
+        if body is None:
+            body = await self.encode_json(payload)
+        self.finish(await self.compress_body(body))
+
+    async def run_offloaded(self, fn, *args):
+        """Runs fn(*args) on the executor, or here when the executor is busy."""
+        try:
+            return await self.run_blocking(fn, *args)
+        except ExecutorBusyError:
+            return fn(*args)
+
+    async def encode_json(self, payload):
+        """Returns payload as JSON. Responses that are not paged may be
+        several megabytes, so they are encoded on the executor."""
+        encode = get_json_encoder(self.automl_config.json_encoder)
+
+        def encode_traced(payload):
+            with tracing.span("encode_json"):
+                return encode(payload)
+
+        if self.page_size:
+            return encode_traced(payload)
+        return await self.run_offloaded(encode_traced, payload)
+
+    async def compress_body(self, body):
+        """Returns body compressed with the best encoding the client accepts."""
+        config = self.automl_config
+        self.add_header("Vary", "Accept-Encoding")
+        if not config.compress_responses or len(body) < config.compression_min_size:
+            return body
+        encoding = negotiate_encoding(self.request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return body
+        self.set_header("Content-Encoding", encoding)
+
+        def compress_traced(body):
+            with tracing.span("compress", encoding=encoding):
+                return compress(body, encoding)
+
+        if len(body) < config.offload_min_size:
+            return compress_traced(body)
+        return await self.run_offloaded(compress_traced, body)
+
+    def write_exception(self, e):
+        if isinstance(e, HTTPError):
+            app_log.warning(str(e))
+            status = e.status_code
+        elif isinstance(e, ExecutorBusyError):
+            app_log.warning(str(e))
+            status = 503
+        elif upstream.is_unavailable(e):
+            app_log.warning(str(e))
+            status = 503
+            retry_after = getattr(e, "retry_after", upstream.GUARD.max_delay)
+            self.set_header("Retry-After", str(math.ceil(retry_after)))
+        else:
             app_log.exception(str(e))
-            self.set_status(500, str(e))
+            status = 500
+        if self._headers_written:
+            # Part of an NDJSON stream was sent, so report the error in-band.
+            self.finish(json.dumps({"error": {"message": str(e)}}) + "\n")
+        else:
+            self.set_status(status, str(e))
             self.finish({"error": {"message": str(e)}})
 
 
-class ListModels(APIHandler):
-    """Handles getting the models from GCP for the project."""
-
-    automl_client = None
-    parent = None
+class ListDatasets(AutoMLHandler):
+    """Handles getting the datasets from GCP for the project."""
 
-    @gen.coroutine
-    def get(self, input=""):
+    async def get(self, input=""):
         try:
-            if not self.automl_client:
-                self.automl_client = create_automl_client()
+            query = self.get_listing_query(["datasets"])
+            if query is not None:
+                datasets = await self.get_listings("datasets", get_datasets, query)
+                if self.page_size:
+                    datasets = self.page_records(datasets, "datasets")
+                await self.finish_json(datasets)
+            elif self.page_size:
+                datasets = await self.get_page("datasets", get_datasets_page)
+                await self.finish_json(datasets)
+            elif self.wants_ndjson:
+                await self.stream_listing("datasets", iter_datasets)
+                self.finish()
+            else:
+                datasets = await self.get_listings("datasets", get_datasets)
+                await self.finish_json(datasets)
+
+        except Exception as e:
+            self.write_exception(e)
+
 
-            if not self.parent:
-                self.parent = create_automl_parent(self.automl_client)
+class ListModels(AutoMLHandler):
+    """Handles getting the models from GCP for the project."""
 
-            self.finish(json.dumps(get_models(self.automl_client, self.parent)))
+    async def get(self, input=""):
+        try:
+            query = self.get_listing_query(["models"])
+            if query is not None:
+                models = await self.get_listings("models", get_models, query)
+                if self.page_size:
+                    models = self.page_records(models, "models")
+                await self.finish_json(models)
+            elif self.page_size:
+                models = await self.get_page("models", get_models_page)
+                await self.finish_json(models)
+            elif self.wants_ndjson:
+                await self.stream_listing("models", iter_models)
+                self.finish()
+            else:
+                models = await self.get_listings("models", get_models)
+                await self.finish_json(models)
 
         except Exception as e:
-            app_log.exception(str(e))
-            self.set_status(500, str(e))
-            self.finish({"error": {"message": str(e)}})
+            self.write_exception(e)
 
 
-class ListTableInfo(APIHandler):
-    """Handles getting the table info for the dataset."""
+class ListResources(AutoMLHandler):
+    """Handles getting several kinds of resources in one request.
+
+    include selects the kinds, datasets and models by default. They are
+    fetched concurrently. With pageSize, each kind returns one page and its
+    token is read from <kind>PageToken and returned under nextPageTokens.
+    filter terms and sort apply to the kinds that have their field.
+    """
 
-    automl_client = None
+    fetches = {
+        "datasets": (get_datasets, get_datasets_page),
+        "models": (get_models, get_models_page),
+    }
+
+    async def get(self, input=""):
+        try:
+            include = self.get_argument("include", "datasets,models").split(",")
+            for kind in include:
+                if kind not in self.fetches:
+                    raise HTTPError(400, "Unknown resource " + kind)
+
+            query = self.get_listing_query(include)
+            if query is not None:
+                pending = [
+                    self.get_listings(kind, self.fetches[kind][0], query.restrict(kind))
+                    for kind in include
+                ]
+            elif self.page_size:
+                pending = [
+                    self.get_page(kind, self.fetches[kind][1], kind + "PageToken")
+                    for kind in include
+                ]
+            else:
+                pending = [
+                    self.get_listings(kind, self.fetches[kind][0]) for kind in include
+                ]
+            results = await asyncio.gather(*pending, return_exceptions=True)
+
+            resources = {}
+            errors = []
+            for kind, result in zip(include, results):
+                if isinstance(result, Exception):
+                    app_log.warning("Unable to list %s: %s", kind, result)
+                    errors.append({"resource": kind, "message": str(result)})
+                    continue
+                if query is not None and self.page_size:
+                    result = self.page_records(result, kind, kind + "PageToken")
+                resources[kind] = result[kind]
+                if self.page_size:
+                    resources.setdefault("nextPageTokens", {})[kind] = result[
+                        "nextPageToken"
+                    ]
+                for error in result.get("errors", []):
+                    errors.append(dict(error, resource=kind))
+            if len(resources) == 0:
+                raise results[0]
+            if errors:
+                resources["errors"] = errors
+            await self.finish_json(resources)
 
-    @gen.coroutine
-    def get(self, input=""):
+        except Exception as e:
+            self.write_exception(e)
+
+
+class WatchResources(AutoMLHandler):
+    """Handles pushing dataset and model changes as server-sent events.
+
+    The stream starts with a snapshot event holding every record, followed
+    by a changes event whenever the watcher finds added, changed or removed
+    records. ?snapshot=0 skips the snapshot, for clients that list the
+    records themselves. A comment is sent every keepalive seconds to hold
+    the connection open through proxies.
+    """
+
+    keepalive = 30.0
+    traced = False
+
+    @authenticated
+    async def get(self, input=""):
+        watcher = self.settings["automl_watcher"]
+        self._events = asyncio.Queue()
+        self._wants_snapshot = self.get_argument("snapshot", "1") != "0"
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        encode_json = get_json_encoder(self.automl_config.json_encoder)
+        watcher.subscribe(self.push)
+        try:
+            self.write(b": connected\n\n")
+            await self.flush()
+            while True:
+                try:
+                    event = await asyncio.wait_for(self._events.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    self.write(b": keepalive\n\n")
+                else:
+                    if event is None:
+                        break
+                    name, payload = event
+                    self.write(b"event: " + name.encode("utf-8") + b"\n")
+                    self.write(b"data: " + encode_json(payload) + b"\n\n")
+                await self.flush()
+        except StreamClosedError:
+            pass
+        finally:
+            watcher.unsubscribe(self.push)
+        # Finish after the stream ends so the request metrics are recorded
+        self.finish()
+
+    def push(self, event, payload):
+        if event == "snapshot" and not self._wants_snapshot:
+            return
+        self._events.put_nowait((event, payload))
+
+    def on_connection_close(self):
+        self._events.put_nowait(None)
+        super().on_connection_close()
+
+
+class GetMetrics(AutoMLHandler):
+    """Handles exposing the extension metrics in the Prometheus text format."""
+
+    async def get(self, input=""):
+        registry = self.settings.get("automl_metrics", metrics.REGISTRY)
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        # Flush before finish, which would set a JSON content type
+        self.write(registry.render())
+        await self.flush()
+        self.finish()
+
+
+class ListTableInfo(AutoMLHandler):
+    """Handles getting the table info for the dataset."""
+
+    async def get(self, input=""):
         datasetId = self.get_argument("datasetId")
         try:
-            if not self.automl_client:
-                self.automl_client = create_automl_client()
+            # Checked first, so a malformed token is a 400 before any RPC
+            page_token = self.get_page_token() if self.page_size else None
+            client = await self.run_blocking(self.clients.get_client)
+            # Table and column statistics only change when the dataset stats
+            # are updated, so a 304 can skip listing every column spec.
+            try:
+                stats_update_time = await self.run_coalesced(
+                    ("statsUpdateTime", datasetId),
+                    get_stats_update_time,
+                    client,
+                    datasetId,
+                )
+            except Exception as e:
+                if self.page_size or not await self.finish_stale(datasetId, e):
+                    raise
+                return
+            etag = self.make_etag(datasetId, stats_update_time)
+            if self.not_modified(etag):
+                self.set_status(304)
+                self.finish()
+                return
+
+            max_concurrency = self.automl_config.column_spec_concurrency
+            columnar = self.wants_columnar
+            if self.page_size:
+                table_index, column_token = page_token
+                table_specs = await self.run_coalesced(
+                    (
+                        "tableInfoPage",
+                        datasetId,
+                        stats_update_time,
+                        self.page_size,
+                        table_index,
+                        column_token,
+                        columnar,
+                    ),
+                    get_table_specs_page,
+                    client,
+                    datasetId,
+                    self.page_size,
+                    table_index,
+                    column_token,
+                    columnar,
+                )
+                await self.finish_json(table_specs, etag)
+                return
+
+            stored_key = (datasetId, stats_update_time, self.table_layout)
+            stored = await self.get_stored(stored_key)
+            if self.wants_ndjson and stored is not None:
+                await self.write_ndjson(iter([json.loads(stored)["tableSpecs"]]))
+                self.finish()
+            elif self.wants_ndjson:
+                pages = iter_table_specs(
+                    client,
+                    datasetId,
+                    max_concurrency,
+                    columnar,
+                    self.settings["automl_executor"],
+                    guarded=True,
+                )
 
-            self.finish(json.dumps(get_table_specs(self.automl_client, datasetId)))
+                async def store_pages(pages):
+                    records = [spec for page in pages for spec in page]
+                    body = await self.encode_json({"tableSpecs": records})
+                    await self.store(stored_key, body)
+
+                # Concurrent streams of the same tables share one fetch
+                await self.write_ndjson(
+                    self.coalescer.share_pages(
+                        ("tableInfoStream",) + stored_key,
+                        self.iter_blocking(pages),
+                        store_pages,
+                    )
+                )
+                self.finish()
+            elif stored is not None:
+                self.finish(await self.compress_body(stored))
+            else:
+                table_specs = await self.run_coalesced(
+                    ("tableInfo", datasetId, stats_update_time, columnar),
+                    get_table_specs,
+                    client,
+                    datasetId,
+                    max_concurrency,
+                    columnar,
+                    self.settings["automl_executor"],
+                )
+                body = await self.encode_json(table_specs)
+                self.finish(await self.compress_body(body))
+                await self.store(stored_key, body)
 
         except Exception as e:
-            app_log.exception(str(e))
-            self.set_status(500, str(e))
-            self.finish({"error": {"message": str(e)}})
+            self.write_exception(e)
 
+    @property
+    def table_layout(self):
+        return "columnar" if self.wants_columnar else "rows"
+
+    async def finish_stale(self, datasetId, error):
+        """Finishes with the newest table specs stored for the dataset if
+        AutoML is overloaded. Returns whether it did."""
+        store = self.table_spec_store
+        if store is None or not upstream.is_unavailable(error):
+            return False
+        stored = await self.run_blocking(store.get_latest, datasetId, self.table_layout)
+        if stored is None:
+            return False
+        app_log.warning("Serving stale table specs of %s: %s", datasetId, error)
+        self.set_header("X-AutoML-Cache", "stale")
+        if self.wants_ndjson:
+            await self.write_ndjson(iter([json.loads(stored)["tableSpecs"]]))
+            self.finish()
+        else:
+            self.finish(await self.compress_body(stored))
+        return True
+
+    async def get_stored(self, key):
+        """Returns the JSON body stored on disk for key, or None."""
+        store = self.table_spec_store
+        if store is None or self.get_argument("fresh", "0") == "1":
+            return None
+        body = await self.run_blocking(store.get, *key)
+        if body is not None:
+            self.set_header("X-AutoML-Cache", "disk")
+        return body
+
+    async def store(self, key, body):
+        """Stores body on disk for key. The response is already finished, so
+        failures are only logged."""
+        store = self.table_spec_store
+        if store is None:
+            return
+        try:
+            await self.run_blocking(store.set, *key, body)
+        except Exception:
+            app_log.exception("Unable to store the table specs of %s", key[0])
 
-class DeleteDataset(APIHandler):
-    """ Handles deleteing a dataset in GCP."""
 
-    automl_client = None
+class GetColumnDetail(AutoMLHandler):
+    """Handles getting the detail panel charts of one column."""
 
-    @gen.coroutine
-    def post(self, input=""):
-        datasetId = self.get_json_body()["datasetId"]
+    async def get(self, input=""):
+        columnSpecId = self.get_argument("columnSpecId")
+        datasetId = columnSpecId.partition("/tableSpecs/")[0]
         try:
-            if not self.automl_client:
-                self.automl_client = create_automl_client()
-            self.automl_client.delete_dataset(datasetId)
-            self.finish({"success": {"message": "dataset deleted"}})
+            client = await self.run_blocking(self.clients.get_client)
+            # Column statistics only change when the dataset stats are updated.
+            stats_update_time = await self.run_coalesced(
+                ("statsUpdateTime", datasetId),
+                get_stats_update_time,
+                client,
+                datasetId,
+            )
+            key = (columnSpecId, stats_update_time)
+            detail = self.column_details.get(key)
+            if detail is None:
+                detail = await self.run_coalesced(
+                    ("columnDetail", columnSpecId),
+                    get_column_detail,
+                    client,
+                    columnSpecId,
+                )
+                self.column_details.set(key, detail)
+            await self.finish_json(detail)
 
         except Exception as e:
-            app_log.exception(str(e))
-            self.set_status(500, str(e))
-            self.finish({"error": {"message": str(e)}})
+            self.write_exception(e)
 
 
-class DeleteModel(APIHandler):
-    """ Handles deleteing a model in GCP."""
+class DeleteDataset(AutoMLHandler):
+    """ Handles deleteing datasets in GCP.
 
-    automl_client = None
+    {"datasetId": id} waits for the deletion to start. {"datasetIds": [...]}
+    starts every deletion and returns an operation handle right away.
+    """
 
-    @gen.coroutine
-    def post(self, input=""):
-        modelId = self.get_json_body()["modelId"]
+    async def post(self, input=""):
         try:
-            if not self.automl_client:
-                self.automl_client = create_automl_client()
-            self.automl_client.delete_model(modelId)
-            self.finish({"success": {"message": "model deleted"}})
+            await self.delete_resources(
+                "datasets",
+                "datasetId",
+                delete_dataset,
+            )
 
         except Exception as e:
-            app_log.exception(str(e))
-            self.set_status(500, str(e))
-            self.finish({"error": {"message": str(e)}})
+            self.write_exception(e)
+
+
+class DeleteModel(AutoMLHandler):
+    """ Handles deleteing models in GCP.
+
+    {"modelId": id} waits for the deletion to start. {"modelIds": [...]}
+    starts every deletion and returns an operation handle right away.
+    """
+
+    async def post(self, input=""):
+        try:
+            await self.delete_resources(
+                "models",
+                "modelId",
+                delete_model,
+            )
+
+        except Exception as e:
+            self.write_exception(e)
+
+
+class GetOperation(AutoMLHandler):
+    """Handles getting the progress of the deletions started by one request."""
+
+    async def get(self, input=""):
+        try:
+            batch = self.operations.get(self.get_argument("operationId"))
+            if batch is None:
+                raise HTTPError(404, "Unknown operation")
+            await self.operations.refresh(batch)
+            self.finish(json.dumps(batch.to_json()))
+
+        except Exception as e:
+            self.write_exception(e)
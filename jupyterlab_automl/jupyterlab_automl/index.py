@@ -0,0 +1,220 @@
+# Lint as: python3
+"""In-memory index answering filter, sort and search queries over listings."""
+
+import bisect
+import datetime
+import re
+
+from collections import defaultdict, namedtuple
+
+# Fields each resource can be filtered on: "values" fields match one of a
+# list of values, "range" fields a bound.
+FILTER_FIELDS = {
+    "datasets": {
+        "datasetType": "values",
+        "location": "values",
+        "createTime": "range",
+        "exampleCount": "range",
+    },
+    "models": {
+        "deploymentState": "values",
+        "datasetId": "values",
+        "location": "values",
+        "updateTime": "range",
+    },
+}
+
+SORT_FIELDS = {
+    "datasets": ("displayName", "createTime", "exampleCount", "datasetType"),
+    "models": ("displayName", "updateTime", "deploymentState", "datasetId"),
+}
+
+# Fields q is matched against, as the resource panel shows them: text
+# fields as they are, times in milliseconds as their UTC date.
+SEARCH_FIELDS = ("displayName", "datasetType")
+SEARCH_DATE_FIELDS = ("createTime", "updateTime")
+
+TERM = re.compile(r"^(\w+)(:|>=|<=|>|<)(.*)$")
+
+FilterTerm = namedtuple("FilterTerm", ["field", "op", "value"])
+
+
+class ListingQuery(namedtuple("ListingQuery", ["terms", "sort", "descending", "q"])):
+    """A parsed filter, sort and q request. terms is a tuple of FilterTerm."""
+
+    def validate(self, resources):
+        """Raises ValueError unless every field applies to one of resources."""
+        for term in self.terms:
+            kinds = {FILTER_FIELDS[r].get(term.field) for r in resources}
+            if kinds == {None}:
+                raise ValueError("Unknown filter field " + term.field)
+            if term.op == ":" and "values" not in kinds:
+                raise ValueError(
+                    "{} needs a range, like {}>=0".format(term.field, term.field)
+                )
+            if term.op != ":" and "range" not in kinds:
+                raise ValueError("{} cannot be compared".format(term.field))
+        if self.sort and not any(self.sort in SORT_FIELDS[r] for r in resources):
+            raise ValueError("Unknown sort field " + self.sort)
+
+    def restrict(self, resource):
+        """Returns the query with the terms and sort that apply to resource."""
+        fields = FILTER_FIELDS[resource]
+        return self._replace(
+            terms=tuple(t for t in self.terms if t.field in fields),
+            sort=self.sort if self.sort in SORT_FIELDS[resource] else None,
+        )
+
+
+def parse_query(filter="", sort="", q=""):
+    """Parses the filter, sort and q arguments of a listing request.
+
+    filter is a comma-separated list of terms: field:value matches records
+    whose field is one of the |-separated values, and field>=value,
+    field<=value, field>value and field<value bound a numeric field such as
+    a time in milliseconds. sort names a field, with a leading - for
+    descending order. q matches records with a display name, dataset type
+    or YYYY-MM-DD creation or update date containing it, ignoring case.
+    Returns None when all of them are empty, and raises ValueError when one
+    cannot be parsed.
+    """
+    terms = []
+    for text in filter.split(","):
+        if not text.strip():
+            continue
+        match = TERM.match(text.strip())
+        if match is None:
+            raise ValueError("Invalid filter " + text)
+        field, op, value = match.groups()
+        if op == ":":
+            value = tuple(value.split("|"))
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError("{} must be compared with a number".format(field))
+        terms.append(FilterTerm(field, op, value))
+    descending = sort.startswith("-")
+    sort = sort.lstrip("-")
+    if not (terms or sort or q):
+        return None
+    return ListingQuery(tuple(terms), sort or None, descending, q.lower())
+
+
+def search_text(record):
+    """Returns the lowercase text of record that q is matched against."""
+    texts = [record.get(field) or "" for field in SEARCH_FIELDS]
+    for field in SEARCH_DATE_FIELDS:
+        if record.get(field) is not None:
+            date = datetime.datetime.utcfromtimestamp(record[field] / 1000)
+            texts.append(date.strftime("%Y-%m-%d"))
+    return "\n".join(texts).lower()
+
+
+class ListingIndex:
+    """Answers ListingQuery lookups over one listing's records.
+
+    Positions are grouped by value for "values" fields when the index is
+    built. Orderings by a sort or range field are built on first use and
+    kept, and range filters bisect them. The records are never copied.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._names = [(r.get("displayName") or "").lower() for r in records]
+        self._texts = [search_text(r) for r in records]
+        self._groups = defaultdict(lambda: defaultdict(set))
+        for position, record in enumerate(records):
+            for field, value in record.items():
+                if isinstance(value, (str, int)):
+                    self._groups[field][str(value)].add(position)
+        self._orders = {}
+
+    def _order(self, field):
+        """Returns the positions sorted by field, their sort keys, and how
+        many of them have the field. Records without it sort last."""
+        if field not in self._orders:
+
+            def key(position):
+                value = self.records[position].get(field)
+                if isinstance(value, str):
+                    value = value.lower()
+                missing = value is None
+                return (missing, "" if missing else value, self.records[position]["id"])
+
+            positions = sorted(range(len(self.records)), key=key)
+            keys = [key(p)[1] for p in positions]
+            defined = sum(1 for p in positions if not key(p)[0])
+            self._orders[field] = (positions, keys, defined)
+        return self._orders[field]
+
+    def _match_range(self, term):
+        positions, keys, defined = self._order(term.field)
+        keys = keys[:defined]
+        if term.op in (">=", ">"):
+            side = bisect.bisect_left if term.op == ">=" else bisect.bisect_right
+            return set(positions[side(keys, term.value) : defined])
+        side = bisect.bisect_right if term.op == "<=" else bisect.bisect_left
+        return set(positions[: side(keys, term.value)])
+
+    def query(self, query):
+        """Returns the records matching query, in the order it asks for.
+
+        Without a sort, records keep the listing order, except that with q
+        the names starting with it come first.
+        """
+        matches = None
+        for term in query.terms:
+            if term.op == ":":
+                groups = self._groups[term.field]
+                found = set().union(*[groups.get(v, ()) for v in term.value])
+            else:
+                found = self._match_range(term)
+            matches = found if matches is None else matches & found
+        if query.q:
+            candidates = range(len(self.records)) if matches is None else matches
+            matches = {p for p in candidates if query.q in self._texts[p]}
+
+        if query.sort:
+            positions, _, defined = self._order(query.sort)
+            if query.descending:
+                positions = positions[:defined][::-1] + positions[defined:]
+        else:
+            positions = range(len(self.records))
+            if query.q:
+                positions = sorted(
+                    positions, key=lambda p: not self._names[p].startswith(query.q)
+                )
+        if matches is None:
+            return [self.records[p] for p in positions]
+        return [self.records[p] for p in positions if p in matches]
+
+
+class ListingIndexes:
+    """Keeps a ListingIndex per resource, rebuilt when its listing changes.
+
+    A listing is made of the cached listing of each location. The index is
+    reused for as long as every one of them is the same object, so it is
+    rebuilt whenever the listing cache refills or is invalidated. Used from
+    the IOLoop thread only.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {}
+
+    def get(self, resource, sources, build_records):
+        """Returns the index for sources, building it from build_records()."""
+        entry = self._indexes.get(resource)
+        if entry is not None and len(entry[0]) == len(sources):
+            if all(a is b for a, b in zip(entry[0], sources)):
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        index = ListingIndex(build_records())
+        self._indexes[resource] = (tuple(sources), index)
+        return index
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._indexes)}
@@ -0,0 +1,390 @@
+# Lint as: python3
+"""In-process metrics exposed in the Prometheus text format."""
+
+import bisect
+import functools
+import threading
+import time
+
+from collections import OrderedDict
+
+from jupyterlab_automl import tracing
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ['{}="{}"'.format(n, _escape(v)) for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """A named metric whose samples are keyed by their label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.help),
+            "# TYPE {} {}".format(self.name, self.kind),
+        ]
+        with self._lock:
+            samples = [(k, self._copy(v)) for k, v in self._values.items()]
+        for labels, value in sorted(samples):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_sample(self, labels, value):
+        yield "{}{} {}".format(
+            self.name,
+            _format_labels(self.label_names, labels),
+            _format_value(value),
+        )
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def dec(self, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) - 1
+
+
+class Histogram(_Metric):
+    """Counts observations in cumulative buckets, plus their sum and count.
+
+    Each sample holds one count per bucket and one for +Inf, so observe is a
+    bisect and two additions under the lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(labels)
+            if sample is None:
+                sample = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            sample[0][index] += 1
+            sample[1] += value
+
+    def get(self, *labels):
+        """Returns the number of observations for the labels."""
+        with self._lock:
+            sample = self._values.get(labels)
+            return sum(sample[0]) if sample else 0
+
+    def _copy(self, value):
+        return list(value[0]), value[1]
+
+    def _render_sample(self, labels, value):
+        counts, total = value
+        names = self.label_names + ("le",)
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield "{}_bucket{} {}".format(
+                self.name,
+                _format_labels(names, labels + (_format_value(bound),)),
+                cumulative,
+            )
+        suffix = _format_labels(self.label_names, labels)
+        yield "{}_sum{} {}".format(self.name, suffix, _format_value(total))
+        yield "{}_count{} {}".format(self.name, suffix, cumulative)
+
+
+class MetricsRegistry:
+    """Holds the metrics of the process and renders them as text.
+
+    Collectors are called on every render and return metrics built from
+    state kept elsewhere, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._collectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help, label_names=()):
+        return self._register(Counter, name, help, label_names)
+
+    def gauge(self, name, help, label_names=()):
+        return self._register(Gauge, name, help, label_names)
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, label_names, buckets)
+
+    def set_collector(self, name, collect):
+        """Registers collect(), replacing any collector with the same name."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        for collect in collectors:
+            metrics.extend(collect())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def cache_collector(caches):
+    """Returns a collector reporting the stats() of named caches."""
+
+    def collect():
+        names = ("cache",)
+        hits = Counter("automl_cache_hits_total", "Cache lookups that hit.", names)
+        misses = Counter(
+            "automl_cache_misses_total", "Cache lookups that missed.", names
+        )
+        size = Gauge("automl_cache_entries", "Entries held in the cache.", names)
+        ratio = Gauge(
+            "automl_cache_hit_ratio", "Share of cache lookups that hit.", names
+        )
+        for name, cache in caches.items():
+            stats = cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            hits.inc(name, amount=stats["hits"])
+            misses.inc(name, amount=stats["misses"])
+            size.set(stats["size"], name)
+            ratio.set(stats["hits"] / lookups if lookups else 0.0, name)
+        return [hits, misses, size, ratio]
+
+    return collect
+
+
+def coalescer_collector(coalescer):
+    """Returns a collector reporting the stats() of a handlers Coalescer."""
+
+    def collect():
+        names = ("kind",)
+        calls = Counter(
+            "automl_coalesced_calls_total", "Upstream calls started.", names
+        )
+        deduplicated = Counter(
+            "automl_deduplicated_calls_total",
+            "Requests that shared an upstream call already in flight.",
+            names,
+        )
+        in_flight = Gauge(
+            "automl_coalesced_calls_in_flight", "Upstream calls in flight."
+        )
+        stats = coalescer.stats()
+        for kind, count in stats["calls"].items():
+            calls.inc(kind, amount=count)
+        for kind, count in stats["deduplicated"].items():
+            deduplicated.inc(kind, amount=count)
+        in_flight.set(stats["in_flight"])
+        return [calls, deduplicated, in_flight]
+
+    return collect
+
+
+def watcher_collector(watcher):
+    """Returns a collector reporting the state of a ResourceWatcher."""
+
+    def collect():
+        subscribers = Gauge(
+            "automl_change_feed_subscribers", "Clients subscribed to the change feed."
+        )
+        polls = Counter("automl_change_feed_polls_total", "Change feed polls.")
+        interval = Gauge(
+            "automl_change_feed_interval_seconds",
+            "Seconds until the change feed polls again when nothing changes.",
+        )
+        subscribers.set(watcher.subscribers)
+        polls.inc(amount=watcher.polls)
+        interval.set(watcher.interval)
+        return [subscribers, polls, interval]
+
+    return collect
+
+
+def upstream_collector(guard):
+    """Returns a collector reporting the state of an upstream.UpstreamGuard."""
+
+    def collect():
+        stats = guard.stats()
+        limit = Gauge(
+            "automl_upstream_concurrency_limit",
+            "Current adaptive limit of concurrent Google Cloud calls.",
+        )
+        in_flight = Gauge(
+            "automl_upstream_limited_in_flight",
+            "Google Cloud calls holding a slot of the concurrency limit.",
+        )
+        circuit_open = Gauge(
+            "automl_upstream_circuit_open",
+            "1 while Google Cloud calls are paused by the circuit breaker.",
+        )
+        limit.set(stats["limit"])
+        in_flight.set(stats["in_flight"])
+        circuit_open.set(0 if stats["breaker"] == "closed" else 1)
+        return [limit, in_flight, circuit_open]
+
+    return collect
+
+
+def warmup_collector(warm_up):
+    """Returns a collector reporting the timings of a warmup.WarmUp."""
+
+    def collect():
+        seconds = Gauge(
+            "automl_warmup_seconds",
+            "Seconds each phase of the startup warm-up took.",
+            ("phase",),
+        )
+        failed = Gauge("automl_warmup_failed", "1 if the startup warm-up failed.")
+        for phase, value in dict(warm_up.timings).items():
+            seconds.set(value, phase)
+        failed.set(1 if warm_up.error else 0)
+        return [seconds, failed]
+
+    return collect
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "automl_request_seconds",
+    "Time spent handling AutoML extension requests.",
+    ("handler", "method"),
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "automl_requests_in_flight",
+    "AutoML extension requests being handled.",
+    ("handler",),
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    "automl_request_errors_total",
+    "AutoML extension requests answered with an error status.",
+    ("handler", "status"),
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "automl_upstream_call_seconds",
+    "Time spent in calls to Google Cloud, including paging.",
+    ("method",),
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "automl_upstream_calls_in_flight",
+    "Calls to Google Cloud in progress.",
+    ("method",),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "automl_upstream_errors_total",
+    "Calls to Google Cloud that raised, by exception type.",
+    ("method", "error"),
+)
+UPSTREAM_OVERLOADED = REGISTRY.counter(
+    "automl_upstream_overloaded_total",
+    "Attempts of Google Cloud calls that failed with a retryable status.",
+    ("method", "code"),
+)
+
+CREDENTIAL_REFRESH_SECONDS = REGISTRY.histogram(
+    "automl_credential_refresh_seconds",
+    "Time spent refreshing the Google Cloud credential.",
+)
+CREDENTIAL_REFRESH_ERRORS = REGISTRY.counter(
+    "automl_credential_refresh_errors_total",
+    "Failed refreshes of the Google Cloud credential, by exception type.",
+    ("error",),
+)
+CREDENTIAL_REFRESHES_JOINED = REGISTRY.counter(
+    "automl_credential_refreshes_joined_total",
+    "Refreshes that waited for one already in progress instead of starting.",
+)
+
+
+def timed(method):
+    """Decorates an upstream call to record its latency and errors, and a
+    span of the current trace."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            UPSTREAM_IN_FLIGHT.inc(method)
+            start = time.perf_counter()
+            try:
+                with tracing.span(method):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                UPSTREAM_ERRORS.inc(method, type(e).__name__)
+                raise
+            finally:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, method)
+                UPSTREAM_IN_FLIGHT.dec(method)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,141 @@
+# Lint as: python3
+"""Tracking of the long-running operations started by delete requests."""
+
+import asyncio
+import uuid
+
+from collections import OrderedDict
+
+from notebook.base.handlers import app_log
+from tornado.ioloop import IOLoop
+
+STARTING = "starting"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+
+def poll_operation(operation):
+    """Refreshes an AutoML operation and returns its state and error."""
+    if not operation.done():
+        return RUNNING, None
+    error = operation.exception()
+    if error is not None:
+        return ERROR, str(error)
+    return DONE, None
+
+
+class BatchOperation:
+    """The operations started for one request, one item per resource.
+
+    errors holds the exception of each delete that could not start, so a
+    single delete can raise it again.
+    """
+
+    def __init__(self, kind, resource_ids):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.items = OrderedDict(
+            (resource_id, {"id": resource_id, "state": STARTING})
+            for resource_id in resource_ids
+        )
+        self.operations = {}
+        self.errors = {}
+        self.tasks = []
+
+    @property
+    def done(self):
+        return all(item["state"] in (DONE, ERROR) for item in self.items.values())
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "done": self.done,
+            "items": list(self.items.values()),
+        }
+
+
+class OperationTracker:
+    """Starts delete operations concurrently and reports their progress.
+
+    All state is changed on the IOLoop thread. Blocking AutoML calls run on
+    the executor. on_change(kind, resource_id) is called when a resource is
+    deleted or its deletion starts, so cached listings can be invalidated.
+    """
+
+    def __init__(self, executor, on_change=None, max_batches=100):
+        self._executor = executor
+        self._on_change = on_change
+        self._max_batches = max_batches
+        self._batches = OrderedDict()
+
+    def get(self, batch_id):
+        return self._batches.get(batch_id)
+
+    def start(self, kind, resource_ids, delete):
+        """Calls delete(resource_id) for every id and returns the batch.
+
+        delete must return the AutoML operation. The calls run in the
+        background; await asyncio.gather(*batch.tasks) to wait for them.
+        """
+        batch = BatchOperation(kind, resource_ids)
+        self._batches[batch.id] = batch
+        self._evict()
+        batch.tasks = [
+            asyncio.ensure_future(self._start_one(batch, resource_id, delete))
+            for resource_id in batch.items
+        ]
+        return batch
+
+    async def refresh(self, batch):
+        """Polls every running operation of the batch concurrently."""
+        running = [
+            resource_id
+            for resource_id, item in batch.items.items()
+            if item["state"] == RUNNING
+        ]
+        results = await asyncio.gather(
+            *[
+                self._run_blocking(poll_operation, batch.operations[resource_id])
+                for resource_id in running
+            ],
+            return_exceptions=True,
+        )
+        for resource_id, result in zip(running, results):
+            if isinstance(result, Exception):
+                # Leave the item running, the next refresh will retry.
+                app_log.warning("Unable to poll operation: %s", result)
+                continue
+            self._update(batch, resource_id, *result)
+
+    def _run_blocking(self, fn, *args):
+        return IOLoop.current().run_in_executor(self._executor, fn, *args)
+
+    async def _start_one(self, batch, resource_id, delete):
+        try:
+            operation = await self._run_blocking(delete, resource_id)
+        except Exception as e:
+            app_log.exception("Unable to delete %s", resource_id)
+            batch.errors[resource_id] = e
+            self._update(batch, resource_id, ERROR, str(e))
+            return
+        batch.operations[resource_id] = operation
+        batch.items[resource_id]["operation"] = getattr(
+            getattr(operation, "operation", None), "name", ""
+        )
+        self._update(batch, resource_id, RUNNING, None)
+
+    def _update(self, batch, resource_id, state, error):
+        item = batch.items[resource_id]
+        item["state"] = state
+        if error is not None:
+            item["error"] = error
+        if state in (RUNNING, DONE) and self._on_change:
+            self._on_change(batch.kind, resource_id)
+
+    def _evict(self):
+        while len(self._batches) > self._max_batches:
+            finished = [b for b in self._batches.values() if b.done]
+            oldest = finished[0] if finished else next(iter(self._batches.values()))
+            del self._batches[oldest.id]
@@ -0,0 +1,191 @@
+# Lint as: python3
+"""Compact records of processed table specs, column specs and charts.
+
+Processed specs are held in these, and not in nested dicts, while they are
+cached or shared between requests. They become JSON only when a response is
+encoded: the encoders in encoding.py call json_default on them.
+"""
+
+import math
+
+from array import array
+from enum import Enum
+
+
+class ChartInfo(Enum):
+    name = "name"
+    amount = "Number of Instances"
+
+
+# Keys of a chart bar, looked up once rather than through the enum per bar
+LABEL = ChartInfo.name.value
+AMOUNT = ChartInfo.amount.value
+
+
+class ChartData:
+    """The bars of a chart, as parallel label and count arrays."""
+
+    __slots__ = ("labels", "counts")
+
+    def __init__(self, labels=(), counts=()):
+        self.labels = list(labels)
+        self.counts = array("q", counts)
+
+    def append(self, label, count):
+        self.labels.append(label)
+        self.counts.append(count)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __eq__(self, other):
+        if not isinstance(other, ChartData):
+            return NotImplemented
+        return self.labels == other.labels and self.counts == other.counts
+
+    def __repr__(self):
+        return "ChartData({!r}, {!r})".format(self.labels, list(self.counts))
+
+    def to_json(self):
+        return [
+            {LABEL: label, AMOUNT: count}
+            for label, count in zip(self.labels, self.counts)
+        ]
+
+
+class ColumnSpecs:
+    """The processed column specs of one table, one array per field.
+
+    Encodes as one record per column, or with columnar as one list per
+    field. Records give nullValueCount with its percentage of row_count,
+    the columnar layout as the bare count.
+    """
+
+    __slots__ = (
+        "row_count",
+        "columnar",
+        "ids",
+        "data_types",
+        "display_names",
+        "distinct_value_counts",
+        "invalid_value_counts",
+        "null_value_counts",
+        "nullable",
+    )
+
+    def __init__(self, row_count, columnar=False):
+        self.row_count = row_count
+        self.columnar = columnar
+        self.ids = []
+        self.data_types = []
+        self.display_names = []
+        self.distinct_value_counts = array("q")
+        self.invalid_value_counts = array("q")
+        self.null_value_counts = array("q")
+        self.nullable = array("b")
+
+    def append(
+        self,
+        id,
+        data_type,
+        display_name,
+        distinct_value_count,
+        invalid_value_count,
+        null_value_count,
+        nullable,
+    ):
+        self.ids.append(id)
+        self.data_types.append(data_type)
+        self.display_names.append(display_name)
+        self.distinct_value_counts.append(distinct_value_count)
+        self.invalid_value_counts.append(invalid_value_count)
+        self.null_value_counts.append(null_value_count)
+        self.nullable.append(nullable)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def null_value_label(self, index):
+        count = self.null_value_counts[index]
+        return "{} ({}%)".format(count, math.floor(count / self.row_count * 100))
+
+    def to_json(self):
+        if self.columnar:
+            return {
+                "id": list(self.ids),
+                "dataType": list(self.data_types),
+                "displayName": list(self.display_names),
+                "distinctValueCount": self.distinct_value_counts.tolist(),
+                "invalidValueCount": self.invalid_value_counts.tolist(),
+                "nullValueCount": self.null_value_counts.tolist(),
+                "nullable": [bool(nullable) for nullable in self.nullable],
+            }
+        return [
+            {
+                "id": self.ids[i],
+                "dataType": self.data_types[i],
+                "displayName": self.display_names[i],
+                "distinctValueCount": self.distinct_value_counts[i],
+                "invalidValueCount": self.invalid_value_counts[i],
+                "nullValueCount": self.null_value_label(i),
+                "nullable": bool(self.nullable[i]),
+            }
+            for i in range(len(self.ids))
+        ]
+
+
+class TableSpecRecord:
+    """A processed table spec with its ColumnSpecs and chart summary."""
+
+    __slots__ = (
+        "id",
+        "row_count",
+        "valid_row_count",
+        "column_count",
+        "column_specs",
+        "chart_summary",
+    )
+
+    def __init__(
+        self, id, row_count, valid_row_count, column_count, column_specs, chart_summary
+    ):
+        self.id = id
+        self.row_count = row_count
+        self.valid_row_count = valid_row_count
+        self.column_count = column_count
+        self.column_specs = column_specs
+        self.chart_summary = chart_summary
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "rowCount": self.row_count,
+            "validRowCount": self.valid_row_count,
+            "columnCount": self.column_count,
+            "columnSpecs": self.column_specs,
+            "chartSummary": self.chart_summary,
+        }
+
+
+def json_default(value):
+    """Returns the JSON form of a record, for the default hook of encoders.
+
+    The result may hold more records, which the encoder passes back here.
+    """
+    to_json = getattr(value, "to_json", None)
+    if to_json is None:
+        raise TypeError(
+            "Object of type {} is not JSON serializable".format(type(value).__name__)
+        )
+    return to_json()
+
+
+def to_json(value):
+    """Returns value with every record in it replaced by plain JSON types."""
+    if hasattr(value, "to_json"):
+        return to_json(value.to_json())
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_json(item) for item in value)
+    return value
@@ -0,0 +1,168 @@
+# Lint as: python3
+"""On-disk cache of processed table specs that survives server restarts."""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from notebook.base.handlers import app_log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_specs (
+    dataset_id TEXT NOT NULL,
+    stats_update_time INTEGER NOT NULL,
+    layout TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (dataset_id, stats_update_time, layout)
+)
+"""
+
+
+class TableSpecStore:
+    """SQLite cache of encoded tableInfo payloads.
+
+    Entries are keyed by dataset, stats_update_time and layout. Column
+    statistics only change with stats_update_time, so entries never expire.
+    Storing a dataset's payload drops its entries for older stats. The least
+    recently read entries are evicted once the compressed payloads exceed
+    max_bytes. Database errors are logged and treated as misses, so a
+    broken cache file never fails a request.
+    """
+
+    def __init__(self, path, max_bytes, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def get(self, dataset_id, stats_update_time, layout):
+        """Returns the stored JSON bytes, or None."""
+        key = (dataset_id, stats_update_time, layout)
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT payload FROM table_specs WHERE dataset_id = ? "
+                    "AND stats_update_time = ? AND layout = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    with connection:
+                        connection.execute(
+                            "UPDATE table_specs SET accessed = ? WHERE "
+                            "dataset_id = ? AND stats_update_time = ? AND layout = ?",
+                            (self._clock(),) + key,
+                        )
+            except sqlite3.Error:
+                app_log.exception("Unable to read the table spec cache")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    def get_latest(self, dataset_id, layout):
+        """Returns the JSON bytes for the newest stats of a dataset, or None.
+
+        Used when the current stats_update_time cannot be fetched.
+        """
+        with self._lock:
+            try:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT payload FROM table_specs WHERE dataset_id = ? "
+                        "AND layout = ? ORDER BY stats_update_time DESC LIMIT 1",
+                        (dataset_id, layout),
+                    )
+                    .fetchone()
+                )
+            except sqlite3.Error:
+                app_log.exception("Unable to read the table spec cache")
+                row = None
+        return zlib.decompress(row[0]) if row is not None else None
+
+    def set(self, dataset_id, stats_update_time, layout, body):
+        """Stores JSON bytes and evicts entries past max_bytes."""
+        if self.max_bytes <= 0:
+            return
+        payload = zlib.compress(body, 1)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        "DELETE FROM table_specs WHERE dataset_id = ? "
+                        "AND stats_update_time < ?",
+                        (dataset_id, stats_update_time),
+                    )
+                    connection.execute(
+                        "INSERT OR REPLACE INTO table_specs VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            dataset_id,
+                            stats_update_time,
+                            layout,
+                            payload,
+                            len(payload),
+                            self._clock(),
+                        ),
+                    )
+                    self._evict(connection)
+            except sqlite3.Error:
+                app_log.exception("Unable to write the table spec cache")
+
+    def _evict(self, connection):
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM table_specs"
+        ).fetchone()[0]
+        rows = connection.execute(
+            "SELECT rowid, size FROM table_specs ORDER BY accessed"
+        ).fetchall()
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM table_specs WHERE rowid = ?", (rowid,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            try:
+                size, total = (
+                    self._connect()
+                    .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM table_specs")
+                    .fetchone()
+                )
+            except sqlite3.Error:
+                size, total = 0, 0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": size,
+                "bytes": total,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
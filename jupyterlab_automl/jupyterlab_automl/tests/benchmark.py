@@ -0,0 +1,529 @@
+#!/usr/bin/env python
+"""Microbenchmarks for the functions that shape AutoML protos into payloads.
+
+Synthetic protos are generated at a realistic and an extreme size. Each
+benchmark reports its best time over several runs and the peak memory
+allocated while it runs, and fails when either regresses past the stored
+baseline by more than the tolerance.
+
+    python -m jupyterlab_automl.tests.benchmark
+    python -m jupyterlab_automl.tests.benchmark --size extreme
+    python -m jupyterlab_automl.tests.benchmark --update-baseline
+
+--encoding also reports the encoded size and the encode and compress time
+of large get_table_specs outputs for each available JSON encoder and
+content encoding. It is informational and not compared to the baseline.
+
+--memory compares the memory held by processed table specs and detail
+panels with that of the same data as nested dicts and lists, the form
+they had before they were kept as records. It is informational too.
+
+--imports reports what importing the extension costs on top of the
+notebook server, from python -X importtime, and fails if it imports the
+Google Cloud client libraries, which must load on first use.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+from jupyterlab_automl import encoding, handlers
+
+from google.cloud.automl_v1beta1.types import (
+    Dataset,
+    Timestamp,
+    TableSpec,
+    ColumnSpec,
+    TablesDatasetMetadata,
+    TimestampStats,
+    ImageClassificationDatasetMetadata,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+SIZES = {
+    "realistic": {"columns": 500, "buckets": 20, "datasets": 200},
+    "extreme": {"columns": 10000, "buckets": 1000, "datasets": 5000},
+}
+
+COLUMN_PREFIX = "projects/p/locations/l/datasets/TBL1/tableSpecs/t/columnSpecs/"
+
+# Differences below these are noise, however small the baseline
+SLACK = {"seconds": 0.001, "peak_bytes": 4096}
+
+# Modules the notebook server has imported before it loads the extension
+SERVER_MODULES = ("notebook.base.handlers", "notebook.utils", "tornado.web")
+
+# Loaded on first use, never when the extension is imported
+DEFERRED_MODULES = ("google.cloud", "google.auth", "google.api_core", "grpc")
+
+# Columns cycle through these types: Numeric, Categorical, Timestamp, String
+TYPE_CODES = (3, 10, 4, 6)
+
+
+class FakeClient:
+    """Returns pre-built protos from the list calls used by the benchmarks."""
+
+    def __init__(self, column_specs=(), datasets=(), table_specs=()):
+        self.column_specs = column_specs
+        self.datasets = datasets
+        self.table_specs = table_specs
+
+    def list_table_specs(self, datasetId):
+        return self.table_specs
+
+    def list_column_specs(self, name):
+        return self.column_specs
+
+    def list_datasets(self, parent):
+        return self.datasets
+
+
+def make_buckets(count):
+    buckets = [{"min": float(i), "max": float(i + 1), "count": i} for i in range(count)]
+    buckets[0]["min"] = float("-inf")
+    buckets[-1]["max"] = float("inf")
+    return buckets
+
+
+def make_column_spec(index, type_code, buckets):
+    stats = {
+        "distinct_value_count": index,
+        "valid_value_count": 900,
+        "null_value_count": 100,
+    }
+    if type_code == 3:
+        stats["float64_stats"] = {
+            "mean": 10.5,
+            "standard_deviation": 2.25,
+            "histogram_buckets": make_buckets(buckets),
+        }
+    elif type_code == 10:
+        stats["category_stats"] = {
+            "top_category_stats": [
+                {"value": "category{}".format(i), "count": buckets - i}
+                for i in range(buckets)
+            ]
+        }
+    elif type_code == 4:
+        granular = TimestampStats.GranularStats
+        stats["timestamp_stats"] = {
+            "granular_stats": {
+                "month_of_year": granular(buckets={m: m for m in range(1, 13)}),
+                "day_of_week": granular(buckets={d: d for d in range(1, 8)}),
+                "hour_of_day": granular(buckets={h: h for h in range(24)}),
+            }
+        }
+    return ColumnSpec(
+        name=COLUMN_PREFIX + str(index),
+        display_name="column{}".format(index),
+        data_type={"type_code": type_code, "nullable": index % 2 == 0},
+        data_stats=stats,
+    )
+
+
+def make_column_specs(count, buckets):
+    return [
+        make_column_spec(i, TYPE_CODES[i % len(TYPE_CODES)], buckets)
+        for i in range(count)
+    ]
+
+
+def make_datasets(count):
+    time = Timestamp(seconds=1577836800)
+    datasets = []
+    for i in range(count):
+        name = "projects/p/locations/l/datasets/{}{}".format(
+            "TBL" if i % 2 == 0 else "ICN", i
+        )
+        dataset = Dataset(
+            name=name,
+            display_name="dataset{}".format(i),
+            description="description",
+            create_time=time,
+            example_count=i,
+        )
+        if i % 2 == 0:
+            dataset.tables_dataset_metadata.CopyFrom(
+                TablesDatasetMetadata(
+                    primary_table_spec_id="1",
+                    target_column_spec_id="2",
+                    stats_update_time=time,
+                )
+            )
+        else:
+            dataset.image_classification_dataset_metadata.CopyFrom(
+                ImageClassificationDatasetMetadata(classification_type=1)
+            )
+        datasets.append(dataset)
+    return datasets
+
+
+def make_benchmarks(size):
+    """Returns the benchmarks as an ordered mapping of name to callable."""
+    buckets = size["buckets"]
+    numeric = make_column_spec(0, 3, buckets)
+    categorical = make_column_spec(1, 10, buckets)
+    timestamp = make_column_spec(2, 4, buckets)
+    bucket_list = list(numeric.data_stats.float64_stats.histogram_buckets)
+    column_client = FakeClient(
+        column_specs=make_column_specs(size["columns"], min(buckets, 20))
+    )
+    table_spec = TableSpec(name="t", row_count=1000)
+    datasets = make_datasets(size["datasets"])
+    dataset_client = FakeClient(datasets=datasets)
+
+    return OrderedDict(
+        [
+            (
+                "get_bucket_label",
+                lambda: [handlers.get_bucket_label(b) for b in bucket_list],
+            ),
+            (
+                "get_detail_panel.numeric",
+                lambda: handlers.get_detail_panel(numeric, 1000),
+            ),
+            (
+                "get_detail_panel.categorical",
+                lambda: handlers.get_detail_panel(categorical, 1000),
+            ),
+            (
+                "get_detail_panel.timestamp",
+                lambda: handlers.get_detail_panel(timestamp, 1000),
+            ),
+            (
+                "get_column_specs",
+                lambda: handlers.get_column_specs(column_client, table_spec),
+            ),
+            (
+                "get_dataset_metadata",
+                lambda: [handlers.get_dataset_metadata(d) for d in datasets],
+            ),
+            ("get_datasets", lambda: handlers.get_datasets(dataset_client, "p")),
+        ]
+    )
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def encoding_report(size_name, repeat=5):
+    """Returns (layout, encoder, content encoding, bytes, encode s, compress s)
+    for the get_table_specs output of one wide table at the given size."""
+    size = SIZES[size_name]
+    client = FakeClient(
+        column_specs=make_column_specs(size["columns"], min(size["buckets"], 20)),
+        table_specs=[TableSpec(name="t", row_count=1000)],
+    )
+    encoders = [("json", encoding.encode_stdlib)]
+    if encoding.orjson is not None:
+        encoders.append(("orjson", encoding.encode_orjson))
+
+    rows = []
+    for layout in ("rows", "columnar"):
+        payload = handlers.get_table_specs(client, "d", 1, layout == "columnar")
+        for encoder_name, encode in encoders:
+            encode_seconds, body = best_time(lambda: encode(payload), repeat)
+            rows.append(
+                (layout, encoder_name, "identity", len(body), encode_seconds, 0)
+            )
+            for content_encoding in encoding.available_encodings():
+                compress_seconds, compressed = best_time(
+                    lambda: encoding.compress(body, content_encoding), repeat
+                )
+                rows.append(
+                    (
+                        layout,
+                        encoder_name,
+                        content_encoding,
+                        len(compressed),
+                        encode_seconds,
+                        compress_seconds,
+                    )
+                )
+    return rows
+
+
+def retained_bytes(build):
+    """Returns the bytes still allocated when build() returns, which are
+    those held by its result."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current
+
+
+def memory_report(size_name):
+    """Returns (name, dict bytes, record bytes) for the processed table specs
+    of one wide table and the detail panels of a column at the given size.
+
+    Dict bytes are those of the payload decoded from its JSON, with strings
+    and containers of its own, like the dicts built before records.
+    """
+    size = SIZES[size_name]
+    buckets = size["buckets"]
+    client = FakeClient(
+        column_specs=make_column_specs(size["columns"], min(buckets, 20)),
+        table_specs=[TableSpec(name="t", row_count=1000)],
+    )
+    builds = [
+        (
+            "tableInfo.rows",
+            lambda: handlers.get_table_specs(client, "d", 1, False),
+        ),
+        (
+            "tableInfo.columnar",
+            lambda: handlers.get_table_specs(client, "d", 1, True),
+        ),
+    ]
+    for name, type_code in (("numeric", 3), ("categorical", 10), ("timestamp", 4)):
+        column_spec = make_column_spec(0, type_code, buckets)
+        builds.append(
+            (
+                "detailPanel." + name,
+                lambda column_spec=column_spec: handlers.get_detail_panel(
+                    column_spec, 1000
+                ),
+            )
+        )
+
+    rows = []
+    for name, build in builds:
+        body = encoding.encode_stdlib(build())
+        rows.append(
+            (
+                "{}[{}]".format(name, size_name),
+                retained_bytes(lambda: json.loads(body)),
+                retained_bytes(build),
+            )
+        )
+    return rows
+
+
+def import_report(module="jupyterlab_automl"):
+    """Returns the cumulative microseconds of every module that importing
+    module loads on top of the notebook server, including module itself."""
+    code = "import {}; import {}".format(", ".join(SERVER_MODULES), module)
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+    modules = OrderedDict()
+    report = None
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+        # Nested imports are indented and listed before the module that
+        # imported them.
+        if not name.startswith("  "):
+            if name.strip() == module:
+                report = modules
+            modules = OrderedDict()
+    return report or OrderedDict()
+
+
+def deferred_imports(report):
+    """Returns the modules in an import_report that should load on first use."""
+    return [
+        name
+        for name in report
+        if any(
+            name == deferred or name.startswith(deferred + ".")
+            for deferred in DEFERRED_MODULES
+        )
+    ]
+
+
+def measure(fn, repeat=5):
+    """Returns the best time over repeat runs and the peak bytes of one run."""
+    best = float("inf")
+    # Like timeit, keep collections from landing in some runs but not others
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run(size_name, repeat=5):
+    """Returns the measurements keyed by "<benchmark>[<size>]"."""
+    results = OrderedDict()
+    for name, fn in make_benchmarks(SIZES[size_name]).items():
+        results["{}[{}]".format(name, size_name)] = measure(fn, repeat)
+    return results
+
+
+def find_regressions(results, baseline, time_tolerance, memory_tolerance):
+    """Returns a message for each result slower or larger than its baseline."""
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for field, tolerance in (
+            ("seconds", time_tolerance),
+            ("peak_bytes", memory_tolerance),
+        ):
+            limit = expected[field] * (1 + tolerance) + SLACK[field]
+            if result[field] > limit:
+                regressions.append(
+                    "{} {} regressed: {:.6g} > {:.6g} (baseline {:.6g})".format(
+                        key, field, result[field], limit, expected[field]
+                    )
+                )
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w") as f:
+        json.dump(OrderedDict(sorted(baseline.items())), f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), action="append")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown as a fraction of the baseline time.",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed growth as a fraction of the baseline peak memory.",
+    )
+    parser.add_argument("--encoding", action="store_true")
+    parser.add_argument("--memory", action="store_true")
+    parser.add_argument("--imports", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = OrderedDict()
+    for size_name in args.size or ["realistic"]:
+        results.update(run(size_name, args.repeat))
+
+    print("{:<45} {:>12} {:>14}".format("benchmark", "ms", "peak KiB"))
+    for key, result in results.items():
+        print(
+            "{:<45} {:>12.3f} {:>14.1f}".format(
+                key, result["seconds"] * 1000, result["peak_bytes"] / 1024
+            )
+        )
+
+    if args.encoding:
+        print()
+        print(
+            "{:<30} {:<8} {:<9} {:>12} {:>10} {:>12}".format(
+                "tableInfo", "encoder", "encoding", "bytes", "encode ms", "compress ms"
+            )
+        )
+        for size_name in args.size or ["realistic"]:
+            for layout, encoder, coding, size, encode_s, compress_s in encoding_report(
+                size_name, args.repeat
+            ):
+                print(
+                    "{:<30} {:<8} {:<9} {:>12} {:>10.3f} {:>12.3f}".format(
+                        "{}[{}]".format(layout, size_name),
+                        encoder,
+                        coding,
+                        size,
+                        encode_s * 1000,
+                        compress_s * 1000,
+                    )
+                )
+
+    if args.memory:
+        print()
+        print(
+            "{:<45} {:>12} {:>14} {:>9}".format(
+                "held", "dicts KiB", "records KiB", "saved"
+            )
+        )
+        for size_name in args.size or ["realistic"]:
+            for name, dict_bytes, record_bytes in memory_report(size_name):
+                print(
+                    "{:<45} {:>12.1f} {:>14.1f} {:>8.0f}%".format(
+                        name,
+                        dict_bytes / 1024,
+                        record_bytes / 1024,
+                        100 * (1 - record_bytes / dict_bytes),
+                    )
+                )
+
+    deferred = []
+    if args.imports:
+        report = import_report()
+        print()
+        print("{:<45} {:>12}".format("import", "ms"))
+        slowest = sorted(report.items(), key=lambda item: -item[1])
+        for name, microseconds in slowest[:15]:
+            print("{:<45} {:>12.3f}".format(name, microseconds / 1000))
+        deferred = deferred_imports(report)
+        for name in deferred:
+            print("{} is imported with the extension".format(name), file=sys.stderr)
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print("Baseline written to " + args.baseline)
+        return 0
+
+    regressions = find_regressions(
+        results,
+        load_baseline(args.baseline),
+        args.time_tolerance,
+        args.memory_tolerance,
+    )
+    for regression in regressions:
+        print(regression, file=sys.stderr)
+    return 1 if regressions or deferred else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
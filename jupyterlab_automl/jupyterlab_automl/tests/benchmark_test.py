@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+
+from jupyterlab_automl.tests import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def testRunsEveryBenchmark(self):
+        tiny = {"tiny": {"columns": 8, "buckets": 3, "datasets": 4}}
+        with patch.dict(benchmark.SIZES, tiny):
+            results = benchmark.run("tiny", repeat=1)
+
+        self.assertIn("get_column_specs[tiny]", results)
+        self.assertIn("get_datasets[tiny]", results)
+        for result in results.values():
+            self.assertGreater(result["seconds"], 0)
+            self.assertGreater(result["peak_bytes"], 0)
+
+    def testEncodingReportCoversEveryEncoding(self):
+        tiny = {"tiny": {"columns": 8, "buckets": 3, "datasets": 4}}
+        with patch.dict(benchmark.SIZES, tiny):
+            rows = benchmark.encoding_report("tiny", repeat=1)
+
+        self.assertEqual(
+            {"identity"} | set(benchmark.encoding.available_encodings()),
+            {row[2] for row in rows},
+        )
+        self.assertEqual({"rows", "columnar"}, {row[0] for row in rows})
+
+    def testRecordsHoldLessThanDicts(self):
+        tiny = {"tiny": {"columns": 8, "buckets": 3, "datasets": 4}}
+        with patch.dict(benchmark.SIZES, tiny):
+            rows = benchmark.memory_report("tiny")
+
+        self.assertIn("tableInfo.rows[tiny]", [row[0] for row in rows])
+        for name, dict_bytes, record_bytes in rows:
+            self.assertLess(record_bytes, dict_bytes, name)
+
+    def testGeneratedProtosAreShapedByTheHandlers(self):
+        datasets = benchmark.make_datasets(4)
+        self.assertEqual(
+            ["TBL", "ICN", "TBL", "ICN"],
+            [benchmark.handlers.get_dataset_metadata(d)[0] for d in datasets],
+        )
+        numeric = benchmark.make_column_spec(0, 3, 3)
+        chart = benchmark.handlers.get_detail_panel(numeric, 10)[0]
+        self.assertEqual(["[-inf, 1]", "[1, 2]", "[2, inf]"], chart.labels)
+
+    def testExtensionDefersClientLibraryImports(self):
+        report = benchmark.import_report()
+        self.assertIn("jupyterlab_automl", report)
+        self.assertIn("jupyterlab_automl.handlers", report)
+        self.assertNotIn("notebook.utils", report)
+        self.assertEqual([], benchmark.deferred_imports(report))
+
+    def testFindsDeferredImports(self):
+        report = {"grpc": 1, "grpcio_tools": 1, "google.auth.transport": 1}
+        self.assertEqual(
+            ["grpc", "google.auth.transport"], benchmark.deferred_imports(report)
+        )
+
+    def testFindsRegressionsPastTolerance(self):
+        baseline = {"a": {"seconds": 1.0, "peak_bytes": 100000}}
+        within = {"a": {"seconds": 1.4, "peak_bytes": 105000}}
+        slower = {"a": {"seconds": 2.0, "peak_bytes": 105000}}
+        larger = {"a": {"seconds": 1.0, "peak_bytes": 200000}}
+        new = {"b": {"seconds": 9.0, "peak_bytes": 900000}}
+
+        def find(results):
+            return benchmark.find_regressions(results, baseline, 0.5, 0.1)
+
+        self.assertEqual([], find(within))
+        self.assertEqual(1, len(find(slower)))
+        self.assertIn("peak_bytes", find(larger)[0])
+        self.assertEqual([], find(new))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from jupyterlab_automl.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(ttl=10, max_size=2, clock=self.clock)
+
+    def testEntriesExpire(self):
+        self.cache.set("a", 1)
+        self.clock.now = 9
+        self.assertEqual(1, self.cache.get("a"))
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual({"hits": 1, "misses": 1, "size": 0}, self.cache.stats())
+
+    def testEvictsLeastRecentlyUsed(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(1, self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(3, self.cache.get("c"))
+
+    def testInvalidateDropsInFlightValues(self):
+        self.cache.set("a", 1)
+        epoch = self.cache.epoch
+        self.cache.invalidate("a")
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", 2, epoch)
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", 3, self.cache.epoch)
+        self.assertEqual(3, self.cache.get("a"))
+
+    def testExpiredValuesStayAvailableAsStale(self):
+        self.cache.set("a", 1)
+        self.assertEqual(1, self.cache.get_stale("a"))
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(1, self.cache.get_stale("a"))
+        self.cache.invalidate("a")
+        self.assertIsNone(self.cache.get_stale("a"))
+
+    def testZeroTtlDisablesCache(self):
+        cache = TTLCache(ttl=0, max_size=2)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import Mock
+
+import grpc
+
+from jupyterlab_automl.clients import ClientRegistry
+
+
+class TestClientRegistry(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+
+        def create_client():
+            client = Mock()
+            self.created.append(client)
+            return client
+
+        self.create_parent = Mock(return_value="parent")
+        self.registry = ClientRegistry(create_client, self.create_parent, 2)
+
+    def testCreatesClientsLazilyAndReusesThem(self):
+        self.assertEqual([], self.created)
+        clients = [self.registry.get_client() for _ in range(6)]
+        self.assertEqual(2, len(self.created))
+        self.assertEqual(self.created * 3, clients)
+
+    def testComputesParentOnce(self):
+        self.assertEqual("parent", self.registry.get_parent("us-central1"))
+        self.assertEqual("parent", self.registry.get_parent("us-central1"))
+        self.create_parent.assert_called_once_with(self.created[0], "us-central1")
+
+    def testReplacesUnhealthyClient(self):
+        first = self.registry.get_client()
+        on_state_change = first.transport.channel.subscribe.call_args[0][0]
+        on_state_change(grpc.ChannelConnectivity.TRANSIENT_FAILURE)
+        self.registry.get_client()
+
+        replacement = self.registry.get_client()
+        self.assertIsNot(first, replacement)
+        first.transport.channel.close.assert_called_once()
+
+    def testCloseClosesChannels(self):
+        clients = [self.registry.get_client() for _ in range(2)]
+        self.registry.close()
+        for client in clients:
+            client.transport.channel.close.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            self.registry.get_client()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import datetime
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from google.auth.exceptions import RefreshError
+from tornado.testing import AsyncTestCase, gen_test
+
+from jupyterlab_automl import credentials, handlers, metrics
+from jupyterlab_automl.executor import BoundedExecutor
+
+
+class FakeCredentials:
+    """Credentials whose refresh takes a while and yields a fixed lifetime."""
+
+    def __init__(self, lifetime=3600, delay=0.2, error=None):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.error = error
+        self.expiry = None
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.expiry is not None and self.expiry > datetime.datetime.utcnow()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(
+            seconds=self.lifetime
+        )
+
+
+def make_provider(fake):
+    with patch("google.auth.default", return_value=(fake, "p")):
+        return handlers.AuthProvider()
+
+
+class TestAuthProvider(unittest.TestCase):
+    def refreshConcurrently(self, provider, count=5):
+        errors = []
+
+        def refresh():
+            try:
+                provider.refresh()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=refresh) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def testConcurrentRefreshesCollapse(self):
+        fake = FakeCredentials()
+        provider = make_provider(fake)
+        joined = metrics.CREDENTIAL_REFRESHES_JOINED.get()
+        refreshes = metrics.CREDENTIAL_REFRESH_SECONDS.get()
+
+        self.assertEqual([], self.refreshConcurrently(provider))
+        self.assertEqual(1, fake.refreshes)
+        self.assertEqual(joined + 4, metrics.CREDENTIAL_REFRESHES_JOINED.get())
+        self.assertEqual(refreshes + 1, metrics.CREDENTIAL_REFRESH_SECONDS.get())
+
+        provider.refresh()
+        self.assertEqual(1, fake.refreshes)
+        provider.refresh(force=True)
+        self.assertEqual(2, fake.refreshes)
+
+    def testFailureReachesEveryWaiter(self):
+        fake = FakeCredentials(error=RefreshError("expired"))
+        provider = make_provider(fake)
+        failures = metrics.CREDENTIAL_REFRESH_ERRORS.get("RefreshError")
+
+        errors = self.refreshConcurrently(provider, count=3)
+        self.assertEqual(1, fake.refreshes)
+        self.assertEqual(3, len(errors))
+        self.assertTrue(all(isinstance(e, RefreshError) for e in errors))
+        self.assertEqual(
+            failures + 1, metrics.CREDENTIAL_REFRESH_ERRORS.get("RefreshError")
+        )
+
+    def testClientsUseTheProviderCredential(self):
+        fake = FakeCredentials(delay=0)
+        provider = make_provider(fake)
+        with patch.object(handlers.AuthProvider, "_instance", provider), patch(
+            "google.cloud.automl_v1beta1.AutoMlClient"
+        ) as client_class:
+            handlers.create_automl_client()
+        client_class.assert_called_once_with(credentials=fake)
+        self.assertEqual(1, fake.refreshes)
+
+
+class TestCredentialRefresher(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = BoundedExecutor(max_workers=2, max_queue=8)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super().tearDown()
+
+    @gen_test
+    async def testRefreshesBeforeExpiry(self):
+        fake = FakeCredentials(lifetime=3600, delay=0)
+        provider = make_provider(fake)
+        provider.refresh()
+        refresher = credentials.CredentialRefresher(self.executor, margin=300)
+
+        with patch.object(handlers.AuthProvider, "_instance", provider):
+            await refresher.run()
+            self.assertEqual(1, fake.refreshes)
+            self.assertAlmostEqual(3300, refresher.next_delay, delta=5)
+
+            fake.lifetime = 3600
+            fake.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=60)
+            await refresher.run()
+            self.assertEqual(2, fake.refreshes)
+        refresher.stop()
+
+    @gen_test
+    async def testRetriesUntilCredentialExists(self):
+        refresher = credentials.CredentialRefresher(
+            self.executor, margin=300, retry_delay=30
+        )
+        with patch.object(handlers.AuthProvider, "_instance", None):
+            await refresher.run()
+        self.assertEqual(30, refresher.next_delay)
+
+        fake = FakeCredentials(delay=0, error=RefreshError("expired"))
+        fake.expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=60)
+        with patch.object(handlers.AuthProvider, "_instance", make_provider(fake)):
+            await refresher.run()
+        self.assertEqual(1, fake.refreshes)
+        self.assertEqual(30, refresher.next_delay)
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
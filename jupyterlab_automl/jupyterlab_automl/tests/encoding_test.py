@@ -0,0 +1,45 @@
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+from jupyterlab_automl import encoding
+
+
+class TestEncoding(unittest.TestCase):
+    def testEncodersAgree(self):
+        payload = {"columnSpecs": [{"id": "c", "count": 3, "nullable": True}]}
+        self.assertEqual(payload, json.loads(encoding.encode_stdlib(payload)))
+        if encoding.orjson is not None:
+            self.assertEqual(
+                encoding.encode_stdlib(payload), encoding.encode_orjson(payload)
+            )
+            wide = {"n": 2 ** 70}
+            self.assertEqual(wide, json.loads(encoding.encode_orjson(wide)))
+
+    def testAutoFallsBackToStdlib(self):
+        with patch.object(encoding, "orjson", None):
+            self.assertIs(encoding.encode_stdlib, encoding.get_json_encoder("auto"))
+            with self.assertRaises(ValueError):
+                encoding.get_json_encoder("orjson")
+        self.assertIs(encoding.encode_stdlib, encoding.get_json_encoder("json"))
+
+    def testNegotiatesBestAcceptedEncoding(self):
+        available = ("br", "gzip")
+        self.assertEqual(
+            "br", encoding.negotiate_encoding("gzip, deflate, br", available)
+        )
+        self.assertEqual(
+            "gzip", encoding.negotiate_encoding("br;q=0.5, gzip", available)
+        )
+        self.assertEqual("gzip", encoding.negotiate_encoding("*", ("gzip",)))
+        self.assertIsNone(encoding.negotiate_encoding("gzip;q=0", available))
+        self.assertIsNone(encoding.negotiate_encoding("", available))
+
+    def testCompressRoundTrips(self):
+        body = b'{"a":1}' * 100
+        self.assertEqual(body, gzip.decompress(encoding.compress(body, "gzip")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from jupyterlab_automl.executor import (
+    BoundedExecutor,
+    ExecutorBusyError,
+    iter_concurrently,
+)
+
+
+class TestBoundedExecutor(unittest.TestCase):
+    def testRunsCallsConcurrently(self):
+        executor = BoundedExecutor(max_workers=4, max_queue=0)
+        start = time.monotonic()
+        futures = [executor.submit(time.sleep, 0.2) for _ in range(4)]
+        for future in futures:
+            future.result()
+        elapsed = time.monotonic() - start
+        executor.shutdown()
+        self.assertLess(elapsed, 0.6)
+
+    def testRejectsWorkBeyondQueueDepth(self):
+        executor = BoundedExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+        with self.assertRaises(ExecutorBusyError):
+            executor.submit(release.wait)
+        release.set()
+        running.result()
+        queued.result()
+        executor.submit(lambda: None).result()
+        executor.shutdown()
+
+
+class TestIterConcurrently(unittest.TestCase):
+    def testKeepsOrderAndRunsOnTheSharedExecutor(self):
+        executor = BoundedExecutor(max_workers=2, max_queue=0)
+        self.addCleanup(executor.shutdown)
+        threads = set()
+
+        def slow(delay):
+            threads.add(threading.current_thread().name)
+            time.sleep(delay)
+            return delay
+
+        start = time.monotonic()
+        results = list(iter_concurrently(slow, [0.2, 0.1, 0.2], 3, executor))
+        self.assertEqual([0.2, 0.1, 0.2], results)
+        self.assertLess(time.monotonic() - start, 0.35)
+        self.assertTrue(any(name.startswith("automl") for name in threads))
+
+    def testCallerDoesTheWorkWhenTheExecutorIsFull(self):
+        executor = BoundedExecutor(max_workers=1, max_queue=0)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        busy = executor.submit(release.wait)
+        try:
+            self.assertEqual(
+                [2, 4, 6],
+                list(iter_concurrently(lambda x: 2 * x, [1, 2, 3], 4, executor)),
+            )
+        finally:
+            release.set()
+            busy.result()
+
+    def testRaisesWhenTheFailedResultIsReached(self):
+        def fail_on_two(x):
+            if x == 2:
+                raise ValueError("two")
+            return x
+
+        results = iter_concurrently(fail_on_two, [1, 2, 3], 2)
+        self.assertEqual(1, next(results))
+        with self.assertRaises(ValueError):
+            next(results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,36 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import Mock, MagicMock, patch
 
-from jupyterlab_automl import handlers
+from tornado.httpclient import AsyncHTTPClient
+from tornado.tcpclient import TCPClient
+from tornado.testing import AsyncHTTPTestCase, AsyncTestCase, gen_test
+from tornado.web import Application
 
+from jupyterlab_automl import (
+    encoding,
+    handlers,
+    metrics,
+    records,
+    tracing,
+    upstream,
+)
+from jupyterlab_automl.cache import TTLCache
+from jupyterlab_automl.clients import ClientRegistry
+from jupyterlab_automl.config import AutoMLConfig
+from jupyterlab_automl.executor import BoundedExecutor
+from jupyterlab_automl.index import ListingIndexes
+from jupyterlab_automl.operations import OperationTracker
+from jupyterlab_automl.store import TableSpecStore
+from jupyterlab_automl.watcher import ResourceWatcher
+
+from google.api_core.exceptions import ResourceExhausted
 from google.cloud.automl_v1beta1.types import (
     Dataset,
     Timestamp,
@@ -16,15 +44,33 @@ from google.cloud.automl_v1beta1.types import (
 )
 
 
+class FakePager:
+    """Stands in for the GRPCIterator returned by AutoML list calls."""
+
+    def __init__(self, items, page_size):
+        self.items = items
+        self.page_size = page_size
+        self.next_page_token = None
+
+    @property
+    def pages(self):
+        start = int(self.next_page_token or 0)
+        while start < len(self.items):
+            end = start + self.page_size
+            self.next_page_token = str(end) if end < len(self.items) else ""
+            yield self.items[start:end]
+            start = end
+
+
 class TestAutoMLExtension(unittest.TestCase):
     def testListDatasets(self):
         metadata = ImageClassificationDatasetMetadata(classification_type=1)
-        time = Timestamp(seconds=0, nanos=0)
+        timestamp = Timestamp(seconds=0, nanos=0)
         gcp_datasets = [
             Dataset(
                 display_name="dummy_dataset1",
                 name="ICN_dummy_dataset1",
-                create_time=time,
+                create_time=timestamp,
                 example_count=9999,
                 description="dummy_description",
                 image_classification_dataset_metadata=metadata,
@@ -52,19 +98,19 @@ class TestAutoMLExtension(unittest.TestCase):
         self.assertEqual(wanted, got)
 
     def testListModels(self):
-        time = Timestamp(seconds=0, nanos=0)
+        timestamp = Timestamp(seconds=0, nanos=0)
         gcp_models = [
             Model(
                 display_name="dummy_model1",
                 name="dummy_model1",
-                update_time=time,
+                update_time=timestamp,
                 dataset_id="dummy_dataset1",
                 deployment_state=2,
             ),
             Model(
                 display_name="dummy_model2",
                 name="dummy_model2",
-                update_time=time,
+                update_time=timestamp,
                 dataset_id="dummy_dataset2",
                 deployment_state=1,
             ),
@@ -145,7 +191,6 @@ class TestAutoMLExtension(unittest.TestCase):
                     "invalidValueCount": 0,
                     "nullValueCount": "0 (0%)",
                     "nullable": True,
-                    "detailPanel": [wanted_chart_info, 10.11, 2.21],
                 },
             ],
             [{"name": "Numeric", "Number of Instances": 1}],
@@ -165,9 +210,20 @@ class TestAutoMLExtension(unittest.TestCase):
         }
 
         got_column = handlers.get_column_specs(mock_client, gcp_table_specs[0])
-        self.assertEqual(wanted_column, got_column)
+        self.assertEqual(wanted_column, records.to_json(got_column))
         got_table = handlers.get_table_specs(mock_client, "datasetId")
-        self.assertEqual(wanted_table, got_table)
+        self.assertEqual(wanted_table, records.to_json(got_table))
+
+        mock_client.get_column_spec = MagicMock(return_value=gcp_column_specs[0])
+        mock_client.get_table_spec = MagicMock(return_value=gcp_table_specs[0])
+        got_detail = handlers.get_column_detail(
+            mock_client, "dummy_table1/columnSpecs/dummy_column1"
+        )
+        self.assertEqual(
+            {"detailPanel": [wanted_chart_info, 10.11, 2.21]},
+            records.to_json(got_detail),
+        )
+        mock_client.get_table_spec.assert_called_once_with("dummy_table1")
 
     def testListTableSpecs2(self):
         dummy_type_2 = DataType(type_code=10)
@@ -215,7 +271,6 @@ class TestAutoMLExtension(unittest.TestCase):
                     "invalidValueCount": 2,
                     "nullValueCount": "1 (25%)",
                     "nullable": False,
-                    "detailPanel": [chart_info, "Test1 (66.667%)"],
                 },
             ],
             [{"name": "Categorical", "Number of Instances": 1},],
@@ -235,9 +290,874 @@ class TestAutoMLExtension(unittest.TestCase):
         }
 
         got_column = handlers.get_column_specs(mock_client, gcp_table_specs[0])
-        self.assertEqual(wanted_column, got_column)
+        self.assertEqual(wanted_column, records.to_json(got_column))
         got_table = handlers.get_table_specs(mock_client, "datasetId")
-        self.assertEqual(wanted_table, got_table)
+        self.assertEqual(wanted_table, records.to_json(got_table))
+
+        mock_client.get_column_spec = MagicMock(return_value=gcp_column_specs[0])
+        mock_client.get_table_spec = MagicMock(return_value=gcp_table_specs[0])
+        got_detail = handlers.get_column_detail(
+            mock_client, "dummy_table1/columnSpecs/dummy_column2"
+        )
+        self.assertEqual(
+            {"detailPanel": [chart_info, "Test1 (66.667%)"]},
+            records.to_json(got_detail),
+        )
+
+    def testListModelsPage(self):
+        timestamp = Timestamp(seconds=0, nanos=0)
+        gcp_models = [
+            Model(name="model{}".format(i), update_time=timestamp) for i in range(5)
+        ]
+        mock_client = Mock()
+        mock_client.list_models = lambda parent, page_size: FakePager(
+            gcp_models, page_size
+        )
+
+        got = handlers.get_models_page(mock_client, "parent", 2)
+        self.assertEqual(["model0", "model1"], [m["id"] for m in got["models"]])
+        self.assertEqual("2", got["nextPageToken"])
+        got = handlers.get_models_page(mock_client, "parent", 2, "4")
+        self.assertEqual(["model4"], [m["id"] for m in got["models"]])
+        self.assertEqual("", got["nextPageToken"])
+
+    def testListTableSpecsPage(self):
+        gcp_table_specs = [
+            TableSpec(name="table0", row_count=1),
+            TableSpec(name="table1", row_count=1),
+        ]
+        gcp_column_specs = {
+            "table0": [ColumnSpec(name="column{}".format(i)) for i in range(3)],
+            "table1": [ColumnSpec(name="column3")],
+        }
+        mock_client = Mock()
+        mock_client.list_table_specs = MagicMock(return_value=gcp_table_specs)
+        mock_client.list_column_specs = lambda name, page_size: FakePager(
+            gcp_column_specs[name], page_size
+        )
+
+        pages = []
+        token = ""
+        while True:
+            got = handlers.get_table_specs_page(
+                mock_client, "datasetId", 2, *handlers.parse_page_token(token)
+            )
+            pages.append(
+                [(spec.id, spec.column_specs.ids) for spec in got["tableSpecs"]]
+            )
+            token = got["nextPageToken"]
+            if not token:
+                break
+        self.assertEqual(
+            [
+                [("table0", ["column0", "column1"])],
+                [("table0", ["column2"])],
+                [("table1", ["column3"])],
+            ],
+            pages,
+        )
+
+    def testListTableSpecsColumnar(self):
+        table_spec = TableSpec(name="table0", row_count=10)
+        gcp_column_specs = [
+            ColumnSpec(
+                name="column{}".format(i),
+                display_name="Column {}".format(i),
+                data_type=DataType(type_code=3 if i else 10, nullable=i == 1),
+                data_stats=DataStats(
+                    distinct_value_count=i, valid_value_count=8, null_value_count=i
+                ),
+            )
+            for i in range(2)
+        ]
+
+        rows, summary = records.to_json(
+            handlers.summarize_column_specs(table_spec, gcp_column_specs)
+        )
+        columns, columnar_summary = records.to_json(
+            handlers.summarize_column_specs(table_spec, gcp_column_specs, columnar=True)
+        )
+        self.assertEqual(
+            {
+                "id": ["column0", "column1"],
+                "dataType": ["Categorical", "Numeric"],
+                "displayName": ["Column 0", "Column 1"],
+                "distinctValueCount": [0, 1],
+                "invalidValueCount": [2, 2],
+                "nullValueCount": [0, 1],
+                "nullable": [False, True],
+            },
+            columns,
+        )
+        self.assertEqual(["0 (0%)", "1 (10%)"], [r["nullValueCount"] for r in rows])
+        self.assertEqual(summary, columnar_summary)
+
+    def testTableSpecsFetchedConcurrently(self):
+        gcp_table_specs = [
+            TableSpec(name="dummy_table{}".format(i), row_count=1) for i in range(4)
+        ]
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def slow_list_column_specs(table_name):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            # Finish in reverse order to check the output order is kept.
+            time.sleep(0.4 - 0.1 * int(table_name[-1]))
+            with lock:
+                running[0] -= 1
+            return []
+
+        mock_client = Mock()
+        mock_client.list_table_specs = MagicMock(return_value=gcp_table_specs)
+        mock_client.list_column_specs = slow_list_column_specs
+
+        executor = BoundedExecutor(max_workers=3, max_queue=0)
+        self.addCleanup(executor.shutdown)
+        start = time.monotonic()
+        got = handlers.get_table_specs(
+            mock_client, "datasetId", max_concurrency=4, executor=executor
+        )
+        concurrent_elapsed = time.monotonic() - start
+        self.assertLess(concurrent_elapsed, 0.6)
+        self.assertEqual(
+            [spec.name for spec in gcp_table_specs],
+            [spec.id for spec in got["tableSpecs"]],
+        )
+
+        running[1] = 0
+        start = time.monotonic()
+        handlers.get_table_specs(
+            mock_client, "datasetId", max_concurrency=2, executor=executor
+        )
+        self.assertEqual(2, running[1])
+        self.assertGreater(time.monotonic() - start, concurrent_elapsed)
+
+
+class TestCoalescer(AsyncTestCase):
+    @gen_test
+    async def testConcurrentCallsShareOneResult(self):
+        coalescer = handlers.Coalescer()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {"tableSpecs": []}
+
+        results = await asyncio.gather(
+            *[coalescer.run(("tableInfo", "d1"), fetch) for _ in range(3)],
+            coalescer.run(("tableInfo", "d2"), fetch),
+        )
+        self.assertEqual(2, len(calls))
+        self.assertIs(results[0], results[1])
+        self.assertEqual(
+            {
+                "calls": {"tableInfo": 2},
+                "deduplicated": {"tableInfo": 2},
+                "in_flight": 0,
+            },
+            coalescer.stats(),
+        )
+
+        await coalescer.run(("tableInfo", "d1"), fetch)
+        self.assertEqual(3, len(calls))
+
+    @gen_test
+    async def testErrorsReachEveryWaiter(self):
+        coalescer = handlers.Coalescer()
+
+        async def fail():
+            await asyncio.sleep(0.1)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(
+            *[coalescer.run(("tableInfo", "d1"), fail) for _ in range(3)],
+            return_exceptions=True,
+        )
+        self.assertEqual(["upstream failed"] * 3, [str(r) for r in results])
+
+    @gen_test
+    async def testCancelledWaiterDoesNotCancelOthers(self):
+        coalescer = handlers.Coalescer()
+
+        async def fetch():
+            await asyncio.sleep(0.2)
+            return "done"
+
+        first = asyncio.ensure_future(coalescer.run(("k",), fetch))
+        second = asyncio.ensure_future(coalescer.run(("k",), fetch))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(first, 0.05)
+        self.assertEqual("done", await second)
+
+
+class TestAutoMLHandlers(AsyncHTTPTestCase):
+    def get_app(self):
+        self.executor = BoundedExecutor(max_workers=4, max_queue=0)
+        self.mock_client = Mock()
+        self.config = AutoMLConfig()
+        self.coalescer = handlers.Coalescer()
+        listings = TTLCache(ttl=60, max_size=8)
+        settings = {}
+        self.watcher = ResourceWatcher(settings)
+        app = Application(
+            [
+                (r"/datasets(.*)", handlers.ListDatasets),
+                (r"/models(.*)", handlers.ListModels),
+                (r"/resources(.*)", handlers.ListResources),
+                (r"/tableInfo(.*)", handlers.ListTableInfo),
+                (r"/columnDetail(.*)", handlers.GetColumnDetail),
+                (r"/deleteDataset(.*)", handlers.DeleteDataset),
+                (r"/operation(.*)", handlers.GetOperation),
+                (r"/metrics(.*)", handlers.GetMetrics),
+                (r"/changes(.*)", handlers.WatchResources),
+            ],
+            automl_config=self.config,
+            automl_executor=self.executor,
+            automl_clients=ClientRegistry(
+                lambda: self.mock_client,
+                lambda client, location: "projects/p/locations/" + location,
+            ),
+            automl_listings=listings,
+            automl_listing_indexes=ListingIndexes(),
+            automl_column_details=TTLCache(ttl=60, max_size=8),
+            automl_coalescer=self.coalescer,
+            automl_operations=OperationTracker(
+                self.executor,
+                lambda kind, resource_id: listings.invalidate(
+                    (kind, handlers.parse_location(resource_id))
+                ),
+            ),
+            automl_watcher=self.watcher,
+        )
+        settings.update(app.settings)
+        return app
+
+    def tearDown(self):
+        self.watcher.stop()
+        super().tearDown()
+        self.executor.shutdown()
+
+    @gen_test
+    def testConcurrentRequestsOverlap(self):
+        def slow_list(parent):
+            time.sleep(0.3)
+            return []
+
+        self.mock_client.list_datasets = slow_list
+        self.mock_client.list_models = slow_list
+        http_client = AsyncHTTPClient()
+        start = time.monotonic()
+        responses = yield [
+            http_client.fetch(self.get_url("/datasets")),
+            http_client.fetch(self.get_url("/datasets")),
+            http_client.fetch(self.get_url("/models")),
+            http_client.fetch(self.get_url("/models")),
+        ]
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(
+            [{"datasets": []}] * 2 + [{"models": []}] * 2,
+            [json.loads(r.body) for r in responses],
+        )
+        self.assertLess(elapsed, 0.9)
+
+    def testPagesSkipFailingLocations(self):
+        self.config.locations = ["down", "slow", "up"]
+        self.config.location_timeout = 0.2
+        timestamp = Timestamp(seconds=0, nanos=0)
+
+        def list_models(parent, page_size):
+            location = parent.split("/")[-1]
+            if location == "down":
+                raise ValueError("region down")
+            if location == "slow":
+                time.sleep(0.5)
+            models = [Model(name="up_model", update_time=timestamp)]
+            return FakePager(models, page_size)
+
+        self.mock_client.list_models = list_models
+        response = self.fetch("/resources?include=models&pageSize=40")
+        got = json.loads(response.body)
+        self.assertEqual(200, response.code)
+        self.assertEqual(["up_model"], [m["id"] for m in got["models"]])
+        self.assertEqual(
+            [
+                {"resource": "models", "location": "down", "message": "region down"},
+                {
+                    "resource": "models",
+                    "location": "slow",
+                    "message": "Listing models in slow timed out after 0.2s",
+                },
+            ],
+            got["errors"],
+        )
+        self.assertEqual({"models": ""}, got["nextPageTokens"])
+
+        self.config.locations = ["down"]
+        self.assertEqual(500, self.fetch("/models?pageSize=40").code)
+
+    def testListsLocationsConcurrently(self):
+        self.config.locations = ["us-central1", "eu", "asia"]
+        self.config.location_timeout = 0.5
+        timestamp = Timestamp(seconds=0, nanos=0)
+
+        def list_models(parent):
+            location = parent.split("/")[-1]
+            if location == "eu":
+                raise ValueError("eu is unavailable")
+            time.sleep(0.3 if location == "us-central1" else 1.0)
+            return [Model(name=location + "_model", update_time=timestamp)]
+
+        self.mock_client.list_models = list_models
+        start = time.monotonic()
+        response = self.fetch("/models")
+        elapsed = time.monotonic() - start
+
+        got = json.loads(response.body)
+        self.assertEqual(200, response.code)
+        self.assertEqual(
+            [("us-central1_model", "us-central1")],
+            [(m["id"], m["location"]) for m in got["models"]],
+        )
+        self.assertEqual(
+            [
+                {"location": "eu", "message": "eu is unavailable"},
+                {
+                    "location": "asia",
+                    "message": "Listing models in asia timed out after 0.5s",
+                },
+            ],
+            got["errors"],
+        )
+        self.assertLess(elapsed, 0.9)
+
+    def testListsResourcesConcurrently(self):
+        timestamp = Timestamp(seconds=0, nanos=0)
+
+        def list_models(parent):
+            time.sleep(0.3)
+            return [Model(name="model1", update_time=timestamp)]
+
+        def list_datasets(parent):
+            time.sleep(0.3)
+            raise ValueError("datasets are unavailable")
+
+        self.mock_client.list_models = list_models
+        self.mock_client.list_datasets = list_datasets
+        start = time.monotonic()
+        response = self.fetch("/resources")
+        elapsed = time.monotonic() - start
+
+        got = json.loads(response.body)
+        self.assertEqual(200, response.code)
+        self.assertEqual(["model1"], [m["id"] for m in got["models"]])
+        self.assertNotIn("datasets", got)
+        self.assertEqual(
+            [{"resource": "datasets", "message": "datasets are unavailable"}],
+            got["errors"],
+        )
+        self.assertLess(elapsed, 0.55)
+
+        self.mock_client.list_models = lambda parent, page_size: FakePager(
+            [Model(name="model1", update_time=timestamp)], page_size
+        )
+        got = json.loads(self.fetch("/resources?include=models&pageSize=1").body)
+        self.assertEqual(["models"], [k for k in got if k != "nextPageTokens"])
+        self.assertEqual({"models": ""}, got["nextPageTokens"])
+        self.assertEqual(400, self.fetch("/resources?include=tables").code)
+
+    def testListingsAreFilteredSortedAndSearched(self):
+        self.mock_client.list_models = MagicMock(
+            return_value=[
+                Model(
+                    name="model{}".format(i),
+                    display_name="Model {}".format(i),
+                    update_time=Timestamp(seconds=i),
+                    deployment_state=1 + i % 2,
+                )
+                for i in range(5)
+            ]
+        )
+
+        def fetch_ids(query):
+            got = json.loads(self.fetch("/models?" + query).body)
+            return [m["id"] for m in got["models"]], got.get("nextPageToken")
+
+        self.assertEqual(
+            (["model4", "model2", "model0"], None),
+            fetch_ids("filter=deploymentState:1&sort=-updateTime"),
+        )
+        self.assertEqual((["model3"], None), fetch_ids("filter=updateTime>2000&q=3"))
+        self.assertEqual(
+            (["model1", "model2"], "3"), fetch_ids("q=MODEL&pageSize=2&pageToken=1")
+        )
+        self.assertEqual(1, self.mock_client.list_models.call_count)
+        indexes = self._app.settings["automl_listing_indexes"]
+        self.assertEqual((2, 1), (indexes.hits, indexes.misses))
+
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+        got = json.loads(self.fetch("/resources?filter=datasetType:TBL&q=4").body)
+        self.assertEqual([], got["datasets"])
+        self.assertEqual(["model4"], [m["id"] for m in got["models"]])
+        self.assertEqual(400, self.fetch("/models?filter=datasetType:TBL").code)
+        self.assertEqual(400, self.fetch("/models?sort=name").code)
+
+    def testServesStaleListingsWhileAutoMLIsOverloaded(self):
+        now = [0]
+        listings = TTLCache(ttl=10, max_size=8, clock=lambda: now[0])
+        self._app.settings["automl_listings"] = listings
+        self.mock_client.list_datasets = MagicMock(
+            return_value=[Dataset(name="p/ICN1", display_name="flowers")]
+        )
+        self.fetch("/datasets")
+        now[0] = 10
+
+        self.mock_client.list_datasets.side_effect = ResourceExhausted("quota")
+        with patch.object(upstream, "GUARD", upstream.UpstreamGuard()) as guard:
+            guard.configure(retries=0, failure_threshold=1)
+            response = self.fetch("/datasets")
+            self.assertEqual(200, response.code)
+            self.assertEqual("stale", response.headers["X-AutoML-Cache"])
+            self.assertEqual(
+                ["flowers"],
+                [d["displayName"] for d in json.loads(response.body)["datasets"]],
+            )
+            self.assertEqual("open", guard.stats()["breaker"])
+
+            response = self.fetch("/models")
+            self.assertEqual(503, response.code)
+            self.assertIn("Retry-After", response.headers)
+
+    def testListingsAreCachedUntilDeleted(self):
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+
+        self.assertEqual("miss", self.fetch("/datasets").headers["X-AutoML-Cache"])
+        self.assertEqual("hit", self.fetch("/datasets").headers["X-AutoML-Cache"])
+        self.assertEqual(1, self.mock_client.list_datasets.call_count)
+
+        self.fetch("/datasets?fresh=1")
+        self.assertEqual(2, self.mock_client.list_datasets.call_count)
+
+        # Resource names hold the project number, not the project id.
+        self.fetch(
+            "/deleteDataset",
+            method="POST",
+            body=json.dumps(
+                {"datasetId": "projects/123456789/locations/us-central1/datasets/TBL1"}
+            ),
+        )
+        self.assertEqual("miss", self.fetch("/datasets").headers["X-AutoML-Cache"])
+        self.assertEqual(3, self.mock_client.list_datasets.call_count)
+
+    @gen_test
+    def testConcurrentTableInfoRequestsShareOneFetch(self):
+        def slow_list_table_specs(datasetId):
+            time.sleep(0.2)
+            return [TableSpec(name="table0", row_count=1)]
+
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(side_effect=slow_list_table_specs)
+        self.mock_client.list_column_specs = MagicMock(return_value=[])
+        http_client = AsyncHTTPClient()
+        responses = yield [
+            http_client.fetch(self.get_url("/tableInfo?datasetId=d")) for _ in range(3)
+        ]
+
+        self.assertEqual(1, self.mock_client.list_table_specs.call_count)
+        self.assertEqual(
+            [["table0"]] * 3,
+            [[t["id"] for t in json.loads(r.body)["tableSpecs"]] for r in responses],
+        )
+        self.assertEqual(2, self.coalescer.stats()["deduplicated"]["tableInfo"])
+
+    def testTableInfoServedFromDisk(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = TableSpecStore(os.path.join(directory.name, "specs.sqlite"), 1 << 20)
+        self.addCleanup(store.close)
+        self._app.settings["automl_table_specs"] = store
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(
+            return_value=[TableSpec(name="table0", row_count=1)]
+        )
+        self.mock_client.list_column_specs = MagicMock(return_value=[])
+
+        first = self.fetch("/tableInfo?datasetId=d")
+        second = self.fetch("/tableInfo?datasetId=d")
+        stream = self.fetch("/tableInfo?datasetId=d&format=ndjson")
+
+        self.assertEqual(1, self.mock_client.list_table_specs.call_count)
+        self.assertNotIn("X-AutoML-Cache", first.headers)
+        self.assertEqual("disk", second.headers["X-AutoML-Cache"])
+        self.assertEqual(json.loads(first.body), json.loads(second.body))
+        self.assertEqual(
+            [{"id": "table0"}],
+            [{"id": json.loads(line)["id"]} for line in stream.body.splitlines()],
+        )
+
+        self.fetch("/tableInfo?datasetId=d&fresh=1")
+        self.assertEqual(2, self.mock_client.list_table_specs.call_count)
+
+    @gen_test
+    def testChangeFeedPushesSnapshot(self):
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+        self.mock_client.list_models = MagicMock(
+            return_value=[Model(name="model0", update_time=Timestamp(seconds=1))]
+        )
+        stream = yield TCPClient().connect("127.0.0.1", self.get_http_port())
+        yield stream.write(b"GET /changes HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        received = yield stream.read_until(b"event: snapshot\ndata: ")
+        data = yield stream.read_until(b"\n\n")
+
+        self.assertIn(b"Content-Type: text/event-stream", received)
+        self.assertEqual(["model0"], [m["id"] for m in json.loads(data)["models"]])
+        self.assertEqual(1, self.watcher.subscribers)
+
+        stream.close()
+        for _ in range(50):
+            if not self.watcher.subscribers:
+                break
+            yield asyncio.sleep(0.02)
+        self.assertEqual(0, self.watcher.subscribers)
+
+    @gen_test
+    def testChangeFeedCanSkipSnapshot(self):
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+        self.mock_client.list_models = MagicMock(return_value=[])
+        stream = yield TCPClient().connect("127.0.0.1", self.get_http_port())
+        yield stream.write(
+            b"GET /changes?snapshot=0 HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        )
+        yield stream.read_until(b": connected\n\n")
+        for _ in range(50):
+            if self.watcher.polls:
+                break
+            yield asyncio.sleep(0.02)
+        self.watcher._publish("changes", {"models": {"added": []}})
+        yield stream.read_until(b"event: ")
+        event = yield stream.read_until(b"\n")
+        self.assertEqual(b"changes\n", event)
+        stream.close()
+
+    def testChangeFeedNeedsALogin(self):
+        login_handler = Mock()
+        login_handler.get_user = MagicMock(return_value=None)
+        self._app.settings["login_handler_class"] = login_handler
+        self.assertEqual(403, self.fetch("/changes").code)
+        self.assertEqual(0, self.watcher.subscribers)
+
+    def testStreamsNdjson(self):
+        timestamp = Timestamp(seconds=0, nanos=0)
+        self.mock_client.list_models = MagicMock(
+            return_value=[
+                Model(name="model{}".format(i), update_time=timestamp) for i in range(3)
+            ]
+        )
+        response = self.fetch("/models?format=ndjson")
+        self.assertEqual("application/x-ndjson", response.headers["Content-Type"])
+        records = [json.loads(line) for line in response.body.splitlines()]
+        self.assertEqual(["model0", "model1", "model2"], [r["id"] for r in records])
+
+    def testStreamsEmptyNdjson(self):
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(return_value=[])
+        response = self.fetch("/tableInfo?datasetId=d&format=ndjson")
+        self.assertEqual("application/x-ndjson", response.headers["Content-Type"])
+        self.assertEqual(b"", response.body)
+
+    def testTableInfoStreamRetriesEachTable(self):
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(
+            return_value=[TableSpec(name="table0", row_count=1)]
+        )
+        self.mock_client.list_column_specs = MagicMock(
+            side_effect=[ResourceExhausted("quota"), []]
+        )
+        with patch.object(upstream, "GUARD", upstream.UpstreamGuard()) as guard:
+            guard.configure(retries=1, base_delay=0)
+            response = self.fetch("/tableInfo?datasetId=d&format=ndjson")
+        records = [json.loads(line) for line in response.body.splitlines()]
+        self.assertEqual(["table0"], [record["id"] for record in records])
+        self.assertEqual(2, self.mock_client.list_column_specs.call_count)
+
+    @gen_test
+    def testConcurrentTableInfoStreamsShareOneFetch(self):
+        def slow_list(datasetId):
+            time.sleep(0.2)
+            return [TableSpec(name="table0", row_count=1)]
+
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(side_effect=slow_list)
+        self.mock_client.list_column_specs = MagicMock(return_value=[])
+        http_client = AsyncHTTPClient()
+        url = self.get_url("/tableInfo?datasetId=d&format=ndjson")
+        responses = yield [http_client.fetch(url), http_client.fetch(url)]
+
+        for response in responses:
+            records = [json.loads(line) for line in response.body.splitlines()]
+            self.assertEqual(["table0"], [record["id"] for record in records])
+        self.assertEqual(1, self.mock_client.list_table_specs.call_count)
+        self.assertEqual(1, self.mock_client.list_column_specs.call_count)
+        self.assertEqual(1, self.coalescer.stats()["deduplicated"]["tableInfoStream"])
+
+    def testStreamReportsErrorsInBand(self):
+        def iter_table_specs(
+            client, datasetId, max_concurrency, columnar, executor, guarded
+        ):
+            yield [{"id": "table1"}]
+            raise ValueError("upstream failed")
+
+        with patch.object(handlers, "iter_table_specs", iter_table_specs):
+            response = self.fetch("/tableInfo?datasetId=d&format=ndjson")
+        records = [json.loads(line) for line in response.body.splitlines()]
+        self.assertEqual(
+            [{"id": "table1"}, {"error": {"message": "upstream failed"}}], records
+        )
+
+    def testColumnDetailCachedPerStatsUpdateTime(self):
+        column_spec_id = "datasets/d/tableSpecs/t/columnSpecs/c"
+        self.mock_client.get_column_spec = MagicMock(
+            return_value=ColumnSpec(name=column_spec_id)
+        )
+        self.mock_client.get_table_spec = MagicMock(return_value=TableSpec())
+        self.mock_client.get_dataset = MagicMock()
+
+        for seconds in [1, 1, 2]:
+            self.mock_client.get_dataset.return_value = Dataset(
+                tables_dataset_metadata=TablesDatasetMetadata(
+                    stats_update_time=Timestamp(seconds=seconds)
+                )
+            )
+            # The client's statsUpdateTime no longer matters
+            response = self.fetch(
+                "/columnDetail?statsUpdateTime=1&columnSpecId=" + column_spec_id
+            )
+            self.assertEqual({"detailPanel": []}, json.loads(response.body))
+        self.mock_client.get_dataset.assert_called_with("datasets/d")
+        self.assertEqual(2, self.mock_client.get_column_spec.call_count)
+
+    def testListingsAnswerIfNoneMatch(self):
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+        etag = self.fetch("/datasets").headers["Etag"]
+        response = self.fetch("/datasets", headers={"If-None-Match": etag})
+        self.assertEqual(304, response.code)
+        self.assertEqual(b"", response.body)
+
+    def testTableInfoEtagFollowsStatsUpdateTime(self):
+        dataset = Dataset(
+            tables_dataset_metadata=TablesDatasetMetadata(
+                stats_update_time=Timestamp(seconds=1)
+            )
+        )
+        self.mock_client.get_dataset = MagicMock(return_value=dataset)
+        self.mock_client.list_table_specs = MagicMock(return_value=[])
+
+        etag = self.fetch("/tableInfo?datasetId=d").headers["Etag"]
+        response = self.fetch("/tableInfo?datasetId=d", headers={"If-None-Match": etag})
+        self.assertEqual(304, response.code)
+        self.assertEqual(1, self.mock_client.list_table_specs.call_count)
+
+        dataset.tables_dataset_metadata.stats_update_time.seconds = 2
+        response = self.fetch("/tableInfo?datasetId=d", headers={"If-None-Match": etag})
+        self.assertEqual(200, response.code)
+        self.assertNotEqual(etag, response.headers["Etag"])
+
+    def testBatchDeleteReturnsOperation(self):
+        operation = Mock()
+        operation.operation.name = "operations/1"
+        operation.done = MagicMock(side_effect=[False, True])
+        operation.exception = MagicMock(return_value=None)
+        self.mock_client.delete_dataset = MagicMock(
+            side_effect=[operation, ValueError("not found")]
+        )
+
+        response = self.fetch(
+            "/deleteDataset",
+            method="POST",
+            body=json.dumps({"datasetIds": ["d1", "d2"]}),
+        )
+        operation_id = json.loads(response.body)["id"]
+
+        states = []
+        for _ in range(2):
+            got = json.loads(self.fetch("/operation?operationId=" + operation_id).body)
+            states.append((got["done"], [item["state"] for item in got["items"]]))
+        self.assertEqual(
+            [(False, ["running", "error"]), (True, ["done", "error"])], states
+        )
+        self.assertEqual(404, self.fetch("/operation?operationId=unknown").code)
+
+    def testDeleteKeepsTheUpstreamError(self):
+        self.mock_client.delete_dataset = MagicMock(
+            side_effect=ResourceExhausted("quota")
+        )
+        with patch.object(upstream, "GUARD", upstream.UpstreamGuard()) as guard:
+            guard.configure(retries=0)
+            response = self.fetch(
+                "/deleteDataset", method="POST", body=json.dumps({"datasetId": "d1"})
+            )
+        self.assertEqual(503, response.code)
+        self.assertIn("Retry-After", response.headers)
+
+    def testDeleteRejectsInvalidBody(self):
+        for body in ["", "[]", "{}", '{"datasetIds": []}', '{"datasetId": 1}']:
+            response = self.fetch("/deleteDataset", method="POST", body=body)
+            self.assertEqual(400, response.code, body)
+
+    def testRequestsRejectedBeforePrepareAreNotCountedInFlight(self):
+        self._app.settings["xsrf_cookies"] = True
+        in_flight = metrics.REQUESTS_IN_FLIGHT.get("DeleteDataset")
+        errors = metrics.REQUEST_ERRORS.get("DeleteDataset", "403")
+        with patch.object(handlers.app_log, "error") as log_error:
+            response = self.fetch(
+                "/deleteDataset", method="POST", body=json.dumps({"datasetId": "d"})
+            )
+        self.assertEqual(403, response.code)
+        log_error.assert_not_called()
+        self.assertEqual(in_flight, metrics.REQUESTS_IN_FLIGHT.get("DeleteDataset"))
+        self.assertEqual(errors + 1, metrics.REQUEST_ERRORS.get("DeleteDataset", "403"))
+
+    def testMetricsRecordRequestsAndUpstreamCalls(self):
+        self.mock_client.list_models = MagicMock(return_value=[])
+        requests = metrics.REQUEST_SECONDS.get("ListModels", "GET")
+        calls = metrics.UPSTREAM_SECONDS.get("get_models")
+        errors = metrics.REQUEST_ERRORS.get("ListModels", "400")
+        self.fetch("/models")
+        self.fetch("/models?pageSize=none")
+
+        response = self.fetch("/metrics")
+        self.assertEqual(200, response.code)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'automl_request_seconds_count{handler="ListModels",method="GET"}',
+            response.body.decode(),
+        )
+        self.assertEqual(requests + 2, metrics.REQUEST_SECONDS.get("ListModels", "GET"))
+        self.assertEqual(calls + 1, metrics.UPSTREAM_SECONDS.get("get_models"))
+        self.assertEqual(errors + 1, metrics.REQUEST_ERRORS.get("ListModels", "400"))
+        self.assertEqual(0, metrics.REQUESTS_IN_FLIGHT.get("ListModels"))
+
+    def testTracesTableInfoByPhase(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "trace.json")
+        exporter = tracing.TraceExporter(path)
+        self.addCleanup(exporter.close)
+        self._app.settings["automl_trace_exporter"] = exporter
+        self.config.server_timing = True
+        self.config.slow_request_threshold = 1e-6
+        self.mock_client.get_dataset = MagicMock(return_value=Dataset())
+        self.mock_client.list_table_specs = MagicMock(
+            return_value=[TableSpec(name="table{}".format(i)) for i in range(2)]
+        )
+        self.mock_client.list_column_specs = MagicMock(return_value=[])
+
+        with self.assertLogs("tornado.application", "WARNING") as logs:
+            response = self.fetch("/tableInfo?datasetId=d")
+
+        timing = response.headers["Server-Timing"]
+        for phase in (
+            "get_stats_update_time;dur=",
+            "get_table_specs;dur=",
+            "list_table_specs;dur=",
+            'list_column_specs;desc="x2";dur=',
+            "encode_json;dur=",
+            "total;dur=",
+        ):
+            self.assertIn(phase, timing)
+        self.assertIn("Slow request GET /tableInfo took", logs.output[0])
+        self.assertIn("summarize_column_specs", logs.output[0])
+
+        with open(path) as trace_file:
+            events = json.loads(trace_file.read().rstrip(",\n") + "]")
+        self.assertEqual("GET /tableInfo", events[0]["args"]["name"])
+        self.assertEqual(
+            ["table0", "table1"],
+            sorted(
+                e["args"]["table"] for e in events if e["name"] == "list_column_specs"
+            ),
+        )
+
+    def testStreamedResponsesHaveNoServerTiming(self):
+        self.config.server_timing = True
+        self.mock_client.list_models = MagicMock(return_value=[])
+        self.assertIn("Server-Timing", self.fetch("/models").headers)
+        self.assertNotIn("Server-Timing", self.fetch("/models?format=ndjson").headers)
+
+    def testCompressesLargeResponses(self):
+        timestamp = Timestamp(seconds=0, nanos=0)
+        self.mock_client.list_models = MagicMock(
+            return_value=[
+                Model(name="model{}".format(i), update_time=timestamp)
+                for i in range(50)
+            ]
+        )
+        self.config.compression_min_size = 1024
+
+        gzipped = self.fetch(
+            "/models", headers={"Accept-Encoding": "gzip"}, decompress_response=False
+        )
+        self.assertEqual("gzip", gzipped.headers["Content-Encoding"])
+        self.assertEqual(50, len(json.loads(gzip.decompress(gzipped.body))["models"]))
+
+        plain = self.fetch("/models", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertLess(len(gzipped.body), len(plain.body))
+
+        self.config.compression_min_size = len(plain.body) + 1
+        small = self.fetch(
+            "/models", headers={"Accept-Encoding": "gzip"}, decompress_response=False
+        )
+        self.assertNotIn("Content-Encoding", small.headers)
+
+    def testLargeBodiesAreCompressedOnTheExecutor(self):
+        timestamp = Timestamp(seconds=0, nanos=0)
+        self.mock_client.list_models = MagicMock(
+            return_value=[
+                Model(name="model{}".format(i), update_time=timestamp)
+                for i in range(50)
+            ]
+        )
+        threads = []
+
+        def compress(body, content_encoding):
+            threads.append(threading.current_thread())
+            return encoding.compress(body, content_encoding)
+
+        with patch.object(handlers, "compress", compress):
+            for offload_min_size in (2**20, 1024):
+                self.config.offload_min_size = offload_min_size
+                response = self.fetch(
+                    "/models",
+                    headers={"Accept-Encoding": "gzip"},
+                    decompress_response=False,
+                )
+                self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertIs(threading.current_thread(), threads[0])
+        self.assertTrue(threads[1].name.startswith("automl"))
+
+    def testRejectsInvalidPageSize(self):
+        self.assertEqual(400, self.fetch("/datasets?pageSize=none").code)
+
+    def testRejectsInvalidTableInfoPageToken(self):
+        for token in ("table0", "-1:"):
+            response = self.fetch(
+                "/tableInfo?datasetId=d1&pageSize=2&pageToken=" + token
+            )
+            self.assertEqual(400, response.code)
+        self.mock_client.list_table_specs.assert_not_called()
+
+    def testBusyExecutorReturns503(self):
+        with patch.object(
+            self.executor,
+            "submit",
+            side_effect=handlers.ExecutorBusyError("Too many requests"),
+        ):
+            response = self.fetch("/datasets")
+        self.assertEqual(503, response.code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import unittest
+
+from jupyterlab_automl.index import ListingIndex, ListingIndexes, parse_query
+
+DATASETS = [
+    {"id": "d0", "displayName": "Sales", "datasetType": "TBL", "createTime": 300},
+    {"id": "d1", "displayName": "flowers", "datasetType": "ICN", "createTime": 100},
+    {"id": "d2", "displayName": "Wholesale", "datasetType": "TBL", "createTime": 200},
+    {"id": "d3", "displayName": "salmon", "datasetType": "IOD"},
+]
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+class TestParseQuery(unittest.TestCase):
+    def testParsesTermsSortAndQ(self):
+        query = parse_query(
+            "datasetType:TBL|ICN, createTime>=100", "-createTime", "Sal"
+        )
+        self.assertEqual(
+            [("datasetType", ":", ("TBL", "ICN")), ("createTime", ">=", 100.0)],
+            list(query.terms),
+        )
+        self.assertEqual(("createTime", True, "sal"), query[1:])
+        self.assertIsNone(parse_query())
+
+    def testRejectsInvalidQueries(self):
+        for args in [("datasetType",), ("createTime>=yesterday",)]:
+            with self.assertRaises(ValueError):
+                parse_query(*args)
+        for filter, sort in [
+            ("rowCount:1", ""),
+            ("datasetType>1", ""),
+            ("createTime:1", ""),
+            ("", "updateTime"),
+        ]:
+            with self.assertRaises(ValueError):
+                parse_query(filter, sort).validate(["datasets"])
+        parse_query("", "updateTime").validate(["datasets", "models"])
+
+    def testRestrictsToTheFieldsOfAResource(self):
+        query = parse_query("datasetType:TBL,deploymentState:1", "updateTime")
+        restricted = query.restrict("models")
+        self.assertEqual(["deploymentState"], [t.field for t in restricted.terms])
+        self.assertEqual("updateTime", restricted.sort)
+        self.assertIsNone(query.restrict("datasets").sort)
+
+
+class TestListingIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ListingIndex(DATASETS)
+
+    def query(self, filter="", sort="", q=""):
+        return ids(self.index.query(parse_query(filter, sort, q)))
+
+    def testFiltersByValuesAndRanges(self):
+        self.assertEqual(["d0", "d2"], self.query("datasetType:TBL"))
+        self.assertEqual(["d0", "d1", "d2"], self.query("datasetType:TBL|ICN"))
+        self.assertEqual(["d0", "d2"], self.query("createTime>=200"))
+        self.assertEqual(["d0"], self.query("createTime>200"))
+        self.assertEqual(["d1", "d2"], self.query("createTime<300"))
+        self.assertEqual(["d2"], self.query("createTime<=200,datasetType:TBL"))
+        self.assertEqual([], self.query("datasetType:other"))
+
+    def testSortsWithMissingValuesLast(self):
+        self.assertEqual(["d1", "d2", "d0", "d3"], self.query(sort="createTime"))
+        self.assertEqual(["d0", "d2", "d1", "d3"], self.query(sort="-createTime"))
+        self.assertEqual(["d1", "d0", "d3", "d2"], self.query(sort="displayName"))
+
+    def testSearchMatchesTheFieldsThePanelShows(self):
+        self.assertEqual(["d1"], self.query(q="flow"))
+        self.assertEqual(["d3"], self.query(q="iod"))
+        day = 24 * 3600 * 1000
+        index = ListingIndex(
+            [
+                {"id": "d0", "createTime": 10 * day},
+                {"id": "m0", "updateTime": 40 * day},
+            ]
+        )
+        self.assertEqual(["d0"], ids(index.query(parse_query(q="1970-01-11"))))
+        self.assertEqual(["m0"], ids(index.query(parse_query(q="1970-02"))))
+
+    def testSearchRanksPrefixMatchesFirst(self):
+        self.assertEqual(["d0", "d3", "d2"], self.query(q="sal"))
+        self.assertEqual(
+            ["d2", "d0"], self.query("datasetType:TBL", "-displayName", "SAL")
+        )
+
+
+class TestListingIndexes(unittest.TestCase):
+    def testRebuildsWhenASourceChanges(self):
+        indexes = ListingIndexes()
+        first, second = {"datasets": []}, {"datasets": []}
+        built = []
+
+        def build():
+            built.append(1)
+            return DATASETS
+
+        index = indexes.get("datasets", [first, second], build)
+        self.assertIs(index, indexes.get("datasets", [first, second], build))
+        replaced = [first, {"datasets": []}]
+        self.assertIsNot(index, indexes.get("datasets", replaced, build))
+        self.assertIsNot(index, indexes.get("datasets", [first], build))
+        self.assertEqual(3, len(built))
+        self.assertEqual({"hits": 1, "misses": 3, "size": 1}, indexes.stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
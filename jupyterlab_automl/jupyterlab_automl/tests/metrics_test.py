@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import Mock
+
+from jupyterlab_automl import metrics
+from jupyterlab_automl.cache import TTLCache
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def testRendersCountersAndGauges(self):
+        errors = self.registry.counter("errors_total", "Errors.", ("handler",))
+        errors.inc("ListModels")
+        errors.inc("ListModels")
+        self.registry.gauge("in_flight", "In flight.").set(3)
+
+        self.assertEqual(
+            "# HELP errors_total Errors.\n"
+            "# TYPE errors_total counter\n"
+            'errors_total{handler="ListModels"} 2\n'
+            "# HELP in_flight In flight.\n"
+            "# TYPE in_flight gauge\n"
+            "in_flight 3\n",
+            self.registry.render(),
+        )
+
+    def testHistogramBucketsAreCumulative(self):
+        latency = self.registry.histogram(
+            "latency_seconds", "Latency.", ("method",), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.observe(value, "get")
+
+        lines = self.registry.render().splitlines()[2:]
+        self.assertEqual(
+            [
+                'latency_seconds_bucket{method="get",le="0.1"} 2',
+                'latency_seconds_bucket{method="get",le="1"} 3',
+                'latency_seconds_bucket{method="get",le="+Inf"} 4',
+                'latency_seconds_sum{method="get"} 2.65',
+                'latency_seconds_count{method="get"} 4',
+            ],
+            lines,
+        )
+        self.assertEqual(4, latency.get("get"))
+
+    def testRegisteringTwiceReturnsTheSameMetric(self):
+        self.assertIs(
+            self.registry.counter("a_total", "A."),
+            self.registry.counter("a_total", "A."),
+        )
+
+    def testCacheCollectorReportsHitRatio(self):
+        cache = TTLCache(ttl=10, max_size=2)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+        self.registry.set_collector("caches", metrics.cache_collector({"l": cache}))
+
+        text = self.registry.render()
+        self.assertIn('automl_cache_hits_total{cache="l"} 2\n', text)
+        self.assertIn('automl_cache_misses_total{cache="l"} 1\n', text)
+        self.assertIn('automl_cache_hit_ratio{cache="l"} 0.6666666666666666\n', text)
+
+    def testWarmupCollectorReportsPhases(self):
+        warm_up = Mock(timings={"credentials": 0.5, "total": 2.0}, error=None)
+        self.registry.set_collector("warmup", metrics.warmup_collector(warm_up))
+
+        text = self.registry.render()
+        self.assertIn('automl_warmup_seconds{phase="credentials"} 0.5\n', text)
+        self.assertIn('automl_warmup_seconds{phase="total"} 2\n', text)
+        self.assertIn("automl_warmup_failed 0\n", text)
+
+
+class TestTimed(unittest.TestCase):
+    def testRecordsLatencyAndErrors(self):
+        @metrics.timed("test.fail")
+        def fail():
+            raise ValueError("upstream failed")
+
+        calls = metrics.UPSTREAM_SECONDS.get("test.fail")
+        errors = metrics.UPSTREAM_ERRORS.get("test.fail", "ValueError")
+        with self.assertRaises(ValueError):
+            fail()
+
+        self.assertEqual(calls + 1, metrics.UPSTREAM_SECONDS.get("test.fail"))
+        self.assertEqual(
+            errors + 1, metrics.UPSTREAM_ERRORS.get("test.fail", "ValueError")
+        )
+        self.assertEqual(0, metrics.UPSTREAM_IN_FLIGHT.get("test.fail"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import Mock, MagicMock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from jupyterlab_automl.executor import BoundedExecutor
+from jupyterlab_automl.operations import OperationTracker
+
+
+def fake_operation(done_states, error=None):
+    operation = Mock()
+    operation.operation.name = "operations/1"
+    operation.done = MagicMock(side_effect=done_states)
+    operation.exception = MagicMock(return_value=error)
+    return operation
+
+
+class TestOperationTracker(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = BoundedExecutor(max_workers=2, max_queue=8)
+        self.changes = []
+        self.tracker = OperationTracker(
+            self.executor,
+            lambda kind, resource_id: self.changes.append((kind, resource_id)),
+            max_batches=2,
+        )
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super().tearDown()
+
+    @gen_test
+    async def testTracksOperationsUntilDone(self):
+        operations = {
+            "a": fake_operation([False, True]),
+            "b": fake_operation([True], error=ValueError("failed")),
+        }
+        batch = self.tracker.start("models", ["a", "b"], operations.get)
+        self.assertEqual(["starting", "starting"], self._states(batch))
+
+        for task in batch.tasks:
+            await task
+        self.assertEqual(["running", "running"], self._states(batch))
+        self.assertEqual("operations/1", batch.items["a"]["operation"])
+
+        await self.tracker.refresh(batch)
+        self.assertEqual(["running", "error"], self._states(batch))
+        self.assertEqual("failed", batch.items["b"]["error"])
+        await self.tracker.refresh(batch)
+        self.assertEqual(["done", "error"], self._states(batch))
+        self.assertTrue(batch.done)
+        self.assertIn(("models", "a"), self.changes)
+
+    @gen_test
+    async def testEvictsFinishedBatchesFirst(self):
+        def fail(resource_id):
+            raise ValueError("failed")
+
+        finished = self.tracker.start("models", ["a"], fail)
+        for task in finished.tasks:
+            await task
+        running = self.tracker.start("models", ["b"], lambda _: fake_operation([]))
+        newest = self.tracker.start("models", ["c"], lambda _: fake_operation([]))
+        self.assertIsNone(self.tracker.get(finished.id))
+        self.assertIs(running, self.tracker.get(running.id))
+        self.assertIs(newest, self.tracker.get(newest.id))
+
+    def _states(self, batch):
+        return [item["state"] for item in batch.items.values()]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+
+from jupyterlab_automl import encoding, records
+
+
+def make_column_specs(columnar=False):
+    column_specs = records.ColumnSpecs(row_count=10, columnar=columnar)
+    column_specs.append("c0", "Numeric", "Column 0", 4, 2, 1, True)
+    column_specs.append("c1", "String", "Column 1", 9, 0, 0, False)
+    return column_specs
+
+
+class TestRecords(unittest.TestCase):
+    def testChartDataEncodesAsNameAndAmountRecords(self):
+        chart = records.ChartData()
+        chart.append("Jan", 3)
+        chart.append("Feb", 5)
+        self.assertEqual(2, len(chart))
+        self.assertEqual(records.ChartData(["Jan", "Feb"], [3, 5]), chart)
+        self.assertEqual(
+            [
+                {"name": "Jan", "Number of Instances": 3},
+                {"name": "Feb", "Number of Instances": 5},
+            ],
+            chart.to_json(),
+        )
+
+    def testColumnSpecsEncodeInEitherLayout(self):
+        self.assertEqual(
+            {
+                "id": "c0",
+                "dataType": "Numeric",
+                "displayName": "Column 0",
+                "distinctValueCount": 4,
+                "invalidValueCount": 2,
+                "nullValueCount": "1 (10%)",
+                "nullable": True,
+            },
+            make_column_specs().to_json()[0],
+        )
+        self.assertEqual(
+            {
+                "id": ["c0", "c1"],
+                "dataType": ["Numeric", "String"],
+                "displayName": ["Column 0", "Column 1"],
+                "distinctValueCount": [4, 9],
+                "invalidValueCount": [2, 0],
+                "nullValueCount": [1, 0],
+                "nullable": [True, False],
+            },
+            make_column_specs(columnar=True).to_json(),
+        )
+
+    def testEncodersConvertRecordsAtTheBoundary(self):
+        table = records.TableSpecRecord(
+            "t",
+            10,
+            9,
+            2,
+            make_column_specs(),
+            records.ChartData(["Numeric", "String"], [1, 1]),
+        )
+        payload = {"tableSpecs": [table]}
+        plain = records.to_json(payload)
+        self.assertIsInstance(plain["tableSpecs"][0]["columnSpecs"][0], dict)
+
+        encoders = [encoding.encode_stdlib]
+        if encoding.orjson is not None:
+            encoders.append(encoding.encode_orjson)
+        for encode in encoders:
+            self.assertEqual(plain, json.loads(encode(payload)))
+            with self.assertRaises(TypeError):
+                encode({"value": object()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from jupyterlab_automl.store import TableSpecStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class TestTableSpecStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "specs.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def makeStore(self, max_bytes=1 << 20):
+        store = TableSpecStore(self.path, max_bytes, clock=FakeClock())
+        self.addCleanup(store.close)
+        return store
+
+    def testRoundTripSurvivesReopening(self):
+        store = self.makeStore()
+        self.assertIsNone(store.get("d", 1, "rows"))
+        store.set("d", 1, "rows", b'{"tableSpecs":[]}')
+        self.assertEqual(b'{"tableSpecs":[]}', store.get("d", 1, "rows"))
+        self.assertIsNone(store.get("d", 1, "columnar"))
+        store.close()
+
+        reopened = self.makeStore()
+        self.assertEqual(b'{"tableSpecs":[]}', reopened.get("d", 1, "rows"))
+        self.assertEqual(1, reopened.stats()["size"])
+
+    def testNewerStatsReplaceOlderOnes(self):
+        store = self.makeStore()
+        store.set("d", 1, "rows", b"old")
+        store.set("other", 1, "rows", b"other")
+        store.set("d", 2, "rows", b"new")
+
+        self.assertIsNone(store.get("d", 1, "rows"))
+        self.assertEqual(b"new", store.get("d", 2, "rows"))
+        self.assertEqual(b"other", store.get("other", 1, "rows"))
+        self.assertEqual(
+            {"hits": 2, "misses": 1, "size": 2},
+            {k: v for k, v in store.stats().items() if k != "bytes"},
+        )
+
+    def testLatestServesTheNewestStats(self):
+        store = self.makeStore()
+        self.assertIsNone(store.get_latest("d", "rows"))
+        store.set("d", 1, "rows", b"old")
+        store.set("d", 1, "columnar", b"columnar")
+        self.assertEqual(b"old", store.get_latest("d", "rows"))
+        store.set("d", 2, "rows", b"new")
+        self.assertEqual(b"new", store.get_latest("d", "rows"))
+
+    def testEvictsLeastRecentlyReadPastMaxBytes(self):
+        body = os.urandom(400)
+        store = self.makeStore(max_bytes=1000)
+        store.set("a", 1, "rows", body)
+        store.set("b", 1, "rows", body)
+        store.get("a", 1, "rows")
+        store.set("c", 1, "rows", body)
+
+        self.assertEqual(body, store.get("a", 1, "rows"))
+        self.assertIsNone(store.get("b", 1, "rows"))
+        self.assertEqual(body, store.get("c", 1, "rows"))
+        self.assertLessEqual(store.stats()["bytes"], 1000)
+
+    def testUnusableFileIsAMiss(self):
+        os.makedirs(self.path)
+        store = self.makeStore()
+        store.set("d", 1, "rows", b"body")
+        self.assertIsNone(store.get("d", 1, "rows"))
+        self.assertEqual(0, store.stats()["size"])
+
+
+if __name__ == "__main__":
+    unittest.main()
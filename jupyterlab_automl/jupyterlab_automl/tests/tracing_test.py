@@ -0,0 +1,124 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from jupyterlab_automl import tracing
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_traced(trace, fn):
+    """Runs fn with trace current, without leaking it into other tests."""
+
+    def run():
+        tracing.activate(trace)
+        return fn()
+
+    return contextvars.copy_context().run(run)
+
+
+class TestTrace(unittest.TestCase):
+    def testSumsPhasesInTheOrderTheyStarted(self):
+        clock = FakeClock()
+        trace = tracing.Trace("GET /tableInfo", clock)
+        trace.add("list_column_specs", 0.2, 0.5)
+        trace.add("list_table_specs", 0.0, 0.1)
+        trace.add("list_column_specs", 0.5, 0.6)
+        clock.now = 1.0
+
+        self.assertEqual(
+            ["list_table_specs", "list_column_specs"], list(trace.phases())
+        )
+        self.assertEqual(2, trace.phases()["list_column_specs"][1])
+        self.assertEqual(
+            'list_table_specs;dur=100.0, list_column_specs;desc="x2";dur=400.0, '
+            "total;dur=1000.0",
+            trace.server_timing(),
+        )
+        self.assertEqual(
+            "list_table_specs 0.100s, list_column_specs 0.400s (x2)", trace.summary()
+        )
+
+    def testKeepsAtMostMaxSpans(self):
+        trace = tracing.Trace("GET /datasets")
+        for i in range(tracing.MAX_SPANS + 3):
+            trace.add("page", i, i + 1)
+        self.assertEqual(tracing.MAX_SPANS, len(trace.spans))
+        self.assertEqual(3, trace.dropped)
+
+
+class TestSpans(unittest.TestCase):
+    def testSpansAreNoOpsWithoutATrace(self):
+        with tracing.span("encode_json"):
+            pass
+        self.assertIsNone(tracing.current())
+        self.assertEqual([[1], [2]], list(tracing.traced_pages("page", [[1], [2]])))
+
+    def testBoundFunctionsRecordOnOtherThreads(self):
+        trace = tracing.Trace("GET /tableInfo")
+
+        def fetch(table):
+            with tracing.span("list_column_specs", table=table):
+                return threading.get_ident()
+
+        def serve():
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                return list(pool.map(tracing.bind(fetch), ["t0", "t1", "t2"]))
+
+        threads = run_traced(trace, serve)
+        self.assertEqual(
+            ["t0", "t1", "t2"], sorted(span.args["table"] for span in trace.spans)
+        )
+        self.assertEqual(set(threads), {span.thread for span in trace.spans})
+        self.assertIsNone(tracing.current())
+
+    def testTracedPagesRecordEachPage(self):
+        trace = tracing.Trace("GET /tableInfo")
+        pages = run_traced(
+            trace, lambda: list(tracing.traced_pages("page", iter([[1], [], [2]])))
+        )
+        self.assertEqual([[1], [], [2]], pages)
+        self.assertEqual(["page"] * 3, [span.name for span in trace.spans])
+
+
+class TestTraceExporter(unittest.TestCase):
+    def testAppendsChromeTraceEvents(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "traces", "automl.json")
+        exporter = tracing.TraceExporter(path)
+        for name in ("GET /datasets", "GET /models"):
+            trace = tracing.Trace(name)
+            trace.add("get_listing", trace.start, trace.start + 0.5, {"n": 1})
+            trace.finish()
+            exporter.export(trace)
+        exporter.close()
+
+        with open(path) as trace_file:
+            text = trace_file.read()
+        self.assertTrue(text.startswith("[\n"))
+        events = json.loads(text.rstrip(",\n") + "]")
+        self.assertEqual(6, len(events))
+        self.assertEqual(
+            ["GET /datasets", "GET /models"],
+            [e["args"]["name"] for e in events if e["ph"] == "M"],
+        )
+        span = events[2]
+        self.assertEqual(("get_listing", "X"), (span["name"], span["ph"]))
+        self.assertAlmostEqual(500000, span["dur"])
+        self.assertEqual({"n": 1}, span["args"])
+        self.assertEqual(2, exporter.exported)
+
+
+if __name__ == "__main__":
+    unittest.main()
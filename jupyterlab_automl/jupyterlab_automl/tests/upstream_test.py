@@ -0,0 +1,129 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from google.api_core.exceptions import NotFound, ResourceExhausted, ServiceUnavailable
+
+from jupyterlab_automl import upstream
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def testIncreasesAdditivelyAndDecreasesMultiplicatively(self):
+        limiter = upstream.AdaptiveLimiter(initial_limit=4, max_limit=5)
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release()
+        self.assertAlmostEqual(5, limiter.limit, delta=0.1)
+
+        limiter.acquire()
+        limiter.release(overloaded=True)
+        self.assertAlmostEqual(2.5, limiter.limit, delta=0.1)
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(overloaded=True)
+        self.assertEqual(1, limiter.limit)
+
+    def testWaitsForASlot(self):
+        limiter = upstream.AdaptiveLimiter(initial_limit=1, timeout=0.05)
+        limiter.acquire()
+        with self.assertRaises(upstream.UpstreamUnavailableError):
+            limiter.acquire()
+
+        threading.Timer(0.01, limiter.release).start()
+        limiter.timeout = 5
+        limiter.acquire()
+        self.assertEqual(1, limiter.in_flight)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def testOpensAfterConsecutiveFailuresAndTriesAgain(self):
+        clock = FakeClock()
+        breaker = upstream.CircuitBreaker(2, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(upstream.UpstreamUnavailableError) as raised:
+            breaker.before_call()
+        self.assertEqual(30, raised.exception.retry_after)
+
+        clock.now = 30
+        breaker.before_call()
+        self.assertEqual(upstream.HALF_OPEN, breaker.state)
+        with self.assertRaises(upstream.UpstreamUnavailableError):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(upstream.OPEN, breaker.state)
+
+        clock.now = 60
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(upstream.CLOSED, breaker.state)
+
+
+class TestUpstreamGuard(unittest.TestCase):
+    def setUp(self):
+        self.guard = upstream.UpstreamGuard()
+        self.guard.configure(retries=2, base_delay=0, failure_threshold=2)
+
+    def testRetriesRetryableCodes(self):
+        fn = MagicMock(side_effect=[ResourceExhausted("quota"), "listing"])
+        self.assertEqual("listing", self.guard.call("get_datasets", fn, "parent"))
+        self.assertEqual(2, fn.call_count)
+        fn.assert_called_with("parent")
+
+        fn = MagicMock(side_effect=NotFound("gone"))
+        with self.assertRaises(NotFound):
+            self.guard.call("get_datasets", fn)
+        self.assertEqual(1, fn.call_count)
+        self.assertEqual(upstream.CLOSED, self.guard.breaker.state)
+
+    def testOpensTheBreakerOnceRetriesRunOut(self):
+        fn = MagicMock(side_effect=ServiceUnavailable("down"))
+        for _ in range(2):
+            with self.assertRaises(ServiceUnavailable):
+                self.guard.call("get_models", fn)
+        self.assertEqual(6, fn.call_count)
+        self.assertEqual("open", self.guard.stats()["breaker"])
+
+        with self.assertRaises(upstream.UpstreamUnavailableError):
+            self.guard.call("get_models", fn)
+        self.assertEqual(6, fn.call_count)
+
+    def testTrialTimingOutInTheLimiterReopensTheBreaker(self):
+        clock = FakeClock()
+        self.guard.breaker = upstream.CircuitBreaker(1, reset_timeout=30, clock=clock)
+        self.guard.limiter = upstream.AdaptiveLimiter(initial_limit=1, timeout=0.01)
+        self.guard.breaker.record_failure()
+        clock.now = 30
+
+        self.guard.limiter.acquire()
+        fn = MagicMock(return_value="listing")
+        with self.assertRaises(upstream.UpstreamUnavailableError):
+            self.guard.call("get_table_specs", fn)
+        self.assertEqual(upstream.OPEN, self.guard.breaker.state)
+        fn.assert_not_called()
+
+        self.guard.limiter.release()
+        self.assertEqual("listing", self.guard.call("get_table_specs", fn))
+        self.assertEqual(upstream.CLOSED, self.guard.breaker.state)
+
+    def testBackoffIsJitteredAndCapped(self):
+        self.guard.configure(base_delay=1, max_delay=3)
+        delays = [self.guard.backoff(attempt) for attempt in range(8)]
+        self.assertTrue(all(0 <= delay <= 3 for delay in delays))
+        self.assertTrue(upstream.is_unavailable(ResourceExhausted("quota")))
+        self.assertFalse(upstream.is_unavailable(ValueError("bad")))
+
+
+if __name__ == "__main__":
+    unittest.main()
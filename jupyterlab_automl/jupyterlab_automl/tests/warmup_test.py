@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import Mock, MagicMock, patch
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from jupyterlab_automl import warmup
+from jupyterlab_automl.cache import TTLCache
+from jupyterlab_automl.clients import ClientRegistry
+from jupyterlab_automl.config import AutoMLConfig
+from jupyterlab_automl.executor import BoundedExecutor
+
+
+class TestWarmUp(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mock_client = Mock()
+        self.mock_client.list_datasets = MagicMock(return_value=[])
+        self.mock_client.list_models = MagicMock(return_value=[])
+        self.executor = BoundedExecutor(max_workers=2, max_queue=8)
+        self.settings = {
+            "automl_config": AutoMLConfig(locations=["us-central1", "eu"]),
+            "automl_executor": self.executor,
+            "automl_clients": ClientRegistry(
+                lambda: self.mock_client, lambda client, location: location
+            ),
+            "automl_listings": TTLCache(ttl=60, max_size=8),
+        }
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super().tearDown()
+
+    @gen_test
+    async def testFillsListingCache(self):
+        warm_up = warmup.WarmUp(self.settings)
+        with patch.object(warmup.AuthProvider, "get") as get_auth:
+            await warm_up.run()
+        get_auth.assert_called_once()
+
+        listings = self.settings["automl_listings"]
+        for location in ["us-central1", "eu"]:
+            self.assertEqual({"datasets": []}, listings.get(("datasets", location)))
+            self.assertEqual({"models": []}, listings.get(("models", location)))
+        self.assertTrue(warm_up.done)
+        self.assertIsNone(warm_up.error)
+        self.assertEqual(
+            {"credentials", "client", "listings", "total"}, set(warm_up.timings)
+        )
+
+    @gen_test
+    async def testRecordsFailure(self):
+        warm_up = warmup.WarmUp(self.settings)
+        with patch.object(
+            warmup.AuthProvider, "get", side_effect=ValueError("no credentials")
+        ):
+            await warm_up.run()
+        self.assertTrue(warm_up.done)
+        self.assertEqual("no credentials", warm_up.error)
+        self.assertEqual({"credentials", "total"}, set(warm_up.timings))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from jupyterlab_automl import watcher
+from jupyterlab_automl.cache import TTLCache
+from jupyterlab_automl.clients import ClientRegistry
+from jupyterlab_automl.config import AutoMLConfig
+from jupyterlab_automl.executor import BoundedExecutor
+
+from google.cloud.automl_v1beta1.types import Dataset, Model, Timestamp
+
+
+def make_model(name, seconds):
+    return Model(name=name, update_time=Timestamp(seconds=seconds))
+
+
+class TestDiffRecords(unittest.TestCase):
+    def testReportsAddedChangedAndRemoved(self):
+        previous = {
+            "kept": {"id": "kept", "updateTime": 1},
+            "updated": {"id": "updated", "updateTime": 1},
+            "gone": {"id": "gone", "updateTime": 1},
+        }
+        current = {
+            "kept": {"id": "kept", "updateTime": 1},
+            "updated": {"id": "updated", "updateTime": 2},
+            "new": {"id": "new", "updateTime": 1},
+        }
+        self.assertEqual(
+            {
+                "added": [{"id": "new", "updateTime": 1}],
+                "changed": [{"id": "updated", "updateTime": 2}],
+                "removed": ["gone"],
+            },
+            watcher.diff_records(previous, current),
+        )
+
+    def testComparesRecordsWithoutUpdateTimeInFull(self):
+        previous = {"id": "d", "createTime": 1, "exampleCount": 10}
+        self.assertFalse(watcher.is_changed(previous, dict(previous)))
+        self.assertTrue(watcher.is_changed(previous, dict(previous, exampleCount=11)))
+        self.assertTrue(watcher.is_changed(previous, dict(previous, createTime=2)))
+
+        model = {"id": "m", "updateTime": 1, "deploymentState": 1}
+        self.assertFalse(watcher.is_changed(model, dict(model, deploymentState=2)))
+
+
+class TestResourceWatcher(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = BoundedExecutor(max_workers=2, max_queue=8)
+        self.client = Mock()
+        self.client.list_datasets = MagicMock(return_value=[])
+        self.client.list_models = MagicMock(return_value=[make_model("m0", 1)])
+        self.settings = {
+            "automl_config": AutoMLConfig(),
+            "automl_executor": self.executor,
+            "automl_clients": ClientRegistry(
+                lambda: self.client,
+                lambda client, location: "projects/p/locations/" + location,
+            ),
+            "automl_listings": TTLCache(ttl=0, max_size=8),
+        }
+        self.watcher = watcher.ResourceWatcher(
+            self.settings, min_interval=10, max_interval=40
+        )
+        self.events = []
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.executor.shutdown()
+        super().tearDown()
+
+    def subscribe(self):
+        self.watcher.subscribe(lambda *event: self.events.append(event))
+
+    @gen_test
+    async def testPublishesSnapshotThenOnlyChanges(self):
+        self.subscribe()
+        await self.watcher.run()
+        self.assertEqual(
+            [("snapshot", {"datasets": [], "models": [self.record("m0", 1)]})],
+            self.events,
+        )
+
+        self.client.list_models.return_value = [
+            make_model("m0", 2),
+            make_model("m1", 1),
+        ]
+        await self.watcher.run()
+        self.assertEqual(
+            (
+                "changes",
+                {
+                    "models": {
+                        "added": [self.record("m1", 1)],
+                        "changed": [self.record("m0", 2)],
+                        "removed": [],
+                    }
+                },
+            ),
+            self.events[-1],
+        )
+
+        await self.watcher.run()
+        self.assertEqual(2, len(self.events))
+
+    @gen_test
+    async def testFailedLocationKeepsItsRecords(self):
+        self.subscribe()
+        await self.watcher.run()
+        self.client.list_models.side_effect = RuntimeError("unavailable")
+        self.client.list_datasets.return_value = [Dataset(name="p/ICN1")]
+
+        await self.watcher.run()
+        self.assertEqual({"datasets"}, set(self.events[-1][1]))
+        self.assertEqual([self.record("m0", 1)], self.watcher.snapshot()["models"])
+
+    @gen_test
+    async def testIntervalBacksOffUntilSomethingChanges(self):
+        self.subscribe()
+        intervals = []
+        for _ in range(4):
+            await self.watcher.run()
+            intervals.append(self.watcher.interval)
+        self.assertEqual([10, 20, 40, 40], intervals)
+
+        self.client.list_models.return_value = [make_model("m0", 2)]
+        await self.watcher.run()
+        self.assertEqual(10, self.watcher.interval)
+
+    @gen_test
+    async def testLateSubscriberGetsTheSnapshot(self):
+        self.subscribe()
+        await self.watcher.run()
+        late = []
+        self.watcher.subscribe(lambda *event: late.append(event))
+        self.assertEqual(["snapshot"], [event for event, _ in late])
+
+        self.watcher.stop()
+        self.assertEqual(0, self.watcher.subscribers)
+
+    def record(self, name, seconds):
+        return {
+            "id": name,
+            "displayName": "",
+            "datasetId": "",
+            "updateTime": seconds * 1000,
+            "deploymentState": 0,
+            "metadata": "",
+            "location": "us-central1",
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
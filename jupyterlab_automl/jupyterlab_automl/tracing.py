@@ -0,0 +1,243 @@
+# Lint as: python3
+"""Per-request spans, their Server-Timing summary and trace export."""
+
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+from notebook.base.handlers import app_log
+
+_CURRENT = contextvars.ContextVar("automl_trace", default=None)
+_IDS = itertools.count(1)
+
+# Spans kept per trace, so a request listing thousands of pages stays small
+MAX_SPANS = 1000
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "thread", "args")
+
+    def __init__(self, name, start, end, thread, args):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.thread = thread
+        self.args = args
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class Trace:
+    """The spans recorded while serving one request.
+
+    Spans may be added from any thread. Times are time.perf_counter()
+    seconds. Spans can nest and run concurrently, so the durations of the
+    phases of a trace may add up to more than its own.
+    """
+
+    def __init__(self, name, clock=time.perf_counter):
+        self.id = next(_IDS)
+        self.name = name
+        self.start = clock()
+        self.end = None
+        self.spans = []
+        self.dropped = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, args=None):
+        span = Span(name, start, end, threading.get_ident(), args)
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return
+            self.spans.append(span)
+
+    def finish(self):
+        if self.end is None:
+            self.end = self._clock()
+        return self.end - self.start
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else self._clock()) - self.start
+
+    def phases(self):
+        """Returns {name: (seconds, count)} in the order phases started."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        phases = OrderedDict()
+        for span in spans:
+            seconds, count = phases.get(span.name, (0.0, 0))
+            phases[span.name] = (seconds + span.duration, count + 1)
+        return phases
+
+    def server_timing(self):
+        """Returns the phases as a Server-Timing header value."""
+        metrics = [
+            '{};desc="x{}";dur={:.1f}'.format(name, count, seconds * 1000)
+            if count > 1
+            else "{};dur={:.1f}".format(name, seconds * 1000)
+            for name, (seconds, count) in self.phases().items()
+        ]
+        metrics.append("total;dur={:.1f}".format(self.duration * 1000))
+        return ", ".join(metrics)
+
+    def summary(self):
+        """Returns the phases as text for the slow-request log."""
+        phases = [
+            "{} {:.3f}s".format(name, seconds)
+            + (" (x{})".format(count) if count > 1 else "")
+            for name, (seconds, count) in self.phases().items()
+        ]
+        return ", ".join(phases) or "no spans"
+
+    def to_events(self):
+        """Returns the trace as Chrome trace events.
+
+        Each trace is shown as a process named after it, with one row per
+        thread its spans ran on.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.id,
+                "args": {"name": self.name},
+            },
+            {
+                "name": self.name,
+                "cat": "request",
+                "ph": "X",
+                "ts": self.start * 1e6,
+                "dur": self.duration * 1e6,
+                "pid": self.id,
+                "tid": 0,
+            },
+        ]
+        for span in spans:
+            event = {
+                "name": span.name,
+                "cat": "automl",
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": self.id,
+                "tid": span.thread,
+            }
+            if span.args:
+                event["args"] = span.args
+            events.append(event)
+        return events
+
+
+def current():
+    """Returns the trace of the request being served, or None."""
+    return _CURRENT.get()
+
+
+def activate(trace):
+    """Makes trace the current trace of this context."""
+    _CURRENT.set(trace)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Records the enclosed code as a span of the current trace, if any."""
+    trace = _CURRENT.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter(), args)
+
+
+def traced_pages(name, pages, **args):
+    """Yields from pages, recording the wait for each page as a span."""
+    trace = _CURRENT.get()
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        if page is None:
+            return
+        if trace is not None:
+            trace.add(name, start, time.perf_counter(), args)
+        yield page
+
+
+def bind(fn):
+    """Returns fn running with the current trace, for use on other threads.
+
+    Executor threads do not inherit the context of the code submitting
+    work to them.
+    """
+    trace = _CURRENT.get()
+    if trace is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _CURRENT.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _CURRENT.reset(token)
+
+    return wrapper
+
+
+class TraceExporter:
+    """Appends traces to a file in the Chrome trace event format.
+
+    The file is a JSON array with one event per line, left unclosed as the
+    format allows, so it can be opened in chrome://tracing or Perfetto
+    while the server runs. Write errors are logged and the trace dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.exported = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a")
+            if self._file.tell() == 0:
+                self._file.write("[\n")
+        return self._file
+
+    def export(self, trace):
+        lines = "".join(json.dumps(event) + ",\n" for event in trace.to_events())
+        with self._lock:
+            try:
+                trace_file = self._open()
+                trace_file.write(lines)
+                trace_file.flush()
+                self.exported += 1
+            except OSError:
+                app_log.exception("Unable to export the trace of %s", trace.name)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
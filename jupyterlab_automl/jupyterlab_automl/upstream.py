@@ -0,0 +1,238 @@
+# Lint as: python3
+"""Concurrency limiting, retries and circuit breaking for AutoML API calls."""
+
+import functools
+import random
+import threading
+import time
+
+from notebook.base.handlers import app_log
+
+from jupyterlab_automl import metrics
+
+# gRPC status codes that mean AutoML is overloaded or briefly unreachable
+RETRYABLE_CODES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling AutoML while it is known to be overloaded.
+
+    retry_after is the number of seconds after which a call may succeed.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def status_code(e):
+    """Returns the name of the gRPC status code of an AutoML error, or None.
+
+    Handles both google.api_core errors and raw grpc.RpcErrors without
+    importing either.
+    """
+    code = getattr(e, "grpc_status_code", None)
+    if code is None and callable(getattr(e, "code", None)):
+        try:
+            code = e.code()
+        except Exception:
+            code = None
+    return getattr(code, "name", None)
+
+
+def is_retryable(e):
+    return status_code(e) in RETRYABLE_CODES
+
+
+def is_unavailable(e):
+    """Returns whether e means AutoML could not serve the call right now."""
+    return isinstance(e, UpstreamUnavailableError) or is_retryable(e)
+
+
+class AdaptiveLimiter:
+    """Limits concurrent calls, adapting the limit AIMD-style.
+
+    Each successful call raises the limit by 1/limit, so by about one per
+    round of calls, up to max_limit. Each overloaded call halves it, down to
+    min_limit. Callers over the limit wait up to timeout seconds for a slot.
+    """
+
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=32, timeout=30.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self.timeout = timeout
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self.in_flight < int(self.limit), self.timeout
+            ):
+                raise UpstreamUnavailableError(
+                    "Too many AutoML calls waiting for the concurrency limit",
+                    self.timeout,
+                )
+            self.in_flight += 1
+
+    def release(self, overloaded=False):
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Stops calls after failure_threshold consecutive failures in a row.
+
+    While open, calls fail at once. After reset_timeout seconds one trial
+    call is let through: its success closes the breaker and its failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises UpstreamUnavailableError unless a call may go ahead.
+
+        Returns whether the call is the trial call of a half-open breaker.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            remaining = self._opened + self.reset_timeout - self._clock()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                return True
+            # A trial call is in flight when half open
+            retry_after = max(remaining, 1)
+            raise UpstreamUnavailableError(
+                "AutoML is unavailable, retry in {:.0f}s".format(retry_after),
+                retry_after,
+            )
+
+    def abandon_trial(self):
+        """Reopens the breaker when the trial call ends without reaching
+        AutoML, so that the next call becomes the trial."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    app_log.warning("Pausing AutoML calls for %ss", self.reset_timeout)
+                self.state = OPEN
+                self._opened = self._clock()
+
+
+class UpstreamGuard:
+    """Runs AutoML calls through a shared limiter, retries and breaker.
+
+    Calls failing with a retryable code are retried up to retries times
+    with jittered exponential backoff: each wait is uniform between 0 and
+    base_delay * 2 ** attempt, capped at max_delay. Only calls that still
+    fail count towards opening the breaker. Other errors are raised as is.
+    """
+
+    def __init__(self):
+        self.configure()
+
+    def configure(
+        self,
+        max_concurrency=16,
+        retries=3,
+        base_delay=0.25,
+        max_delay=5.0,
+        failure_threshold=5,
+        reset_timeout=30.0,
+    ):
+        self.limiter = AdaptiveLimiter(max_concurrency, max_limit=max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        ceiling = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def call(self, method, fn, *args, **kwargs):
+        trial = self.breaker.before_call()
+        attempt = 0
+        while True:
+            try:
+                self.limiter.acquire()
+            except UpstreamUnavailableError:
+                # Without an outcome the breaker would stay half open
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            overloaded = False
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                overloaded = True
+                metrics.UPSTREAM_OVERLOADED.inc(method, status_code(e))
+                if attempt >= self.retries:
+                    self.breaker.record_failure()
+                    raise
+            finally:
+                self.limiter.release(overloaded)
+            if not overloaded:
+                self.breaker.record_success()
+                return result
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def stats(self):
+        return {
+            "limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "breaker": self.breaker.state,
+        }
+
+
+GUARD = UpstreamGuard()
+
+
+def guarded(method):
+    """Decorates a top-level AutoML call to run through GUARD.
+
+    Calls made from within a guarded call must not be guarded themselves,
+    or they could wait for a slot their caller holds.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return GUARD.call(method, fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
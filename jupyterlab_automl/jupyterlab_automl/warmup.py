@@ -0,0 +1,71 @@
+# Lint as: python3
+"""Background warm-up run when the server extension loads."""
+
+import asyncio
+import time
+
+from notebook.base.handlers import app_log
+from tornado.ioloop import IOLoop
+
+from jupyterlab_automl.handlers import AuthProvider, get_datasets, get_models
+
+LISTINGS = (("datasets", get_datasets), ("models", get_models))
+
+
+class WarmUp:
+    """Resolves credentials, creates a client and fills the listing cache.
+
+    Runs on the extension executor so the first panel open does not pay for
+    them. timings holds the seconds each phase took, plus the total.
+    """
+
+    def __init__(self, settings):
+        self._settings = settings
+        self.timings = {}
+        self.error = None
+        self.done = False
+
+    def start(self):
+        """Schedules the warm-up to run once the IOLoop starts."""
+        IOLoop.current().add_callback(self.run)
+
+    def _run_blocking(self, fn, *args):
+        return IOLoop.current().run_in_executor(
+            self._settings["automl_executor"], fn, *args
+        )
+
+    def _fill_listing(self, resource, fetch, location):
+        clients = self._settings["automl_clients"]
+        listings = self._settings["automl_listings"]
+        parent = clients.get_parent(location)
+        epoch = listings.epoch
+        listings.set((resource, location), fetch(clients.get_client(), parent), epoch)
+
+    async def _timed(self, phase, awaitable):
+        start = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.timings[phase] = time.monotonic() - start
+
+    async def run(self):
+        start = time.monotonic()
+        clients = self._settings["automl_clients"]
+        locations = self._settings["automl_config"].locations
+        try:
+            await self._timed("credentials", self._run_blocking(AuthProvider.get))
+            await self._timed("client", self._run_blocking(clients.get_client))
+            fills = [
+                self._run_blocking(self._fill_listing, resource, fetch, location)
+                for location in locations
+                for resource, fetch in LISTINGS
+            ]
+            await self._timed("listings", asyncio.gather(*fills))
+        except Exception as e:
+            self.error = str(e)
+            app_log.warning("AutoML warm-up failed: %s", e)
+        finally:
+            self.timings["total"] = time.monotonic() - start
+            self.done = True
+        if not self.error:
+            app_log.info("AutoML warm-up finished in %.2fs", self.timings["total"])
@@ -0,0 +1,217 @@
+# Lint as: python3
+"""Polling of the project's datasets and models for the change feed."""
+
+import asyncio
+
+from notebook.base.handlers import app_log
+from tornado.ioloop import IOLoop
+
+from jupyterlab_automl.handlers import get_datasets, get_models, tag_location
+
+LISTINGS = (("datasets", get_datasets), ("models", get_models))
+
+
+def is_changed(previous, record):
+    """Returns whether record is a new version of previous.
+
+    Records are versioned by createTime and updateTime. Datasets have no
+    updateTime and change in place, so they are compared in full.
+    """
+    if previous.get("createTime") != record.get("createTime"):
+        return True
+    if "updateTime" in record:
+        return previous.get("updateTime") != record["updateTime"]
+    return previous != record
+
+
+def diff_records(previous, current):
+    """Returns what changed between two {id: record} snapshots.
+
+    The result has the added and changed records, and the removed ids.
+    """
+    return {
+        "added": [r for id, r in current.items() if id not in previous],
+        "changed": [
+            r
+            for id, r in current.items()
+            if id in previous and is_changed(previous[id], r)
+        ],
+        "removed": [id for id in previous if id not in current],
+    }
+
+
+class ResourceWatcher:
+    """Polls the datasets and models of the project and pushes what changed.
+
+    One watcher serves every subscriber, so any number of open panels cost
+    one poll. It only polls while someone is subscribed. The interval starts
+    at min_interval, doubles after each poll that finds nothing new, up to
+    max_interval, and drops back once something changes. A listing still in
+    the listing cache is used instead of calling AutoML, and polled listings
+    refill it.
+
+    Subscribers are called with ("snapshot", {kind: [records]}) once, and
+    then with ("changes", {kind: diff}) for the kinds that changed, where
+    diff is the result of diff_records. A location that fails to list keeps
+    its previous records, so its resources are not reported as removed.
+    All state is changed on the IOLoop thread.
+    """
+
+    def __init__(self, settings, min_interval=10.0, max_interval=300.0):
+        self._settings = settings
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.polls = 0
+        self._subscribers = []
+        self._records = None
+        self._io_loop = None
+        self._timeout = None
+        self._polling = False
+        self._wake_pending = False
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def snapshot(self):
+        """Returns the last polled records by kind, or None before a poll."""
+        if self._records is None:
+            return None
+        return {kind: list(records.values()) for kind, records in self._records.items()}
+
+    def subscribe(self, callback):
+        """Starts calling callback(event, payload) and polls if idle."""
+        self._subscribers.append(callback)
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            callback("snapshot", snapshot)
+        if len(self._subscribers) == 1:
+            self.wake()
+
+    def unsubscribe(self, callback):
+        """Stops calling callback. Polling stops with the last subscriber."""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+        if not self._subscribers:
+            self._cancel()
+
+    def wake(self):
+        """Polls as soon as possible, for example after a deletion."""
+        if not self._subscribers:
+            return
+        self.interval = self.min_interval
+        if self._polling:
+            self._wake_pending = True
+            return
+        self._cancel()
+        self._io_loop = IOLoop.current()
+        self._io_loop.add_callback(self.run)
+
+    def stop(self):
+        self._subscribers = []
+        self._cancel()
+
+    def _cancel(self):
+        if self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+            self._timeout = None
+
+    def _publish(self, event, payload):
+        for callback in list(self._subscribers):
+            try:
+                callback(event, payload)
+            except Exception:
+                app_log.exception("Unable to publish AutoML %s", event)
+
+    def _run_blocking(self, fn, *args):
+        return IOLoop.current().run_in_executor(
+            self._settings["automl_executor"], fn, *args
+        )
+
+    def _list(self, resource, fetch, location):
+        clients = self._settings["automl_clients"]
+        listings = self._settings["automl_listings"]
+        parent = clients.get_parent(location)
+        key = (resource, location)
+        listing = listings.get(key)
+        if listing is None:
+            epoch = listings.epoch
+            listing = fetch(clients.get_client(), parent)
+            listings.set(key, listing, epoch)
+        return tag_location(listing[resource], location)
+
+    async def poll(self):
+        """Lists every kind in every location and publishes the differences.
+
+        Returns whether anything changed.
+        """
+        locations = self._settings["automl_config"].locations
+        pending = [
+            (resource, fetch, location)
+            for resource, fetch in LISTINGS
+            for location in locations
+        ]
+        results = await asyncio.gather(
+            *[self._run_blocking(self._list, *args) for args in pending],
+            return_exceptions=True,
+        )
+        self.polls += 1
+        if self._records is None and all(isinstance(r, Exception) for r in results):
+            for result in results:
+                app_log.warning("Unable to poll AutoML resources: %s", result)
+            return False
+        previous = self._records
+        records = {resource: {} for resource, _ in LISTINGS}
+        for (resource, _, location), result in zip(pending, results):
+            if isinstance(result, Exception):
+                app_log.warning(
+                    "Unable to poll %s in %s: %s", resource, location, result
+                )
+                if previous is not None:
+                    records[resource].update(
+                        (id, record)
+                        for id, record in previous[resource].items()
+                        if record.get("location") == location
+                    )
+                continue
+            records[resource].update((record["id"], record) for record in result)
+        self._records = records
+
+        if previous is None:
+            self._publish("snapshot", self.snapshot())
+            return True
+        changes = {}
+        for resource, current in records.items():
+            diff = diff_records(previous[resource], current)
+            if any(diff.values()):
+                changes[resource] = diff
+        if changes:
+            self._publish("changes", changes)
+        return bool(changes)
+
+    async def run(self):
+        """Polls once and schedules the next poll while anyone subscribes."""
+        if not self._subscribers or self._polling:
+            return
+        self._timeout = None
+        self._polling = True
+        changed = False
+        try:
+            changed = await self.poll()
+        except Exception as e:
+            app_log.warning("Unable to poll AutoML resources: %s", e)
+        finally:
+            self._polling = False
+        if self._wake_pending:
+            self._wake_pending = False
+            delay = 0
+        elif changed:
+            self.interval = self.min_interval
+            delay = self.interval
+        else:
+            delay = self.interval
+            self.interval = min(self.interval * 2, self.max_interval)
+        if self._subscribers:
+            self._io_loop = IOLoop.current()
+            self._timeout = self._io_loop.call_later(delay, self.run)
@@ -53,10 +53,11 @@ setup(
     data_files=data_files,
     license="Apache License 2.0",
     packages=find_packages(),
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         "google-cloud-storage>=1.24.1",
         "jupyterlab~=1.2.0",
         "google-cloud-automl",
     ],
+    extras_require={"speedups": ["orjson", "brotli"]},
 )
@@ -19,6 +19,10 @@ import {
 
 interface DetailPanelProps {
   dataType: string;
+  columnSpecId: string;
+}
+
+interface DetailPanelState {
   chartInfo: any[];
 }
 
@@ -155,9 +159,27 @@ export class DatasetSummary extends React.Component<SummaryProps> {
   }
 }
 
-export class DetailPanel extends React.Component<DetailPanelProps> {
+export class DetailPanel extends React.Component<
+  DetailPanelProps,
+  DetailPanelState
+> {
   constructor(props: DetailPanelProps) {
     super(props);
+    this.state = {
+      chartInfo: null,
+    };
+  }
+
+  async componentDidMount() {
+    try {
+      const chartInfo = await DatasetService.getColumnDetail(
+        this.props.columnSpecId
+      );
+      this.setState({ chartInfo: chartInfo });
+    } catch (err) {
+      console.warn('Error retrieving column details', err);
+      this.setState({ chartInfo: [] });
+    }
   }
 
   renderColorfulLegendText(value) {
@@ -169,17 +191,26 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
   }
 
   render() {
-    if (this.props.dataType === 'Numeric') {
+    const { chartInfo } = this.state;
+    if (chartInfo === null) {
+      return <LinearProgress />;
+    } else if (chartInfo.length === 0) {
+      return (
+        <div style={{ padding: '15px' }}>
+          <p>This data type does not have supported visualizations.</p>
+        </div>
+      );
+    } else if (this.props.dataType === 'Numeric') {
       return (
         <div style={{ padding: '15px' }}>
-          <p>Mean: {this.props.chartInfo[1]}</p>
-          <p>Standard Deviation: {this.props.chartInfo[2]}</p>
+          <p>Mean: {chartInfo[1]}</p>
+          <p>Standard Deviation: {chartInfo[2]}</p>
           <div style={{ paddingTop: '15px' }}>
             <b>Distribution</b>
             <BarChart
               width={300}
               height={180}
-              data={this.props.chartInfo[0]}
+              data={chartInfo[0]}
               margin={{
                 top: 20,
                 right: 5,
@@ -250,7 +281,7 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
       };
       return (
         <div style={{ padding: '15px' }}>
-          <p>Most Common: {this.props.chartInfo[1]}</p>
+          <p>Most Common: {chartInfo[1]}</p>
           <div style={{ paddingTop: '15px' }}>
             <b>Distribution</b>
             <PieChart width={400} height={200}>
@@ -259,14 +290,14 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
                 isAnimationActive={false}
                 labelLine={false}
                 label={renderCustomizedLabel}
-                data={this.props.chartInfo[0]}
+                data={chartInfo[0]}
                 cx={125}
                 cy={100}
                 innerRadius={25}
                 outerRadius={90}
                 fill="#3366CC"
               >
-                {this.props.chartInfo[0].map((entry, index) => (
+                {chartInfo[0].map((entry, index) => (
                   <Cell
                     key={`cell-${index}`}
                     fill={COLORS[index % COLORS.length]}
@@ -298,7 +329,7 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
               <BarChart
                 width={300}
                 height={250}
-                data={this.props.chartInfo[0]}
+                data={chartInfo[0]}
                 layout="vertical"
                 margin={{
                   right: 5,
@@ -325,7 +356,7 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
               <BarChart
                 width={300}
                 height={250}
-                data={this.props.chartInfo[1]}
+                data={chartInfo[1]}
                 layout="vertical"
                 margin={{
                   right: 5,
@@ -352,7 +383,7 @@ export class DetailPanel extends React.Component<DetailPanelProps> {
               <BarChart
                 width={300}
                 height={250}
-                data={this.props.chartInfo[2]}
+                data={chartInfo[2]}
                 layout="vertical"
                 margin={{
                   right: 5,
@@ -408,7 +439,7 @@ export class DatasetComponent extends React.Component<Props, State> {
         <header className={localStyles.header}>
           {this.props.dataset.displayName}
         </header>
-        {isLoading ? (
+        {isLoading && tableSpecs.length === 0 ? (
           <LinearProgress />
         ) : tableSpecs.length === 0 ? (
           <p className={localStyles.paper}>
@@ -453,11 +484,7 @@ export class DatasetComponent extends React.Component<Props, State> {
                             return (
                               <DetailPanel
                                 dataType={rowData.dataType}
-                                chartInfo={
-                                  tableSpec.columnSpecs.filter(
-                                    columnSpec => columnSpec.id === rowData.id
-                                  )[0].detailPanel
-                                }
+                                columnSpecId={rowData.id}
                               />
                             );
                           },
@@ -479,11 +506,13 @@ export class DatasetComponent extends React.Component<Props, State> {
 
   private async getTableDetails() {
     try {
-      this.setState({ isLoading: true });
-      const tableSpecs = await DatasetService.listTableSpecs(
-        this.props.dataset.id
-      );
-      this.setState({ hasLoaded: true, tableSpecs: tableSpecs });
+      this.setState({ isLoading: true, tableSpecs: [] });
+      let tableSpecs: TableSpec[] = [];
+      await DatasetService.streamTableSpecs(this.props.dataset.id, page => {
+        tableSpecs = tableSpecs.concat(page);
+        this.setState({ tableSpecs: tableSpecs });
+      });
+      this.setState({ hasLoaded: true });
     } catch (err) {
       console.warn('Error retrieving table details', err);
     } finally {
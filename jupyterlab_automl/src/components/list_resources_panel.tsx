@@ -4,8 +4,19 @@ import orange from '@material-ui/core/colors/orange';
 import * as React from 'react';
 import { Dataset, DatasetService, DatasetType } from '../service/dataset';
 import { Model, ModelService } from '../service/model';
+import {
+  applyDiff,
+  ListingQuery,
+  ResourceChanges,
+  ResourceService,
+  searchText,
+} from '../service/resource';
 import { Context } from './automl_widget';
-import { ColumnType, ListResourcesTable } from './shared/list_resources_table';
+import {
+  ColumnType,
+  ListResourcesTable,
+  tablePageSize,
+} from './shared/list_resources_table';
 import { TextInput, SelectInput } from 'gcp-jupyterlab-shared';
 import styled from 'styled-components';
 import { debounce } from '../util';
@@ -27,9 +38,12 @@ interface State {
   hasLoaded: boolean;
   isLoading: boolean;
   datasets: Dataset[];
+  datasetsPageToken: string;
   models: Model[];
+  modelsPageToken: string;
   resourceType: ResourceType;
   searchString: string;
+  sort: string;
 }
 
 const FullWidthInput = styled(Box)`
@@ -67,16 +81,24 @@ const styles: { [key: string]: React.CSSProperties } = {
 
 const breakpoints = [250, 380];
 
+// Fetch two table pages at a time so the next table page is always loaded
+const fetchPageSize = 2 * tablePageSize;
+
 export class ListResourcesPanel extends React.Component<Props, State> {
+  private stopWatching: () => void;
+
   constructor(props: Props) {
     super(props);
     this.state = {
       hasLoaded: false,
       isLoading: false,
       datasets: [],
+      datasetsPageToken: '',
       models: [],
+      modelsPageToken: '',
       resourceType: ResourceType.Dataset,
       searchString: '',
+      sort: '',
     };
   }
 
@@ -99,7 +121,17 @@ export class ListResourcesPanel extends React.Component<Props, State> {
     const isFirstLoad =
       !(this.state.hasLoaded || prevProps.isVisible) && this.props.isVisible;
     if (isFirstLoad) {
+      // The first page comes from refresh, so the feed skips its snapshot
       this.refresh();
+      this.stopWatching = ResourceService.watchResources(changes =>
+        this.onChanges(changes)
+      );
+    }
+  }
+
+  componentWillUnmount() {
+    if (this.stopWatching) {
+      this.stopWatching();
     }
   }
 
@@ -191,6 +223,10 @@ export class ListResourcesPanel extends React.Component<Props, State> {
                   );
                 }
               }}
+              onChangePage={page => this.getMoreDatasets(page)}
+              onOrderChange={(field, descending) =>
+                this.handleOrderChange(field, descending)
+              }
               isLoading={this.state.isLoading}
               height={this.props.height - 80}
               width={this.props.width}
@@ -226,6 +262,10 @@ export class ListResourcesPanel extends React.Component<Props, State> {
                 },
               ]}
               data={this.filterResources<Model>(this.state.models)}
+              onChangePage={page => this.getMoreModels(page)}
+              onOrderChange={(field, descending) =>
+                this.handleOrderChange(field, descending)
+              }
               isLoading={this.state.isLoading}
               height={this.props.height - 88}
               width={this.props.width}
@@ -265,53 +305,47 @@ export class ListResourcesPanel extends React.Component<Props, State> {
   }
 
   private handleSearch = debounce((value: string) => {
-    this.setState({ searchString: value });
+    // Only the matching resources are fetched, from the server's index
+    this.setState({ searchString: value }, () => this.refresh());
   }, 250);
 
-  private filterResources<T>(resources: T[]): T[] {
-    const searchFields = {
-      displayName: true,
-      updateTime: true,
-      createTime: true,
-      datasetType: true,
-    };
-    return resources.filter(x => {
-      if (!this.state.searchString) return true;
-      const obj = x as { [k: string]: any };
-      for (const key in x) {
-        if (!(key in searchFields)) continue;
-        if (
-          typeof obj[key] === 'string' &&
-          (obj[key] as string)
-            .toLowerCase()
-            .includes(this.state.searchString.toLowerCase())
-        ) {
-          return true;
-        }
-        if (
-          obj[key] instanceof Date &&
-          (obj[key] as Date)
-            .toLocaleString()
-            .toLowerCase()
-            .includes(this.state.searchString.toLowerCase())
-        ) {
-          return true;
-        }
-      }
-      return false;
-    });
+  private handleOrderChange(field: string, descending: boolean) {
+    // Only the loaded pages are on the client, so the server sorts
+    const sort = field ? (descending ? '-' : '') + field : '';
+    this.setState({ sort }, () => this.refresh());
+  }
+
+  private filterResources<T extends Dataset | Model>(resources: T[]): T[] {
+    // Records from the change feed are not filtered by the server
+    const searchString = this.state.searchString.toLowerCase();
+    if (!searchString) return resources;
+    return resources.filter(x => searchText(x).includes(searchString));
   }
 
   private selectType(type: ResourceType) {
-    this.setState({ resourceType: type });
-    this.refresh();
+    this.setState({ resourceType: type, sort: '' }, () => this.refresh());
   }
 
   private async refresh() {
     try {
       this.setState({ isLoading: true });
-      await Promise.all([this.getDatasets(), this.getModels()]);
-      this.setState({ hasLoaded: true });
+      // Both first pages come back in a single request
+      const page = await ResourceService.listResourcesPage(
+        ['datasets', 'models'],
+        fetchPageSize,
+        {},
+        this.listingQuery()
+      );
+      for (const error of page.errors) {
+        console.warn('Error retrieving ' + error.resource, error.message);
+      }
+      this.setState({
+        datasets: page.datasets,
+        datasetsPageToken: page.nextPageTokens.datasets || '',
+        models: page.models,
+        modelsPageToken: page.nextPageTokens.models || '',
+        hasLoaded: true,
+      });
     } catch (err) {
       console.warn('Error retrieving datasets', err);
     } finally {
@@ -319,13 +353,74 @@ export class ListResourcesPanel extends React.Component<Props, State> {
     }
   }
 
-  private async getDatasets() {
-    const datasets = await DatasetService.listDatasets();
-    this.setState({ datasets: datasets });
+  private listingQuery(): ListingQuery {
+    const query: ListingQuery = {};
+    if (this.state.searchString) {
+      query.q = this.state.searchString;
+    }
+    if (this.state.sort) {
+      query.sort = this.state.sort;
+    }
+    return query;
   }
 
-  private async getModels() {
-    const models = await ModelService.listModels();
-    this.setState({ models: models });
+  private onChanges(changes: ResourceChanges) {
+    if (changes.datasets) {
+      this.setState({
+        datasets: applyDiff(this.state.datasets, changes.datasets),
+      });
+    }
+    if (changes.models) {
+      this.setState({
+        models: applyDiff(this.state.models, changes.models),
+      });
+    }
+  }
+
+  private async getMoreDatasets(tablePage: number) {
+    const { datasets, datasetsPageToken } = this.state;
+    if (
+      !datasetsPageToken ||
+      (tablePage + 2) * tablePageSize <= datasets.length
+    ) {
+      return;
+    }
+    try {
+      const page = await DatasetService.listDatasetsPage(
+        fetchPageSize,
+        datasetsPageToken,
+        this.listingQuery()
+      );
+      // Drop the page if a refresh or another fetch got there first
+      if (this.state.datasetsPageToken !== datasetsPageToken) return;
+      this.setState({
+        datasets: this.state.datasets.concat(page.datasets),
+        datasetsPageToken: page.nextPageToken,
+      });
+    } catch (err) {
+      console.warn('Error retrieving datasets', err);
+    }
+  }
+
+  private async getMoreModels(tablePage: number) {
+    const { models, modelsPageToken } = this.state;
+    if (!modelsPageToken || (tablePage + 2) * tablePageSize <= models.length) {
+      return;
+    }
+    try {
+      const page = await ModelService.listModelsPage(
+        fetchPageSize,
+        modelsPageToken,
+        this.listingQuery()
+      );
+      // Drop the page if a refresh or another fetch got there first
+      if (this.state.modelsPageToken !== modelsPageToken) return;
+      this.setState({
+        models: this.state.models.concat(page.models),
+        modelsPageToken: page.nextPageToken,
+      });
+    } catch (err) {
+      console.warn('Error retrieving models', err);
+    }
   }
 }
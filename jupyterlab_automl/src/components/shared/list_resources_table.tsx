@@ -98,9 +98,14 @@ interface Props {
   columns: ResourceColumn[];
   isLoading?: boolean;
   onRowClick?: (rowData: any) => void;
+  onChangePage?: (page: number) => void;
+  // Called with the sorted field, or '' when sorting is cleared
+  onOrderChange?: (field: string, descending: boolean) => void;
   rowContextMenu?: ContextMenuItem[];
 }
 
+export const tablePageSize = 20;
+
 export const style: CSSProperties = {
   table: {
     borderRadius: 0,
@@ -157,8 +162,8 @@ export class ListResourcesTable extends React.PureComponent<Props> {
         options={{
           showTitle: false,
           tableLayout: 'fixed',
-          pageSize: 20,
-          pageSizeOptions: [20],
+          pageSize: tablePageSize,
+          pageSizeOptions: [tablePageSize],
           search: false,
           sorting: true,
           padding: 'dense',
@@ -174,6 +179,20 @@ export class ListResourcesTable extends React.PureComponent<Props> {
             this.props.onRowClick(rowData);
           }
         }}
+        onChangePage={page => {
+          if (this.props.onChangePage) {
+            this.props.onChangePage(page);
+          }
+        }}
+        onOrderChange={(orderBy, orderDirection) => {
+          if (this.props.onOrderChange) {
+            const column = this.props.columns[orderBy];
+            this.props.onOrderChange(
+              column ? column.field : '',
+              orderDirection === 'desc'
+            );
+          }
+        }}
         components={{
           Row:
             this.props.rowContextMenu !== undefined
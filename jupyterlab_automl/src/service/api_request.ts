@@ -1,9 +1,55 @@
 import { ServerConnection } from '@jupyterlab/services';
 import { URLExt } from '@jupyterlab/coreutils';
 
+interface CachedResponse {
+  etag: string;
+  body: string;
+}
+
+// Bodies of recent GET responses, keyed by end point, for If-None-Match
+const responseCache = new Map<string, CachedResponse>();
+const responseCacheSize = 50;
+
+function cacheResponse(endPoint: string, etag: string, body: string) {
+  responseCache.delete(endPoint);
+  responseCache.set(endPoint, { etag: etag, body: body });
+  if (responseCache.size > responseCacheSize) {
+    responseCache.delete(responseCache.keys().next().value);
+  }
+}
+
+function makeRequestUrl(
+  settings: ServerConnection.ISettings,
+  endPoint: string
+): string {
+  return URLExt.join(
+    settings.baseUrl,
+    'automl', // API Namespace
+    endPoint
+  );
+}
+
+async function makeRequest(
+  endPoint: string,
+  init: RequestInit
+): Promise<Response> {
+  // Make request to Jupyter API
+  const settings = ServerConnection.makeSettings();
+  const requestUrl = makeRequestUrl(settings, endPoint);
+
+  try {
+    return await ServerConnection.makeRequest(requestUrl, init, settings);
+  } catch (error) {
+    throw new ServerConnection.NetworkError(error);
+  }
+}
+
 /**
  * Call the AutoML extension API
  *
+ * GET responses are revalidated with their ETag, and the previous body is
+ * reused when the server answers 304 Not Modified.
+ *
  * @param endPoint API REST end point for the extension
  * @param init Initial values for the request
  * @returns The response body interpreted as JSON
@@ -12,26 +58,109 @@ export async function requestAPI<T>(
   endPoint = '',
   init: RequestInit = {}
 ): Promise<T> {
-  // Make request to Jupyter API
-  const settings = ServerConnection.makeSettings();
-  const requestUrl = URLExt.join(
-    settings.baseUrl,
-    'automl', // API Namespace
-    endPoint
-  );
+  const isGet = !init.method || init.method === 'GET';
+  const cached = isGet ? responseCache.get(endPoint) : undefined;
+  if (cached) {
+    const headers = new Headers(init.headers);
+    headers.set('If-None-Match', cached.etag);
+    init = { ...init, headers: headers };
+  }
 
-  let response: Response;
-  try {
-    response = await ServerConnection.makeRequest(requestUrl, init, settings);
-  } catch (error) {
-    throw new ServerConnection.NetworkError(error);
+  const response = await makeRequest(endPoint, init);
+  if (cached && response.status === 304) {
+    return JSON.parse(cached.body);
   }
 
-  const data: any = await response.json();
+  const body = await response.text();
+  const data: any = JSON.parse(body);
 
   if (!response.ok) {
     throw new ServerConnection.ResponseError(response, data.message || data);
   }
 
+  const etag = response.headers.get('Etag');
+  if (isGet && etag) {
+    cacheResponse(endPoint, etag, body);
+  }
   return data;
 }
+
+/**
+ * Call an AutoML extension API end point that streams newline-delimited JSON
+ *
+ * @param endPoint API REST end point for the extension, with format=ndjson
+ * @param onRecords Called with the records of each chunk as it arrives
+ * @param init Initial values for the request
+ */
+export async function requestAPIStream<T>(
+  endPoint: string,
+  onRecords: (records: T[]) => void,
+  init: RequestInit = {}
+): Promise<void> {
+  const response = await makeRequest(endPoint, init);
+
+  if (!response.ok) {
+    const data: any = await response.json();
+    throw new ServerConnection.ResponseError(response, data.message || data);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  let done = false;
+  while (!done) {
+    const chunk = await reader.read();
+    done = chunk.done;
+    buffered += decoder.decode(chunk.value, { stream: !done });
+    const lines = buffered.split('\n');
+    // The last line is incomplete until the stream ends
+    buffered = done ? '' : lines.pop();
+
+    const records: T[] = [];
+    for (const line of lines) {
+      if (!line) continue;
+      const record = JSON.parse(line);
+      if (record.error) {
+        throw new ServerConnection.ResponseError(
+          response,
+          record.error.message
+        );
+      }
+      records.push(record);
+    }
+    if (records.length > 0) {
+      onRecords(records);
+    }
+  }
+}
+
+/**
+ * Subscribe to an AutoML extension API end point that sends server-sent events
+ *
+ * The browser reconnects on its own when the connection drops.
+ *
+ * @param endPoint API REST end point for the extension
+ * @param listeners Called with the parsed data of each event, by event name
+ * @returns A function that closes the connection
+ */
+export function listenAPI(
+  endPoint: string,
+  listeners: { [event: string]: (data: any) => void }
+): () => void {
+  const settings = ServerConnection.makeSettings();
+  let requestUrl = makeRequestUrl(settings, endPoint);
+  // EventSource cannot send an Authorization header
+  if (settings.token) {
+    requestUrl +=
+      (requestUrl.includes('?') ? '&' : '?') +
+      'token=' +
+      encodeURIComponent(settings.token);
+  }
+  const source = new EventSource(requestUrl, { withCredentials: true });
+  for (const event of Object.keys(listeners)) {
+    source.addEventListener(event, (message: MessageEvent) => {
+      listeners[event](JSON.parse(message.data));
+    });
+  }
+  return () => source.close();
+}
@@ -1,4 +1,5 @@
-import { requestAPI } from './api_request';
+import { requestAPI, requestAPIStream } from './api_request';
+import { checkResource, ListingQuery, ResourceService } from './resource';
 
 export type ColumnType =
   | 'Numerical'
@@ -18,6 +19,7 @@ export interface Dataset {
   exampleCount: number;
   metadata: any;
   datasetType: DatasetType;
+  location: string;
 }
 
 export interface ColumnSpec {
@@ -28,7 +30,10 @@ export interface ColumnSpec {
   invalidValueCount: number;
   nullValueCount: string;
   nullable: boolean;
-  detailPanel: any;
+}
+
+interface ColumnDetail {
+  detailPanel: any[];
 }
 
 export interface TableSpec {
@@ -44,17 +49,76 @@ export interface TableInfo {
   tableSpecs: TableSpec[];
 }
 
+// Column specs as sent with columnar=1, one array per field
+interface ColumnSpecColumns {
+  id: string[];
+  dataType: string[];
+  displayName: string[];
+  distinctValueCount: number[];
+  invalidValueCount: number[];
+  nullValueCount: number[];
+  nullable: boolean[];
+}
+
+interface ColumnarTableSpec extends Omit<TableSpec, 'columnSpecs'> {
+  columnSpecs: ColumnSpecColumns;
+}
+
 export interface Datasets {
   datasets: Dataset[];
 }
 
+export interface DatasetsPage extends Datasets {
+  nextPageToken: string;
+}
+
+/**
+ * Rebuilds the column spec objects of a table spec sent with columnar=1
+ */
+export function decodeTableSpec(tableSpec: ColumnarTableSpec): TableSpec {
+  const columns = tableSpec.columnSpecs;
+  const columnSpecs: ColumnSpec[] = [];
+  for (let i = 0; i < columns.id.length; ++i) {
+    const nullCount = columns.nullValueCount[i];
+    const nullPercent = tableSpec.rowCount
+      ? Math.floor((nullCount / tableSpec.rowCount) * 100)
+      : 0;
+    columnSpecs.push({
+      id: columns.id[i],
+      dataType: columns.dataType[i],
+      displayName: columns.displayName[i],
+      distinctValueCount: columns.distinctValueCount[i],
+      invalidValueCount: columns.invalidValueCount[i],
+      nullValueCount: nullCount + ' (' + nullPercent + '%)',
+      nullable: columns.nullable[i],
+    });
+  }
+  return { ...tableSpec, columnSpecs: columnSpecs };
+}
+
 export abstract class DatasetService {
   static async listDatasets(): Promise<Dataset[]> {
-    const data = (await requestAPI<Datasets>('v1/datasets')).datasets;
-    for (let i = 0; i < data.length; ++i) {
-      data[i].createTime = new Date(data[i].createTime);
-    }
-    return data;
+    const data = await ResourceService.listResources(['datasets']);
+    checkResource(data, 'datasets');
+    return data.datasets;
+  }
+
+  static async listDatasetsPage(
+    pageSize: number,
+    pageToken = '',
+    query: ListingQuery = {}
+  ): Promise<DatasetsPage> {
+    const data = await ResourceService.listResourcesPage(
+      ['datasets'],
+      pageSize,
+      { datasets: pageToken },
+      query
+    );
+    checkResource(data, 'datasets');
+    return {
+      datasets: data.datasets,
+      nextPageToken: data.nextPageTokens.datasets || '',
+    };
   }
 
   static async deleteDataset(datasetId: string): Promise<void> {
@@ -68,10 +132,19 @@ export abstract class DatasetService {
     await requestAPI('v1/deleteDataset', requestInit);
   }
 
-  static async listTableSpecs(datasetId: string): Promise<TableSpec[]> {
-    const query = '?datasetId=' + datasetId;
-    const data = (await requestAPI<TableInfo>('v1/tableInfo' + query))
-      .tableSpecs;
-    return data;
+  static async getColumnDetail(columnSpecId: string): Promise<any[]> {
+    const query = '?columnSpecId=' + encodeURIComponent(columnSpecId);
+    return (await requestAPI<ColumnDetail>('v1/columnDetail' + query))
+      .detailPanel;
+  }
+
+  static async streamTableSpecs(
+    datasetId: string,
+    onTableSpecs: (tableSpecs: TableSpec[]) => void
+  ): Promise<void> {
+    const query = '?format=ndjson&columnar=1&datasetId=' + datasetId;
+    await requestAPIStream<ColumnarTableSpec>('v1/tableInfo' + query, data =>
+      onTableSpecs(data.map(decodeTableSpec))
+    );
   }
 }
@@ -1,4 +1,5 @@
 import { requestAPI } from './api_request';
+import { checkResource, ListingQuery, ResourceService } from './resource';
 
 export interface Model {
   id: string; // Resource name of dataset
@@ -7,19 +8,40 @@ export interface Model {
   updateTime: Date;
   deploymentState: number;
   metadata: any;
+  location: string;
 }
 
 interface Models {
   models: Model[];
 }
 
+export interface ModelsPage extends Models {
+  nextPageToken: string;
+}
+
 export abstract class ModelService {
   static async listModels(): Promise<Model[]> {
-    const data = (await requestAPI<Models>('v1/models')).models;
-    for (let i = 0; i < data.length; ++i) {
-      data[i].updateTime = new Date(data[i].updateTime);
-    }
-    return data;
+    const data = await ResourceService.listResources(['models']);
+    checkResource(data, 'models');
+    return data.models;
+  }
+
+  static async listModelsPage(
+    pageSize: number,
+    pageToken = '',
+    query: ListingQuery = {}
+  ): Promise<ModelsPage> {
+    const data = await ResourceService.listResourcesPage(
+      ['models'],
+      pageSize,
+      { models: pageToken },
+      query
+    );
+    checkResource(data, 'models');
+    return {
+      models: data.models,
+      nextPageToken: data.nextPageTokens.models || '',
+    };
   }
 
   static async deleteModel(modelId: string): Promise<void> {
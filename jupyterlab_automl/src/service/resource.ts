@@ -0,0 +1,192 @@
+import { listenAPI, requestAPI } from './api_request';
+import { Dataset } from './dataset';
+import { Model } from './model';
+
+export type ResourceKind = 'datasets' | 'models';
+
+export interface ResourceError {
+  resource: ResourceKind;
+  location?: string;
+  message: string;
+}
+
+export interface Resources {
+  datasets: Dataset[];
+  models: Model[];
+  errors: ResourceError[];
+}
+
+export interface ResourcesPage extends Resources {
+  nextPageTokens: { datasets?: string; models?: string };
+}
+
+/**
+ * Filter, sort and search arguments answered by the server's listing index
+ */
+export interface ListingQuery {
+  filter?: string; // e.g. 'datasetType:TBL|ICN,createTime>=1577836800000'
+  sort?: string; // A field, with a leading '-' for descending order
+  q?: string; // Matches the fields searchText holds, ignoring case
+}
+
+/**
+ * Returns the lowercase text the server matches a ListingQuery q against
+ *
+ * Display names and dataset types as they are, and creation and update
+ * times as their UTC date.
+ */
+export function searchText(resource: {
+  displayName?: string;
+  datasetType?: string;
+  createTime?: Date;
+  updateTime?: Date;
+}): string {
+  const texts = [resource.displayName || '', resource.datasetType || ''];
+  for (const date of [resource.createTime, resource.updateTime]) {
+    if (date) {
+      texts.push(date.toISOString().slice(0, 10));
+    }
+  }
+  return texts.join('\n').toLowerCase();
+}
+
+function toQueryString(query: ListingQuery): string {
+  let queryString = '';
+  for (const key of ['filter', 'sort', 'q'] as (keyof ListingQuery)[]) {
+    if (query[key]) {
+      queryString += '&' + key + '=' + encodeURIComponent(query[key]);
+    }
+  }
+  return queryString;
+}
+
+export interface ResourceDiff<T> {
+  added: T[];
+  changed: T[];
+  removed: string[]; // Resource names
+}
+
+export interface ResourceChanges {
+  datasets?: ResourceDiff<Dataset>;
+  models?: ResourceDiff<Model>;
+}
+
+function toResources<T extends Resources>(data: T): T {
+  data.datasets = data.datasets || [];
+  data.models = data.models || [];
+  data.errors = data.errors || [];
+  for (let i = 0; i < data.datasets.length; ++i) {
+    data.datasets[i].createTime = new Date(data.datasets[i].createTime);
+  }
+  for (let i = 0; i < data.models.length; ++i) {
+    data.models[i].updateTime = new Date(data.models[i].updateTime);
+  }
+  return data;
+}
+
+function toChanges(data: ResourceChanges): ResourceChanges {
+  if (data.datasets) {
+    for (const dataset of data.datasets.added.concat(data.datasets.changed)) {
+      dataset.createTime = new Date(dataset.createTime);
+    }
+  }
+  if (data.models) {
+    for (const model of data.models.added.concat(data.models.changed)) {
+      model.updateTime = new Date(model.updateTime);
+    }
+  }
+  return data;
+}
+
+/**
+ * Returns resources with a diff of the change feed applied, newest first
+ */
+export function applyDiff<T extends { id: string }>(
+  resources: T[],
+  diff: ResourceDiff<T>
+): T[] {
+  const changed = new Map(diff.changed.map(r => [r.id, r]));
+  const removed = new Set(diff.removed);
+  return diff.added.concat(
+    resources
+      .filter(r => !removed.has(r.id))
+      .map(r => changed.get(r.id) || r)
+  );
+}
+
+/**
+ * Throws the error of a kind that could not be listed in any location
+ */
+export function checkResource(data: Resources, kind: ResourceKind) {
+  const failed = data.errors.find(e => e.resource === kind && !e.location);
+  if (failed) {
+    throw new Error(failed.message);
+  }
+}
+
+export abstract class ResourceService {
+  /**
+   * Lists every resource of the given kinds in a single request
+   */
+  static async listResources(
+    include: ResourceKind[] = ['datasets', 'models']
+  ): Promise<Resources> {
+    const query = '?include=' + include.join(',');
+    return toResources(await requestAPI<Resources>('v1/resources' + query));
+  }
+
+  /**
+   * Lists one page of each of the given kinds in a single request
+   *
+   * @param pageTokens The nextPageTokens of the previous page, by kind
+   * @param listingQuery Only list the matching resources, in this order
+   */
+  static async listResourcesPage(
+    include: ResourceKind[],
+    pageSize: number,
+    pageTokens: { datasets?: string; models?: string } = {},
+    listingQuery: ListingQuery = {}
+  ): Promise<ResourcesPage> {
+    let query =
+      '?include=' +
+      include.join(',') +
+      '&pageSize=' +
+      pageSize +
+      toQueryString(listingQuery);
+    for (const kind of include) {
+      if (pageTokens[kind]) {
+        query +=
+          '&' + kind + 'PageToken=' + encodeURIComponent(pageTokens[kind]);
+      }
+    }
+    const data = await requestAPI<ResourcesPage>('v1/resources' + query);
+    data.nextPageTokens = data.nextPageTokens || {};
+    return toResources(data);
+  }
+
+  /**
+   * Subscribes to the datasets and models as they change on the server
+   *
+   * One poll on the server serves every open panel.
+   *
+   * @param onChanges Called with the records added, changed or removed
+   * @param onSnapshot Called with every resource when the feed starts.
+   *     Without it the server skips the snapshot, for callers that list the
+   *     resources themselves.
+   * @returns A function that stops the subscription
+   */
+  static watchResources(
+    onChanges: (changes: ResourceChanges) => void,
+    onSnapshot?: (resources: Resources) => void
+  ): () => void {
+    if (!onSnapshot) {
+      return listenAPI('v1/changes?snapshot=0', {
+        changes: data => onChanges(toChanges(data)),
+      });
+    }
+    return listenAPI('v1/changes', {
+      snapshot: data => onSnapshot(toResources(data)),
+      changes: data => onChanges(toChanges(data)),
+    });
+  }
+}